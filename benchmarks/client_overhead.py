@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""Measure the per-call overhead of the client, excluding the network
+
+Requests are answered by a pool which returns canned responses, so the timings only include
+building urls and headers, checking statuses and (de)serializing small values.
+
+Usage::
+
+    python benchmarks/client_overhead.py [--number 100000]
+"""
+import argparse
+import timeit
+
+from riakcached.clients import RiakClient
+from riakcached.pools import Pool
+
+
+class NullPool(Pool):
+    __slots__ = ["responses"]
+
+    def __init__(self):
+        self.responses = {
+            "GET": (200, '{"id": 1}', {"content-type": "application/json"}),
+            "POST": (204, "", {}),
+            "DELETE": (204, "", {}),
+        }
+        super(NullPool, self).__init__(auto_connect=False)
+
+    def request(self, method, url, body=None, headers=None):
+        return self.responses[method]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=100000, help="calls per measurement")
+    args = parser.parse_args()
+
+    client = RiakClient("bucket", pool=NullPool(), reap_expired=False)
+    calls = [
+        ("get", lambda: client.get("some-key")),
+        ("get quoted", lambda: client.get("some key/with?reserved")),
+        ("set", lambda: client.set("some-key", "value")),
+        ("set json", lambda: client.set("some-key", {"id": 1}, "application/json")),
+        ("delete", lambda: client.delete("some-key")),
+    ]
+    print "%-12s %10s" % ("call", "us/call")
+    for name, call in calls:
+        elapsed = min(timeit.repeat(call, number=args.number, repeat=3))
+        print "%-12s %10.2f" % (name, elapsed / args.number * 1e6)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""Compare get_many fan-out on greenlets and on threads against a local fake Riak server
+
+Each client runs in its own child process, the peak resident memory reported is the child's.
+
+Usage::
+
+    python benchmarks/gevent_fanout.py [--keys 2000] [--concurrency 500] [--latency 0.02]
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+
+from riakcached.clients import ThreadedRiakClient
+from riakcached.green import GeventPool
+from riakcached.green import GeventRiakClient
+from riakcached.pools import Urllib3Pool
+from riakcached.testing import FakeRiakServer
+
+
+def gevent_client(url, args):
+    pool = GeventPool(base_url=url, maxsize=args.concurrency)
+    return GeventRiakClient("bench", pool=pool, concurrency=args.concurrency)
+
+
+def threaded_client(url, args):
+    return ThreadedRiakClient("bench", pool=Urllib3Pool(base_url=url, maxsize=args.concurrency))
+
+
+CLIENTS = [
+    ("gevent", gevent_client),
+    ("threaded", threaded_client),
+]
+
+
+def measure(make_client, url, keys, args):
+    client = make_client(url, args)
+    best = None
+    for _ in xrange(args.repeat):
+        start = time.time()
+        found = client.get_many(keys)
+        elapsed = time.time() - start
+        assert len(found) == len(keys)
+        best = elapsed if best is None else min(best, elapsed)
+    client.close()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=2000, help="keys per get_many")
+    parser.add_argument("--concurrency", type=int, default=500,
+                        help="greenlets and connections for the gevent client")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds the fake server waits before every response")
+    parser.add_argument("--repeat", type=int, default=3, help="get_many calls per client")
+    args = parser.parse_args()
+
+    riak = FakeRiakServer(latency=args.latency)
+    riak.start()
+    keys = ["key%d" % index for index in xrange(args.keys)]
+    for key in keys:
+        riak.store.objects[("bench", key)] = ("value", {"Content-Type": "text/plain"})
+
+    print "%-10s %10s %12s %12s" % ("client", "seconds", "keys/s", "max rss MB")
+    for name, make_client in CLIENTS:
+        read, write = os.pipe()
+        pid = os.fork()
+        if not pid:
+            os.close(read)
+            status = 1
+            try:
+                elapsed = measure(make_client, riak.url, keys, args)
+                rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+                os.write(write, "%f %f" % (elapsed, rss))
+                status = 0
+            finally:
+                os._exit(status)
+        os.close(write)
+        result = os.read(read, 1024)
+        os.close(read)
+        os.waitpid(pid, 0)
+        if not result:
+            print >> sys.stderr, "%s failed" % name
+            continue
+        elapsed, rss = map(float, result.split())
+        print "%-10s %10.3f %12.0f %12.1f" % (name, elapsed, len(keys) / elapsed, rss)
+    riak.stop()
+
+
+if __name__ == "__main__":
+    main()
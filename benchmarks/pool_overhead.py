@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""Compare the per-request cost of the connection pools against a canned-response server
+
+The server runs in a child process and answers every request with a prebuilt response, so
+the CPU time reported is the client process's own: the pool's request and response
+handling.
+
+Usage::
+
+    python benchmarks/pool_overhead.py [--requests 5000] [--large-size 1048576]
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+
+from riakcached.pools import SocketPool
+from riakcached.pools import Urllib3Pool
+
+
+POOLS = [
+    ("urllib3", Urllib3Pool),
+    ("socket", SocketPool),
+]
+
+
+def response(status, body="", content_type="application/octet-stream"):
+    head = "HTTP/1.1 %d OK\r\nContent-Type: %s\r\nContent-Length: %d\r\n" % (
+        status, content_type, len(body),
+    )
+    return head + "Server: MochiWeb/1.1 WebMachine/1.10.0\r\n\r\n" + body
+
+
+def serve_connection(conn, responses):
+    data = ""
+    while True:
+        while "\r\n\r\n" not in data:
+            received = conn.recv(65536)
+            if not received:
+                return
+            data += received
+        head, data = data.split("\r\n\r\n", 1)
+        length = 0
+        for line in head.split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        while len(data) < length:
+            data += conn.recv(65536)
+        data = data[length:]
+        method, path = head.split(" ", 2)[:2]
+        if path.startswith("http://"):
+            path = "/" + path.split("/", 3)[3]
+        conn.sendall(responses.get((method, path), responses[("POST", None)]))
+
+
+def serve(listener, large_size):
+    responses = {
+        ("GET", "/buckets/bench/keys/small"): response(200, "x" * 100, "text/plain"),
+        ("GET", "/buckets/bench/keys/large"): response(200, "x" * large_size),
+        ("POST", None): response(204),
+    }
+    while True:
+        conn, _ = listener.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        thread = threading.Thread(target=serve_connection, args=(conn, responses))
+        thread.daemon = True
+        thread.start()
+
+
+def measure(pool, method, url, body, count):
+    expected = 204 if body is not None else 200
+    cpu = sum(os.times()[:2])
+    start = time.time()
+    for _ in xrange(count):
+        status, data, _ = pool.request(method, url, body=body)
+        assert status == expected
+    return time.time() - start, sum(os.times()[:2]) - cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000, help="requests per measurement")
+    parser.add_argument("--large-size", type=int, default=1048576,
+                        help="size in bytes of the large value")
+    args = parser.parse_args()
+
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(16)
+    url = "http://127.0.0.1:%d" % listener.getsockname()[1]
+    pid = os.fork()
+    if not pid:
+        serve(listener, args.large_size)
+        os._exit(0)
+    listener.close()
+
+    requests = [
+        ("get 100B", "GET", url + "/buckets/bench/keys/small", None, args.requests),
+        ("set 1KB", "POST", url + "/buckets/bench/keys/small", "x" * 1024, args.requests),
+        ("get large", "GET", url + "/buckets/bench/keys/large", None,
+         max(1, args.requests // 50)),
+    ]
+    try:
+        print "%-10s %-10s %10s %14s" % ("request", "pool", "req/s", "cpu us/req")
+        for name, method, request_url, body, count in requests:
+            for pool_name, pool_class in POOLS:
+                pool = pool_class(base_url=url)
+                measure(pool, method, request_url, body, min(count, 100))
+                elapsed, cpu = min(
+                    measure(pool, method, request_url, body, count) for _ in xrange(3)
+                )
+                pool.close()
+                print "%-10s %-10s %10.0f %14.1f" % (
+                    name, pool_name, count / elapsed, cpu / count * 1e6,
+                )
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+
+
+if __name__ == "__main__":
+    main()
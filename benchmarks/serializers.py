@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Compare the encode and decode cost and encoded size of every registered serializer
+
+Usage::
+
+    python benchmarks/serializers.py [--number 10000]
+"""
+import argparse
+import marshal
+import timeit
+
+from riakcached.serializers import SerializerRegistry
+
+
+VALUES = {
+    "small dict": {"id": 12345, "name": "example", "active": True, "score": 98.5},
+    "int list": range(1000),
+    "records": [
+        {"id": index, "name": "user-%d" % index, "tags": ["a", "b", "c"], "ratio": index / 7.0}
+        for index in xrange(100)
+    ],
+    "text": {"body": "lorem ipsum dolor sit amet " * 400},
+}
+CONTENT_TYPES = [
+    "application/json",
+    "application/x-python-marshal",
+    "application/msgpack",
+]
+
+
+def measure(registry, content_type, value, number):
+    serialize = registry.serializer_for(content_type)
+    deserialize = registry.deserializer_for(content_type)
+    data = serialize(value)
+    encode = min(timeit.repeat(lambda: serialize(value), number=number, repeat=3)) / number
+    decode = min(timeit.repeat(lambda: deserialize(data), number=number, repeat=3)) / number
+    return encode, decode, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="iterations per measurement")
+    args = parser.parse_args()
+
+    registry = SerializerRegistry()
+    registry.add("application/x-python-marshal", marshal.dumps, marshal.loads)
+    print "%-12s %-30s %12s %12s %10s" % ("value", "content type", "encode us", "decode us",
+                                          "bytes")
+    for name, value in sorted(VALUES.iteritems()):
+        for content_type in CONTENT_TYPES:
+            if content_type not in registry.serializers:
+                continue
+            encode, decode, size = measure(registry, content_type, value, args.number)
+            print "%-12s %-30s %12.2f %12.2f %10d" % (
+                name, content_type, encode * 1e6, decode * 1e6, size,
+            )
+
+
+if __name__ == "__main__":
+    main()
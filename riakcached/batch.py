@@ -0,0 +1,191 @@
+import collections
+
+
+class Deferred(object):
+    """The result of an operation recorded by a :class:`riakcached.batch.Batch`
+
+    Available once the batch has run, :attr:`value` is the operation's return value and
+    raises the operation's exception if it failed.
+    """
+    __slots__ = ["_value", "args", "done", "error", "key", "kwargs", "operation"]
+
+    def __init__(self, operation, key, args, kwargs):
+        """Constructs a new :class:`riakcached.batch.Deferred`
+
+        :param operation: the name of the client method to call
+        :type operation: str
+        :param key: the key the operation is for
+        :type key: str
+        :param args: the other positional arguments of the call
+        :type args: tuple
+        :param kwargs: the keyword arguments of the call
+        :type kwargs: dict
+        """
+        self.operation = operation
+        self.key = key
+        self.args = args
+        self.kwargs = kwargs
+        self.done = False
+        self.error = None
+        self._value = None
+
+    def __repr__(self):
+        state = "pending"
+        if self.error is not None:
+            state = "failed"
+        elif self.done:
+            state = "done"
+        return "<Deferred %s(%r) %s>" % (self.operation, self.key, state)
+
+    @property
+    def value(self):
+        """The return value of the operation
+
+        :raises: RuntimeError - when the batch has not run yet
+        :raises: the exception raised by the operation
+        """
+        if not self.done:
+            raise RuntimeError("%r has not run yet" % self)
+        if self.error is not None:
+            raise self.error
+        return self._value
+
+    def run(self, client):
+        """Call the operation on `client` and keep its result or exception
+
+        :param client: the client to call the operation on
+        :type client: :class:`riakcached.clients.RiakClient`
+        """
+        try:
+            self._value = getattr(client, self.operation)(self.key, *self.args, **self.kwargs)
+        except Exception, e:
+            self.error = e
+        self.done = True
+
+
+class Batch(object):
+    """Records operations on several keys and runs them concurrently
+
+    Operations on different keys run concurrently on at most `workers` threads (greenlets
+    for a :class:`riakcached.green.GeventRiakClient`), operations on the same key run one
+    after the other in the order they were recorded. An exception raised by an operation is
+    kept in its :class:`riakcached.batch.Deferred` and does not stop the other operations.
+
+    Used as a context manager the batch runs when the block exits, unless the block raised.
+
+    Example::
+
+        with client.batch() as batch:
+            user = batch.get("user:1")
+            batch.set("last-seen:1", now)
+            hits = batch.incr("hits")
+        print user.value
+        print batch.errors
+    """
+    __slots__ = ["client", "completed", "pending", "workers"]
+
+    def __init__(self, client, workers=8):
+        """Constructs a new :class:`riakcached.batch.Batch`
+
+        :param client: the client to run the operations with
+        :type client: :class:`riakcached.clients.RiakClient`
+        :param workers: the maximum number of operations running at once
+        :type workers: int
+        """
+        self.client = client
+        self.workers = workers
+        self.pending = []
+        self.completed = []
+
+    def __len__(self):
+        return len(self.pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            self.pending = []
+
+    def _defer(self, operation, key, args, kwargs):
+        deferred = Deferred(operation, key, args, kwargs)
+        self.pending.append(deferred)
+        return deferred
+
+    def get(self, key, *args, **kwargs):
+        """Defer :func:`riakcached.clients.RiakClient.get`
+
+        :returns: :class:`riakcached.batch.Deferred`
+        """
+        return self._defer("get", key, args, kwargs)
+
+    def get_raw(self, key, *args, **kwargs):
+        """Defer :func:`riakcached.clients.RiakClient.get_raw`
+
+        :returns: :class:`riakcached.batch.Deferred`
+        """
+        return self._defer("get_raw", key, args, kwargs)
+
+    def set(self, key, *args, **kwargs):
+        """Defer :func:`riakcached.clients.RiakClient.set`
+
+        :returns: :class:`riakcached.batch.Deferred`
+        """
+        return self._defer("set", key, args, kwargs)
+
+    def set_raw(self, key, *args, **kwargs):
+        """Defer :func:`riakcached.clients.RiakClient.set_raw`
+
+        :returns: :class:`riakcached.batch.Deferred`
+        """
+        return self._defer("set_raw", key, args, kwargs)
+
+    def add(self, key, *args, **kwargs):
+        """Defer :func:`riakcached.clients.RiakClient.add`
+
+        :returns: :class:`riakcached.batch.Deferred`
+        """
+        return self._defer("add", key, args, kwargs)
+
+    def delete(self, key):
+        """Defer :func:`riakcached.clients.RiakClient.delete`
+
+        :returns: :class:`riakcached.batch.Deferred`
+        """
+        return self._defer("delete", key, (), {})
+
+    def incr(self, key, *args, **kwargs):
+        """Defer :func:`riakcached.clients.RiakClient.incr`
+
+        :returns: :class:`riakcached.batch.Deferred`
+        """
+        return self._defer("incr", key, args, kwargs)
+
+    def execute(self):
+        """Run the pending operations
+
+        :returns: list - the :class:`riakcached.batch.Deferred` of every operation that ran,
+            in the order they were recorded
+        """
+        deferreds, self.pending = self.pending, []
+        by_key = collections.OrderedDict()
+        for deferred in deferreds:
+            by_key.setdefault(deferred.key, []).append(deferred)
+
+        def run(operations):
+            for deferred in operations:
+                deferred.run(self.client)
+
+        self.client._map(run, by_key.values(), self.workers)
+        self.completed = deferreds
+        return deferreds
+
+    @property
+    def errors(self):
+        """The operations of the last run which raised an exception
+
+        :returns: list - of :class:`riakcached.batch.Deferred`
+        """
+        return [deferred for deferred in self.completed if deferred.error is not None]
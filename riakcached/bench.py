@@ -0,0 +1,384 @@
+"""A load generator for measuring riakcached and Riak under a configurable workload
+
+A :class:`riakcached.bench.Workload` describes a mix of operations (`get`, `set`, `incr`,
+`get_many`, `set_many` and `delete_many`), how keys are picked (uniformly or following a
+zipfian distribution, where a few keys are much hotter than the rest) and how large values
+are. :class:`riakcached.bench.Benchmark` runs a workload from several threads against a
+client for a fixed duration, reporting the throughput and latency of every interval and a
+latency histogram per operation at the end.
+
+Without `--riak-url` the benchmark runs against a local
+:class:`riakcached.testing.FakeRiakServer`, which is useful for measuring the client itself.
+
+Usage::
+
+    riakcached-bench --mix get=80,set=15,get_many=5 --distribution zipfian --concurrency 32
+    riakcached-bench --riak-url http://riak:8098 --client threaded --duration 60 --preload
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from riakcached.clients import RiakClient
+from riakcached.clients import ThreadedRiakClient
+from riakcached.metrics import LatencyHistogram
+from riakcached.pools import SocketPool
+from riakcached.pools import Urllib3Pool
+from riakcached.testing import FakeRiakServer
+
+
+OPERATIONS = ("get", "set", "incr", "get_many", "set_many", "delete_many")
+CLIENTS = {
+    "simple": RiakClient,
+    "threaded": ThreadedRiakClient,
+}
+POOLS = {
+    "socket": SocketPool,
+    "urllib3": Urllib3Pool,
+}
+
+
+def parse_mix(mix):
+    """Parse an operation mix like `get=80,set=20`
+
+    :param mix: comma separated operation=weight pairs
+    :type mix: str
+    :returns: list - (operation, weight) tuples
+    :raises: ValueError - for unknown operations or invalid weights
+    """
+    parsed = []
+    for part in mix.split(","):
+        operation, _, weight = part.strip().partition("=")
+        if operation not in OPERATIONS:
+            raise ValueError("unknown operation %r" % operation)
+        parsed.append((operation, float(weight or 1)))
+    if not sum(weight for _, weight in parsed) > 0:
+        raise ValueError("the operation weights must add up to more than 0")
+    return parsed
+
+
+class UniformKeys(object):
+    """Picks key indexes uniformly from `[0, count)`
+    """
+    __slots__ = ["count"]
+
+    def __init__(self, count):
+        self.count = count
+
+    def next(self, rng):
+        """Pick a key index
+
+        :param rng: the random number generator to use
+        :type rng: :class:`random.Random`
+        :returns: int - the key index
+        """
+        return rng.randrange(self.count)
+
+
+class ZipfianKeys(object):
+    """Picks key indexes from `[0, count)` following a zipfian distribution
+
+    Index 0 is the most popular, the skew is controlled by `theta`, between 0 and 1 exclusive
+    (0.99 is the common "hot spot" workload). This uses the algorithm from "Quickly Generating
+    Billion-Record Synthetic Databases" (Gray et al.), which needs O(count) setup and O(1) per
+    key.
+    """
+    __slots__ = ["alpha", "count", "eta", "theta", "zeta2", "zetan"]
+
+    def __init__(self, count, theta=0.99):
+        if not 0 < theta < 1:
+            raise ValueError("theta must be between 0 and 1 exclusive, got %r" % (theta, ))
+        self.count = count
+        self.theta = theta
+        self.zeta2 = self._zeta(2)
+        self.zetan = self._zeta(count)
+        self.alpha = 1.0 / (1.0 - theta)
+        self.eta = (1 - (2.0 / count) ** (1 - theta)) / (1 - self.zeta2 / self.zetan)
+
+    def _zeta(self, count):
+        return sum(1.0 / (index ** self.theta) for index in xrange(1, count + 1))
+
+    def next(self, rng):
+        """Pick a key index
+
+        :param rng: the random number generator to use
+        :type rng: :class:`random.Random`
+        :returns: int - the key index
+        """
+        u = rng.random()
+        uz = u * self.zetan
+        if uz < 1.0:
+            return 0
+        if uz < 1.0 + 0.5 ** self.theta:
+            return 1
+        return min(self.count - 1, int(self.count * (self.eta * u - self.eta + 1) ** self.alpha))
+
+
+class Workload(object):
+    """The operations a :class:`riakcached.bench.Benchmark` runs
+    """
+    __slots__ = ["_cumulative", "_total", "batch_size", "keys", "max_value_size", "mix",
+                 "min_value_size"]
+
+    def __init__(self, mix, keys, min_value_size=100, max_value_size=100, batch_size=10):
+        """Constructs a new :class:`riakcached.bench.Workload`
+
+        :param mix: (operation, weight) tuples, see :func:`parse_mix`
+        :type mix: list
+        :param keys: picks the key indexes to use, e.g. :class:`riakcached.bench.ZipfianKeys`
+        :type keys: object
+        :param min_value_size: the minimum size of set values in bytes
+        :type min_value_size: int
+        :param max_value_size: the maximum size of set values in bytes
+        :type max_value_size: int
+        :param batch_size: the number of keys per `*_many` operation
+        :type batch_size: int
+        """
+        self.mix = mix
+        self.keys = keys
+        self.min_value_size = min_value_size
+        self.max_value_size = max_value_size
+        self.batch_size = batch_size
+        self._cumulative = []
+        self._total = 0
+        for operation, weight in mix:
+            self._total += weight
+            self._cumulative.append((self._total, operation))
+
+    def key(self, rng):
+        return "key:%d" % self.keys.next(rng)
+
+    def value(self, rng):
+        return "x" * rng.randint(self.min_value_size, self.max_value_size)
+
+    def operation(self, rng):
+        """Pick the next operation to run
+
+        :param rng: the random number generator to use
+        :type rng: :class:`random.Random`
+        :returns: tuple - the operation name, and a function running it against a client
+        """
+        pick = rng.random() * self._total
+        for threshold, operation in self._cumulative:
+            if pick < threshold:
+                break
+
+        if operation == "get":
+            key = self.key(rng)
+            return operation, lambda client: client.get(key)
+        elif operation == "set":
+            key, value = self.key(rng), self.value(rng)
+            return operation, lambda client: client.set(key, value)
+        elif operation == "incr":
+            key = "counter:%d" % self.keys.next(rng)
+            return operation, lambda client: client.incr(key)
+        keys = [self.key(rng) for _ in xrange(self.batch_size)]
+        if operation == "get_many":
+            return operation, lambda client: client.get_many(keys)
+        elif operation == "set_many":
+            values = dict((key, self.value(rng)) for key in keys)
+            return operation, lambda client: client.set_many(values)
+        return operation, lambda client: client.delete_many(keys)
+
+
+class Benchmark(object):
+    """Runs a :class:`riakcached.bench.Workload` against a client from several threads
+    """
+    __slots__ = ["_errors", "_interval_latencies", "_lock", "client", "concurrency",
+                 "duration", "errors", "interval", "latencies", "output", "workload"]
+
+    def __init__(self, client, workload, concurrency=8, duration=10, interval=1, output=None):
+        """Constructs a new :class:`riakcached.bench.Benchmark`
+
+        :param client: the client to run the workload against
+        :type client: :class:`riakcached.clients.RiakClient`
+        :param workload: the operations to run
+        :type workload: :class:`riakcached.bench.Workload`
+        :param concurrency: the number of threads running operations
+        :type concurrency: int
+        :param duration: how many seconds to run for
+        :type duration: float
+        :param interval: how often to report throughput and latency in seconds
+        :type interval: float
+        :param output: where to write reports to, None to not report
+        :type output: file
+        """
+        self.client = client
+        self.workload = workload
+        self.concurrency = concurrency
+        self.duration = duration
+        self.interval = interval
+        self.output = output
+        self.latencies = dict((operation, LatencyHistogram()) for operation, _ in workload.mix)
+        self.errors = 0
+        self._interval_latencies = LatencyHistogram()
+        self._errors = 0
+        self._lock = threading.Lock()
+
+    def preload(self, count, batch_size=100):
+        """Set the first `count` keys so that reads find values
+
+        :param count: the number of keys to set
+        :type count: int
+        :param batch_size: the number of keys to set at once
+        :type batch_size: int
+        """
+        rng = random.Random(0)
+        for start in xrange(0, count, batch_size):
+            self.client.set_many(dict(
+                ("key:%d" % index, self.workload.value(rng))
+                for index in xrange(start, min(count, start + batch_size))
+            ))
+
+    def _worker(self, deadline, seed):
+        rng = random.Random(seed)
+        while time.time() < deadline:
+            operation, run = self.workload.operation(rng)
+            start = time.time()
+            try:
+                run(self.client)
+                failed = False
+            except Exception:
+                failed = True
+            latency = time.time() - start
+            self.latencies[operation].add(latency)
+            self._interval_latencies.add(latency)
+            if failed:
+                with self._lock:
+                    self._errors += 1
+
+    def _report_interval(self, elapsed, seconds):
+        with self._lock:
+            latencies, self._interval_latencies = self._interval_latencies, LatencyHistogram()
+            errors, self._errors = self._errors, 0
+        self.errors += errors
+        if self.output is not None:
+            self.output.write(
+                "%6.1fs %9.0f ops/s  p50 %8.2fms  p99 %8.2fms  max %8.2fms  errors %d\n" % (
+                    elapsed,
+                    len(latencies) / seconds,
+                    latencies.percentile(50, 0) * 1000,
+                    latencies.percentile(99, 0) * 1000,
+                    latencies.max * 1000,
+                    errors,
+                )
+            )
+            self.output.flush()
+
+    def run(self):
+        """Run the workload for `duration` seconds
+
+        :returns: dict - operation -> :class:`riakcached.metrics.LatencyHistogram`
+        """
+        started = time.time()
+        deadline = started + self.duration
+        threads = [
+            threading.Thread(target=self._worker, args=(deadline, index))
+            for index in xrange(self.concurrency)
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        last = started
+        while time.time() < deadline:
+            time.sleep(max(0, min(last + self.interval, deadline) - time.time()))
+            now = time.time()
+            self._report_interval(now - started, max(now - last, 1e-6))
+            last = now
+        for thread in threads:
+            thread.join()
+        self.errors += self._errors
+        return self.latencies
+
+    def summary(self):
+        """Format the totals and latency histogram of every operation
+
+        :returns: str - the summary
+        """
+        lines = []
+        for operation, _ in self.workload.mix:
+            latencies = self.latencies[operation]
+            count = len(latencies)
+            lines.append("%s: %d ops (%.0f ops/s)  mean %.2fms  p50 %.2fms  p90 %.2fms  "
+                         "p99 %.2fms  max %.2fms" % (
+                             operation,
+                             count,
+                             count / float(self.duration),
+                             latencies.mean(0) * 1000,
+                             latencies.percentile(50, 0) * 1000,
+                             latencies.percentile(90, 0) * 1000,
+                             latencies.percentile(99, 0) * 1000,
+                             latencies.max * 1000,
+                         ))
+            for bound, bucket_count in latencies.buckets():
+                label = "<= %.2fms" % (bound * 1000) if bound is not None else "slower"
+                bar = "#" * int(round(40.0 * bucket_count / count))
+                lines.append("  %12s %9d %s" % (label, bucket_count, bar))
+        lines.append("errors: %d" % self.errors)
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    """Entry point of the `riakcached-bench` command
+    """
+    parser = argparse.ArgumentParser(description="load generator for riakcached and Riak")
+    parser.add_argument("--riak-url", help="the Riak HTTP url, defaults to a local fake server")
+    parser.add_argument("--fake-latency", type=float, default=0,
+                        help="seconds the local fake server delays every request")
+    parser.add_argument("--bucket", default="riakcached-bench", help="the Riak bucket to use")
+    parser.add_argument("--client", choices=sorted(CLIENTS), default="simple",
+                        help="the client class to use")
+    parser.add_argument("--pool", choices=sorted(POOLS), default="urllib3",
+                        help="the connection pool class to use")
+    parser.add_argument("--timeout", type=float, default=2, help="the Riak request timeout")
+    parser.add_argument("--mix", default="get=80,set=20",
+                        help="operation=weight pairs of %s" % ", ".join(OPERATIONS))
+    parser.add_argument("--keys", type=int, default=10000, help="the number of distinct keys")
+    parser.add_argument("--distribution", choices=["uniform", "zipfian"], default="uniform",
+                        help="how keys are picked")
+    parser.add_argument("--theta", type=float, default=0.99, help="the zipfian skew")
+    parser.add_argument("--value-size", default="100",
+                        help="value size in bytes, or a min:max range")
+    parser.add_argument("--batch-size", type=int, default=10, help="keys per *_many operation")
+    parser.add_argument("--concurrency", type=int, default=8, help="threads running operations")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run for")
+    parser.add_argument("--interval", type=float, default=1, help="seconds between reports")
+    parser.add_argument("--preload", action="store_true", help="set every key before starting")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError, e:
+        parser.error(str(e))
+    min_size, _, max_size = args.value_size.partition(":")
+    if args.distribution == "zipfian":
+        try:
+            keys = ZipfianKeys(args.keys, theta=args.theta)
+        except ValueError, e:
+            parser.error(str(e))
+    else:
+        keys = UniformKeys(args.keys)
+    workload = Workload(mix, keys, min_value_size=int(min_size),
+                        max_value_size=int(max_size or min_size), batch_size=args.batch_size)
+
+    fake = None
+    url = args.riak_url
+    if url is None:
+        fake = FakeRiakServer(latency=args.fake_latency).start()
+        url = fake.url
+    try:
+        pool = POOLS[args.pool](base_url=url, timeout=args.timeout, maxsize=args.concurrency)
+        client = CLIENTS[args.client](args.bucket, pool=pool)
+        benchmark = Benchmark(client, workload, concurrency=args.concurrency,
+                              duration=args.duration, interval=args.interval,
+                              output=sys.stdout)
+        if args.preload:
+            benchmark.preload(args.keys)
+        benchmark.run()
+        sys.stdout.write(benchmark.summary() + "\n")
+    finally:
+        if fake is not None:
+            fake.stop()
@@ -0,0 +1,324 @@
+import collections
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+
+SHARED_MAGIC = "RKCSHM01"
+SHARED_HEADER = struct.Struct("<8sIII")
+SHARED_SLOT = struct.Struct("<IiQIIdd")
+SHARED_SEQUENCE = struct.Struct("<I")
+SHARED_ACCESSED = struct.Struct("<d")
+SHARED_ACCESSED_OFFSET = SHARED_SLOT.size - SHARED_ACCESSED.size
+
+
+class LocalCache(object):
+    """A thread safe, in process LRU cache whose entries expire after `ttl` seconds
+
+    Once `maxsize` entries are cached the least recently used entry is evicted.
+    """
+    __slots__ = ["_entries", "_lock", "maxsize", "ttl"]
+
+    def __init__(self, maxsize=10000, ttl=60):
+        """Constructs a new :class:`riakcached.caches.LocalCache`
+
+        :param maxsize: the maximum number of entries to keep
+        :type maxsize: int
+        :param ttl: the number of seconds an entry is kept for
+        :type ttl: float
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def get(self, key, default=None):
+        """Get the cached value of `key`
+
+        :param key: the key to get
+        :type key: str
+        :param default: the value to return when `key` is not cached or has expired
+        :type default: object
+        :returns: object - the cached value or `default`
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires <= time.time():
+                return default
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Cache `value` for `key`
+
+        :param key: the key to cache
+        :type key: str
+        :param value: the value to cache
+        :type value: object
+        :param ttl: the number of seconds to keep the value for, defaults to the cache's `ttl`
+        :type ttl: float
+        """
+        if ttl is None:
+            ttl = self.ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove `key` from the cache
+
+        :param key: the key to remove
+        :type key: str
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry from the cache
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedMemoryCache(object):
+    """An LRU cache with expiring entries shared by every process mapping the same file
+
+    The cache is a fixed size, set associative hash table in a memory mapped file (put it on
+    a `tmpfs` such as `/dev/shm`): each key hashes to a bucket of `ways` slots of
+    `slot_size` bytes, and when a bucket is full the least recently used (or an expired)
+    entry in it is replaced. Keys and values must be `str`, entries which do not fit in a
+    slot are not cached.
+
+    Reads do not lock anything: each slot has a sequence number which writers make odd while
+    they change the slot, and readers treat a slot whose sequence number changed while it
+    was being read (or whose checksum does not match) as a miss. Writers lock the bucket
+    they change with `fcntl.lockf`, so processes can add and remove entries concurrently.
+
+    Every process opening the same `path` with the same settings shares the entries, e.g.
+    all the workers of a prefork server::
+
+        cache = SharedMemoryCache("/dev/shm/riakcached-users", size=256 * 1024 * 1024)
+        client = RiakClient("users", near_cache=cache)
+    """
+    __slots__ = ["_buckets", "_file", "_lock", "_map", "path", "size", "slot_size", "ttl",
+                 "ways"]
+
+    def __init__(self, path, size=64 * 1024 * 1024, slot_size=4096, ways=8, ttl=5):
+        """Constructs a new :class:`riakcached.caches.SharedMemoryCache`
+
+        :param path: the file to map, created when it does not exist
+        :type path: str
+        :param size: the approximate size of the cache in bytes
+        :type size: int
+        :param slot_size: the size of a slot in bytes, which limits the size of an entry
+        :type slot_size: int
+        :param ways: the number of slots per bucket
+        :type ways: int
+        :param ttl: the number of seconds an entry is kept for
+        :type ttl: float
+        :raises: ValueError - when `path` was created with different settings
+        """
+        self.path = path
+        self.slot_size = slot_size
+        self.ways = ways
+        self.ttl = ttl
+        self._buckets = max(1, size // (slot_size * ways))
+        self.size = SHARED_HEADER.size + self._buckets * ways * slot_size
+        self._lock = threading.Lock()
+        self._file = open(path, "a+b")
+        fcntl.lockf(self._file, fcntl.LOCK_EX, SHARED_HEADER.size, 0)
+        try:
+            header = (SHARED_MAGIC, self._buckets, ways, slot_size)
+            if os.fstat(self._file.fileno()).st_size == 0:
+                os.ftruncate(self._file.fileno(), self.size)
+                self._map = mmap.mmap(self._file.fileno(), self.size)
+                SHARED_HEADER.pack_into(self._map, 0, *header)
+            else:
+                self._map = mmap.mmap(self._file.fileno(), self.size)
+                if SHARED_HEADER.unpack_from(self._map, 0) != header:
+                    self._map.close()
+                    raise ValueError("%s was created with different settings" % path)
+        finally:
+            fcntl.lockf(self._file, fcntl.LOCK_UN, SHARED_HEADER.size, 0)
+
+    def __len__(self):
+        now = time.time()
+        count = 0
+        for offset in xrange(SHARED_HEADER.size, self.size, self.slot_size):
+            _, _, _, key_length, _, expires, _ = SHARED_SLOT.unpack_from(self._map, offset)
+            if key_length and expires > now:
+                count += 1
+        return count
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def _hash(self, key):
+        return struct.unpack("<Q", hashlib.md5(key).digest()[:8])[0]
+
+    def _bucket(self, key_hash):
+        start = SHARED_HEADER.size + (key_hash % self._buckets) * self.ways * self.slot_size
+        return start, start + self.ways * self.slot_size
+
+    def get(self, key, default=None):
+        """Get the cached value of `key`
+
+        :param key: the key to get
+        :type key: str
+        :param default: the value to return when `key` is not cached or has expired
+        :type default: object
+        :returns: str - the cached value or `default`
+        """
+        key_hash = self._hash(key)
+        start, end = self._bucket(key_hash)
+        for offset in xrange(start, end, self.slot_size):
+            sequence, checksum, slot_hash, key_length, value_length, expires, _ = (
+                SHARED_SLOT.unpack_from(self._map, offset)
+            )
+            if sequence & 1 or slot_hash != key_hash or key_length != len(key):
+                continue
+            data_offset = offset + SHARED_SLOT.size
+            if self._map[data_offset:data_offset + key_length] != key:
+                continue
+            value = self._map[data_offset + key_length:data_offset + key_length + value_length]
+            if SHARED_SEQUENCE.unpack_from(self._map, offset)[0] != sequence:
+                return default
+            if zlib.crc32(value) != checksum:
+                return default
+            now = time.time()
+            if expires <= now:
+                return default
+            SHARED_ACCESSED.pack_into(self._map, offset + SHARED_ACCESSED_OFFSET, now)
+            return value
+        return default
+
+    def _locked(self, start, end):
+        return _BucketLock(self, start, end)
+
+    def _write(self, offset, sequence, entry=None):
+        # an odd sequence number tells readers the slot is being changed
+        writing = ((sequence + 1) | 1) & 0xffffffff
+        SHARED_SEQUENCE.pack_into(self._map, offset, writing)
+        if entry is None:
+            SHARED_SLOT.pack_into(self._map, offset, writing, 0, 0, 0, 0, 0, 0)
+        else:
+            key_hash, key, value, expires, accessed = entry
+            data_offset = offset + SHARED_SLOT.size
+            self._map[data_offset:data_offset + len(key) + len(value)] = key + value
+            SHARED_SLOT.pack_into(self._map, offset, writing, zlib.crc32(value), key_hash,
+                                  len(key), len(value), expires, accessed)
+        SHARED_SEQUENCE.pack_into(self._map, offset, (writing + 1) & 0xffffffff)
+
+    def set(self, key, value, ttl=None):
+        """Cache `value` for `key`
+
+        :param key: the key to cache
+        :type key: str
+        :param value: the value to cache
+        :type value: str
+        :param ttl: the number of seconds to keep the value for, defaults to the cache's `ttl`
+        :type ttl: float
+        :returns: bool - True if the value was cached, False if it does not fit in a slot
+        """
+        if ttl is None:
+            ttl = self.ttl
+        if SHARED_SLOT.size + len(key) + len(value) > self.slot_size:
+            self.delete(key)
+            return False
+
+        key_hash = self._hash(key)
+        start, end = self._bucket(key_hash)
+        with self._locked(start, end):
+            now = time.time()
+            chosen = None
+            oldest = None
+            for offset in xrange(start, end, self.slot_size):
+                sequence, _, slot_hash, key_length, _, expires, accessed = (
+                    SHARED_SLOT.unpack_from(self._map, offset)
+                )
+                data_offset = offset + SHARED_SLOT.size
+                if (slot_hash == key_hash and key_length == len(key)
+                        and self._map[data_offset:data_offset + key_length] == key):
+                    chosen = offset, sequence
+                    break
+                if not key_length or expires <= now:
+                    accessed = -1
+                if oldest is None or accessed < oldest[0]:
+                    oldest = accessed, offset, sequence
+            if chosen is None:
+                chosen = oldest[1:]
+            offset, sequence = chosen
+            self._write(offset, sequence, (key_hash, key, value, now + ttl, now))
+        return True
+
+    def delete(self, key):
+        """Remove `key` from the cache
+
+        :param key: the key to remove
+        :type key: str
+        """
+        key_hash = self._hash(key)
+        start, end = self._bucket(key_hash)
+        with self._locked(start, end):
+            for offset in xrange(start, end, self.slot_size):
+                sequence, _, slot_hash, key_length, _, _, _ = (
+                    SHARED_SLOT.unpack_from(self._map, offset)
+                )
+                data_offset = offset + SHARED_SLOT.size
+                if (slot_hash == key_hash and key_length == len(key)
+                        and self._map[data_offset:data_offset + key_length] == key):
+                    self._write(offset, sequence)
+
+    def clear(self):
+        """Remove every entry from the cache
+        """
+        with self._locked(SHARED_HEADER.size, self.size):
+            for offset in xrange(SHARED_HEADER.size, self.size, self.slot_size):
+                sequence = SHARED_SEQUENCE.unpack_from(self._map, offset)[0]
+                self._write(offset, sequence)
+
+    def close(self):
+        """Unmap the cache file, the entries stay available to other processes
+        """
+        self._map.close()
+        self._file.close()
+
+
+class _BucketLock(object):
+    __slots__ = ["cache", "end", "start"]
+
+    def __init__(self, cache, start, end):
+        self.cache = cache
+        self.start = start
+        self.end = end
+
+    def __enter__(self):
+        # lockf locks are held per process, so threads of one process also need a lock
+        self.cache._lock.acquire()
+        try:
+            fcntl.lockf(self.cache._file, fcntl.LOCK_EX, self.end - self.start, self.start)
+        except Exception:
+            self.cache._lock.release()
+            raise
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            fcntl.lockf(self.cache._file, fcntl.LOCK_UN, self.end - self.start, self.start)
+        finally:
+            self.cache._lock.release()
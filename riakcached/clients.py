@@ -1,47 +1,389 @@
 __all__ = ["RiakClient", "ThreadedRiakClient"]
 
+import copy
 import json
+import marshal
 import Queue
+import re
 import threading
+import time
+import urllib
+import uuid
+import zlib
 
 from riakcached import exceptions
+from riakcached.batch import Batch
+from riakcached.caches import LocalCache
+from riakcached.expiry import EXPIRES_HEADER
+from riakcached.expiry import expires_at
+from riakcached.expiry import is_expired
+from riakcached.expiry import Reaper
 from riakcached.pools import Urllib3Pool
+from riakcached.serializers import ProcessDeserializer
+from riakcached.serializers import SerializerRegistry
+from riakcached.tracing import NOOP_TRACER
+
+
+MANIFEST_CONTENT_TYPE = "application/x-riakcached-manifest"
+NEAR_CACHE_HEADERS = frozenset(["content-type", "etag", "last-modified"])
+CHUNK_KEY_PATTERN = re.compile(r"^.*\.chunk\.[0-9a-f]{32}\.\d+$", re.DOTALL)
+MAX_QUOTED_KEYS = 10000
+MAX_CACHED_PROPS = 1000
+
+SUCCESS_STATUSES = frozenset([200, 201, 204, 300])
+FOUND_STATUSES = frozenset([200, 300, 304])
+DELETED_STATUSES = frozenset([204, 404])
+# the exception raised for each error status, by kind of request
+READ_ERRORS = {
+    400: exceptions.RiakcachedBadRequest,
+    503: exceptions.RiakcachedServiceUnavailable,
+}
+WRITE_ERRORS = {
+    400: exceptions.RiakcachedBadRequest,
+    412: exceptions.RiakcachedPreconditionFailed,
+}
+COUNTER_ERRORS = {
+    400: exceptions.RiakcachedBadRequest,
+    409: exceptions.RiakcachedConflict,
+}
+BAD_REQUEST_ERRORS = {
+    400: exceptions.RiakcachedBadRequest,
+}
+MAPRED_ERRORS = {
+    400: exceptions.RiakcachedBadRequest,
+    500: exceptions.RiakcachedServiceUnavailable,
+    503: exceptions.RiakcachedServiceUnavailable,
+}
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+OCTET_STREAM_HEADERS = {"Content-Type": "application/octet-stream"}
+
+_quoted_keys = {}
+_content_type_headers = {}
+
+
+def quote_key(key):
+    """Quote a bucket name or key for use in a url
+
+    Every reserved character is quoted, including `/`, `?` and spaces, and `unicode` is
+    encoded as UTF-8 first. The quoted form of recently used keys is cached.
+
+    :param key: the bucket name or key to quote
+    :type key: str
+    :returns: str - the quoted `key`
+    """
+    quoted = _quoted_keys.get(key)
+    if quoted is None:
+        if isinstance(key, unicode):
+            quoted = urllib.quote(key.encode("utf-8"), safe="")
+        else:
+            quoted = urllib.quote(key, safe="")
+        if len(_quoted_keys) >= MAX_QUOTED_KEYS:
+            _quoted_keys.clear()
+        _quoted_keys[key] = quoted
+    return quoted
+
+
+def content_type_headers(content_type):
+    """Get the shared request headers for a Content-Type
+
+    The returned dict is shared by every request with the same Content-Type and must not be
+    modified, copy it to add headers.
+
+    :param content_type: the Content-Type
+    :type content_type: str
+    :returns: dict - the headers
+    """
+    headers = _content_type_headers.get(content_type)
+    if headers is None:
+        headers = {"Content-Type": content_type}
+        if len(_content_type_headers) >= MAX_QUOTED_KEYS:
+            _content_type_headers.clear()
+        _content_type_headers[content_type] = headers
+    return headers
+
+
+def parallel_map(func, items, workers=8):
+    """Call `func` with each of `items` using at most `workers` threads
+
+    :param func: the function to call for each item
+    :type func: function
+    :param items: the items to call `func` with
+    :type items: list
+    :param workers: the maximum number of threads to use
+    :type workers: int
+    :returns: list - the results of each call, in the same order as `items`
+    :raises: the first exception raised by any call to `func`
+    """
+    items = list(items)
+    results = [None] * len(items)
+    errors = []
+    indexes = Queue.Queue()
+    for index in xrange(len(items)):
+        indexes.put(index)
+
+    def worker():
+        while not errors:
+            try:
+                index = indexes.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                results[index] = func(items[index])
+            except Exception, e:
+                errors.append(e)
+
+    threads = []
+    for _ in xrange(min(workers, len(items))):
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+
+class ChunkedStream(object):
+    """A file-like stream over the chunks of a large value, see :func:`RiakClient.get_stream`
+
+    Each chunk is requested only once the previous one has been read, so only one chunk's
+    connection is held at a time.
+    """
+    __slots__ = ["_index", "_stream", "client", "key", "manifest"]
+
+    def __init__(self, client, key, manifest):
+        """Constructs a new :class:`riakcached.clients.ChunkedStream`
+
+        :param client: the client the value was read with
+        :type client: :class:`riakcached.clients.RiakClient`
+        :param key: the key of the value
+        :type key: str
+        :param manifest: the value's manifest
+        :type manifest: dict
+        """
+        self.client = client
+        self.key = key
+        self.manifest = manifest
+        self._index = 0
+        self._stream = None
+
+    def read(self, amt=None):
+        """Read at most `amt` bytes of the value, or the rest of it if `amt` is `None`
+
+        :param amt: the number of bytes to read
+        :type amt: int
+        :returns: str - the data read, an empty string once the value is exhausted
+        :raises: :class:`riakcached.exceptions.RiakcachedNotFound` - when a chunk is missing
+        """
+        if amt is None:
+            return "".join(iter(lambda: self.read(65536), ""))
+        while True:
+            if self._stream is None:
+                if self._index >= self.manifest["chunks"]:
+                    return ""
+                self._stream = self._open_chunk(self._index)
+                self._index += 1
+            data = self._stream.read(amt)
+            if data:
+                return data
+            self._stream.close()
+            self._stream = None
+
+    def __iter__(self):
+        chunk = self.read(65536)
+        while chunk:
+            yield chunk
+            chunk = self.read(65536)
+
+    def close(self):
+        """Release the connection of the chunk being read, if any
+        """
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self._index = self.manifest["chunks"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _open_chunk(self, index):
+        status, stream, _ = self.client.pool.request_stream(
+            method="GET",
+            url=self.client._chunk_url(self.key, self.manifest, index),
+        )
+        if status == 200:
+            return stream
+        stream.close()
+        raise exceptions.RiakcachedNotFound("chunk %d of %r is missing" % (index, self.key))
 
 
 class RiakClient(object):
     """A Memcache like client to the Riak HTTP Interface
     """
     __slots__ = [
-        "_serializers",
-        "_deserializers",
+        "_bucket",
+        "_bucket_url",
+        "_counters_url",
+        "_handles",
+        "_keys_url",
         "base_url",
-        "bucket",
+        "chunk_size",
+        "chunk_threshold",
+        "chunk_workers",
+        "near_cache",
+        "negative_cache",
         "pool",
+        "props_cache",
+        "reaper",
+        "serializers",
+        "tracer",
     ]
 
-    def __init__(self, bucket, pool=None):
+    def __init__(self, bucket, pool=None, chunk_threshold=None, chunk_size=1048576,
+                 chunk_workers=8, reap_expired=True, negative_cache_ttl=None,
+                 negative_cache_size=10000, serializers=None, near_cache=None, props_ttl=None,
+                 tracer=None):
         """Constructor for a new :class:`riakcached.clients.RiakClient`
 
         Pool - if no pool is provided then a default :class:`riakcached.pools.Urllib3Pool` is used
 
+        Large values - when `chunk_threshold` is set, serialized values larger than
+        `chunk_threshold` bytes are split into `chunk_size` byte chunks stored under their own
+        keys, and the key itself holds a small manifest describing the chunks.
+        :func:`get`, :func:`set` and :func:`delete` handle the chunks transparently. To find the
+        chunks of a previous value which have to be removed, every set or delete of a key then
+        costs an extra HEAD request (and a GET of the manifest if the value was chunked).
+
+        Negative caching - when `negative_cache_ttl` is set, keys which were not found are
+        remembered for `negative_cache_ttl` seconds and :func:`get` and :func:`get_many` return
+        None for them without a request. Setting or incrementing a key through this client
+        forgets that it was not found.
+
+        Near caching - when a `near_cache` is given, values fetched by :func:`get` (and
+        :func:`get_raw`) are kept in it until its ttl or their own expiry, and read from it
+        instead of Riak. Setting or deleting a key through this client removes it from the
+        cache, changes made by other hosts are only seen once the entry expires. Use a
+        :class:`riakcached.caches.SharedMemoryCache` to share the cache between processes.
+
+        Bucket properties - when `props_ttl` is set, :func:`props` is cached for `props_ttl`
+        seconds. :func:`set_props` through this client (or any of its :func:`for_bucket`
+        handles) invalidates the cached properties of the bucket.
+
+        Tracing - every operation runs in a span of `tracer` named after it
+        (`riakcached.get`, `riakcached.set_many`, ...) and tagged with the bucket and a hash
+        of the key, see :mod:`riakcached.tracing`. The requests of `*_many` operations made
+        from other threads are children of the operation's span. Pass the same tracer to
+        the pool to trace its requests too.
+
         :param bucket: The name of the Riak bucket to use
         :type bucket: str
         :param pool: The :class:`riakcached.pools.Pool` to use for requests
         :type pool: :class:`riakcached.pools.Pool`
+        :param chunk_threshold: the size in bytes above which values are chunked, None disables
+        :type chunk_threshold: int
+        :param chunk_size: the size in bytes of each chunk of a large value
+        :type chunk_size: int
+        :param chunk_workers: the number of threads used to read or write chunks in parallel
+        :type chunk_workers: int
+        :param reap_expired: whether to delete expired keys found by :func:`get` in the background
+        :type reap_expired: bool
+        :param negative_cache_ttl: how many seconds to remember missing keys for, None disables
+        :type negative_cache_ttl: float
+        :param negative_cache_size: the maximum number of missing keys to remember
+        :type negative_cache_size: int
+        :param serializers: the serializers to use, defaults to a new
+            :class:`riakcached.serializers.SerializerRegistry`
+        :type serializers: :class:`riakcached.serializers.SerializerRegistry`
+        :param near_cache: the cache to keep fetched values in, None disables
+        :type near_cache: :class:`riakcached.caches.SharedMemoryCache`
+        :param props_ttl: how many seconds to cache bucket properties for, None disables
+        :type props_ttl: float
+        :param tracer: the tracer to record operations with, None disables
+        :type tracer: :class:`riakcached.tracing.Tracer`
         """
         if pool is None:
             self.pool = Urllib3Pool()
         else:
             self.pool = pool
 
-        self.bucket = bucket
         self.base_url = self.pool.url.rstrip("/")
-        self._serializers = {
-            "application/json": json.dumps,
-        }
-        self._deserializers = {
-            "application/json": json.loads,
-        }
+        self.bucket = bucket
+        self.chunk_threshold = chunk_threshold
+        self.chunk_size = chunk_size
+        self.chunk_workers = chunk_workers
+        self.reaper = None
+        if reap_expired:
+            self.reaper = Reaper(self)
+        self.negative_cache = None
+        if negative_cache_ttl:
+            self.negative_cache = LocalCache(maxsize=negative_cache_size, ttl=negative_cache_ttl)
+        self.near_cache = near_cache
+        self.props_cache = None
+        if props_ttl:
+            self.props_cache = LocalCache(maxsize=MAX_CACHED_PROPS, ttl=props_ttl)
+        if serializers is None:
+            self.serializers = SerializerRegistry()
+        else:
+            self.serializers = serializers
+        self.tracer = tracer or NOOP_TRACER
+        self._handles = {bucket: self}
+
+    def for_bucket(self, bucket):
+        """Get a client for another bucket sharing this client's pool and settings
+
+        The returned client shares the connection pool, serializers, near cache and cached
+        bucket properties and expired key reaper with this client, and has its own negative
+        cache. Handles are created once per bucket and reused, so this can be called for every
+        request.
+
+        Example::
+
+            client = RiakClient("users", pool=pool, props_ttl=60)
+            client.for_bucket("sessions").get(session_id)
+
+        :param bucket: the name of the Riak bucket
+        :type bucket: str
+        :returns: :class:`riakcached.clients.RiakClient` - a client of the same class for
+            `bucket`
+        """
+        handle = self._handles.get(bucket)
+        if handle is None:
+            handle = copy.copy(self)
+            handle.bucket = bucket
+            if self.negative_cache is not None:
+                handle.negative_cache = LocalCache(
+                    maxsize=self.negative_cache.maxsize, ttl=self.negative_cache.ttl,
+                )
+            handle = self._handles.setdefault(bucket, handle)
+        return handle
+
+    @property
+    def bucket(self):
+        """The name of the Riak bucket the client uses
+        """
+        return self._bucket
+
+    @bucket.setter
+    def bucket(self, bucket):
+        self._bucket = bucket
+        self._bucket_url = "%s/buckets/%s" % (self.base_url, quote_key(bucket))
+        self._keys_url = self._bucket_url + "/keys/"
+        self._counters_url = self._bucket_url + "/counters/"
+
+    @property
+    def _serializers(self):
+        return self.serializers.serializers
+
+    @property
+    def _deserializers(self):
+        return self.serializers.deserializers
 
     def add_serializer(self, content_type, serializer):
         """Add a content-type serializer to the client
@@ -65,8 +407,7 @@ class RiakClient(object):
         :param serializer: the serializer function to use with `content_type`
         :type serializer: function
         """
-        content_type = content_type.lower()
-        self._serializers[content_type] = serializer
+        self.serializers.add_serializer(content_type, serializer)
 
     def add_deserializer(self, content_type, deserializer):
         """Add a content-type deserializer to the client
@@ -88,14 +429,14 @@ class RiakClient(object):
         :param deserializer: the deserializer function to use with `content_type`
         :type deserializer: function
         """
-        content_type = content_type.lower()
-        self._deserializers[content_type] = deserializer
+        self.serializers.add_deserializer(content_type, deserializer)
 
     def serialize(self, data, content_type):
         """Serialize the provided `data` to `content_type`
 
         This method will lookup the registered serializer for the provided Content-Type
-        (defaults to str(data)) and passes `data` through the serializer.
+        (defaults to str(data)) and passes `data` through the serializer, see
+        :class:`riakcached.serializers.SerializerRegistry`.
 
         :param data: the data to serialize
         :type data: object
@@ -103,14 +444,15 @@ class RiakClient(object):
         :type content_type: str
         :returns: str - the serialized data
         """
-        serializer = self._serializers.get(content_type, str)
-        return serializer(data)
+        return self.serializers.serialize(data, content_type)
 
     def deserialize(self, data, content_type):
         """Deserialize the provided `data` from `content_type`
 
         This method will lookup the registered deserializer for the provided Content-Type
-        (defaults to str(data)) and passes `data` through the deserializer.
+        (defaults to str(data)) and passes `data` through the deserializer. Content-Type
+        parameters such as `; charset=utf-8` are ignored, see
+        :class:`riakcached.serializers.SerializerRegistry`.
 
         :param data: the data to deserialize
         :type data: str
@@ -118,93 +460,283 @@ class RiakClient(object):
         :type content_type: str
         :returns: object - whatever the deserializer returns
         """
-        deserializer = self._deserializers.get(content_type, str)
-        return deserializer(data)
+        return self.serializers.deserialize(data, content_type)
 
-    def get(self, key, counter=False):
+    def batch(self, workers=8):
+        """Record operations to run concurrently, see :class:`riakcached.batch.Batch`
+
+        Example::
+
+            with client.batch() as batch:
+                user = batch.get("user:1")
+                hits = batch.incr("hits")
+            print user.value
+
+        :param workers: the maximum number of operations running at once
+        :type workers: int
+        :returns: :class:`riakcached.batch.Batch`
+        """
+        return Batch(self, workers)
+
+    def get(self, key, counter=False, lazy=False):
         """Get the value of the key from the client's `bucket`
 
         :param key: the key to get from the bucket
         :type key: str
         :param counter: whether or not the `key` is a counter
         :type counter: bool
+        :param lazy: whether to return a :class:`riakcached.serializers.LazyValue` which is
+            only deserialized when its `value` is first accessed
+        :type lazy: bool
         :returns: object - the deserialized value of `key`
-        :returns: None - if the call was not successful or the key was not found
+        :returns: None - if the call was not successful, the key was not found or has expired
         :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
         :raises: :class:`riakcached.exceptions.RiakcachedServiceUnavailable`
         """
-        url = "%s/buckets/%s/keys/%s" % (self.base_url, self.bucket, key)
-        if counter:
-            url = "%s/buckets/%s/counters/%s" % (self.base_url, self.bucket, key)
-        status, data, headers = self.pool.request(method="GET", url=url)
-        if status == 400:
-            raise exceptions.RiakcachedBadRequest(data)
-        elif status == 503:
-            raise exceptions.RiakcachedServiceUnavailable(data)
+        with self.tracer.span("riakcached.get", self._bucket, key):
+            result = self._get_raw(key, counter)
+            if result is None:
+                return None
+            data, headers = result
+            if lazy:
+                return self.serializers.lazy(data, headers.get("content-type", "text/plain"))
+            return self.deserialize(data, headers.get("content-type", "text/plain"))
+
+    def get_raw(self, key, counter=False):
+        """Get the raw value and response headers of the key from the client's `bucket`
+
+        Expired keys and chunked values are handled like in :func:`get`, but the value is not
+        deserialized. For chunked values the returned `content-type` header is the value's
+        Content-Type rather than the manifest's.
 
-        if status not in (200, 300, 304):
-            return None
+        :param key: the key to get from the bucket
+        :type key: str
+        :param counter: whether or not the `key` is a counter
+        :type counter: bool
+        :returns: tuple - the raw value of `key` and the response headers (lower case names)
+        :returns: None - if the call was not successful, the key was not found or has expired
+        :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
+        :raises: :class:`riakcached.exceptions.RiakcachedServiceUnavailable`
+        """
+        with self.tracer.span("riakcached.get_raw", self._bucket, key):
+            return self._get_raw(key, counter)
 
-        return self.deserialize(data, headers.get("content-type", "text/plain"))
+    def get_stream(self, key):
+        """Get a stream of the raw value of the key from the client's `bucket`
+
+        The value is not read from the server until the stream is read from or iterated over,
+        the stream should be closed (or used as a context manager) once it is no longer needed
+        so that the underlying connection can be reused. Chunked values (see `chunk_threshold`)
+        are streamed a chunk at a time through a :class:`riakcached.clients.ChunkedStream`.
+
+        Example::
+
+            with client.get_stream("big-key") as stream:
+                for chunk in stream:
+                    output.write(chunk)
+
+        :param key: the key to get from the bucket
+        :type key: str
+        :returns: :class:`riakcached.pools.StreamingResponse` - the raw value of `key`
+        :returns: :class:`riakcached.clients.ChunkedStream` - the raw value of a chunked `key`
+        :returns: None - if the call was not successful, the key was not found or has expired
+        :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
+        :raises: :class:`riakcached.exceptions.RiakcachedServiceUnavailable`
+        """
+        with self.tracer.span("riakcached.get_stream", self._bucket, key):
+            status, stream, headers = self.pool.request_stream(
+                method="GET",
+                url=self._keys_url + quote_key(key),
+            )
+            if status in FOUND_STATUSES:
+                if is_expired(headers):
+                    self._expired(key)
+                    stream.close()
+                    return None
+                if headers.get("content-type") == MANIFEST_CONTENT_TYPE:
+                    manifest = json.loads(stream.read())
+                    stream.close()
+                    return ChunkedStream(self, key, manifest)
+                return stream
+
+            data = stream.read()
+            stream.close()
+            if status in READ_ERRORS:
+                raise READ_ERRORS[status](data)
+            return None
 
-    def get_many(self, keys):
+    def get_many(self, keys, lazy=False):
         """Get the value of multiple keys at once from the client's `bucket`
 
         :param keys: the list of keys to get
         :type keys: list
+        :param lazy: whether to return :class:`riakcached.serializers.LazyValue` values, see
+            :func:`get`
+        :type lazy: bool
         :returns: dict - the keys are the keys provided and the values are the results from calls
             to :func:`get`, except keys whose values are `None` are not included in the result
         :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
         :raises: :class:`riakcached.exceptions.RiakcachedServiceUnavailable`
         """
-        results = dict((key, self.get(key)) for key in keys)
-        return dict((key, value) for key, value in results.iteritems() if value is not None)
+        with self.tracer.span("riakcached.get_many", self._bucket, keys):
+            results = dict((key, self.get(key, lazy=lazy)) for key in keys)
+            return dict((key, value) for key, value in results.iteritems() if value is not None)
 
-    def set(self, key, value, content_type="text/plain"):
+    def set(self, key, value, content_type="text/plain", time=0, meta=None):
         """Set the value of a key for the client's `bucket`
 
+        Expiry - like memcached, `time` is either a number of seconds (up to 30 days) or a unix
+        timestamp after which the key expires. The expiry is stored in the object's metadata,
+        :func:`get` treats expired keys as missing without deserializing them and queues them
+        to be deleted in the background.
+
         :param key: the key to set the value for
         :type key: str
         :param value: the value to set, this will get serialized for the `content_type`
         :type value: object
         :param content_type: the Content-Type for `value`
         :type content_type: str
+        :param time: when the key expires, 0 for never
+        :type time: int
+        :param meta: user metadata to store with the value as `X-Riak-Meta-*` headers
+        :type meta: dict
         :returns: bool - True if the call is successful, False otherwise
         :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
         :raises: :class:`riakcached.exceptions.RiakcachedPreconditionFailed`
         """
-        value = self.serialize(value, content_type)
+        with self.tracer.span("riakcached.set", self._bucket, key):
+            return self._set_raw(
+                key, self.serialize(value, content_type), content_type, time, meta,
+            )
 
-        status, data, _ = self.pool.request(
-            method="POST",
-            url="%s/buckets/%s/keys/%s" % (self.base_url, self.bucket, key),
-            body=value,
-            headers={
-                "Content-Type": content_type,
-            },
-        )
-        if status == 400:
-            raise exceptions.RiakcachedBadRequest(data)
-        elif status == 412:
-            raise exceptions.RiakcachedPreconditionFailed(data)
-        return status in (200, 201, 204, 300)
+    def set_raw(self, key, value, content_type="application/octet-stream", time=0, meta=None,
+                etag=None):
+        """Set the raw value of a key for the client's `bucket`
+
+        Like :func:`set`, including expiry and chunking, but `data` is stored as is rather
+        than being serialized, see :func:`get_raw`. With an `etag`, from the headers returned
+        by :func:`get_raw`, the value is only stored if the object was not changed since
+        (`If-Match`), for read-modify-write updates.
+
+        :param key: the key to set the value for
+        :type key: str
+        :param value: the raw value to set
+        :type value: str
+        :param content_type: the Content-Type for `value`
+        :type content_type: str
+        :param time: when the key expires, 0 for never, see :func:`set`
+        :type time: int
+        :param meta: user metadata to store with the value as `X-Riak-Meta-*` headers
+        :type meta: dict
+        :param etag: only store the value if the object's ETag is still `etag`
+        :type etag: str
+        :returns: bool - True if the call is successful, False otherwise
+        :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
+        :raises: :class:`riakcached.exceptions.RiakcachedPreconditionFailed` - also when the
+            object was changed since `etag`
+        """
+        with self.tracer.span("riakcached.set_raw", self._bucket, key):
+            return self._set_raw(key, value, content_type, time, meta, etag)
+
+    def add(self, key, value, content_type="text/plain", time=0, meta=None):
+        """Set the value of a key for the client's `bucket` only if the key does not exist yet
+
+        This uses a conditional request (`If-None-Match: *`), since Riak is eventually
+        consistent two concurrent calls can both succeed during a network partition.
+
+        :param key: the key to set the value for
+        :type key: str
+        :param value: the value to set, this will get serialized for the `content_type`
+        :type value: object
+        :param content_type: the Content-Type for `value`
+        :type content_type: str
+        :param time: when the key expires, 0 for never, see :func:`set`
+        :type time: int
+        :param meta: user metadata to store with the value as `X-Riak-Meta-*` headers
+        :type meta: dict
+        :returns: bool - True if the value was set, False if the key already exists or the call
+            was not successful
+        :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
+        """
+        with self.tracer.span("riakcached.add", self._bucket, key):
+            self._found(key)
+            headers = dict(self._store_headers(content_type, time, meta))
+            headers["If-None-Match"] = "*"
+
+            try:
+                status, data, _ = self.pool.request(
+                    method="POST",
+                    url=self._keys_url + quote_key(key),
+                    body=self.serialize(value, content_type),
+                    headers=headers,
+                )
+            finally:
+                self._forget(key)
+            if status in BAD_REQUEST_ERRORS:
+                raise BAD_REQUEST_ERRORS[status](data)
+            return status in SUCCESS_STATUSES
+
+    def set_stream(self, key, data, content_type="application/octet-stream"):
+        """Set the raw value of a key for the client's `bucket` without buffering it
+
+        `data` is sent to the server in chunks and can be a file-like object, a `memoryview`,
+        an `mmap.mmap` (or anything else supporting the buffer interface) or an iterable of
+        `str` chunks, see :func:`riakcached.pools.iter_chunks`. `data` is not serialized or
+        chunked, but the chunks of a previous chunked value of `key` are deleted.
 
-    def set_many(self, values, content_type="text/plain"):
+        :param key: the key to set the value for
+        :type key: str
+        :param data: the raw value to set
+        :type data: object
+        :param content_type: the Content-Type for `data`
+        :type content_type: str
+        :returns: bool - True if the call is successful, False otherwise
+        :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
+        :raises: :class:`riakcached.exceptions.RiakcachedPreconditionFailed`
+        """
+        with self.tracer.span("riakcached.set_stream", self._bucket, key):
+            self._found(key)
+            old_manifest = None
+            if self.chunk_threshold is not None:
+                old_manifest = self._get_manifest(key)
+            try:
+                status, stream, _ = self.pool.request_stream(
+                    method="POST",
+                    url=self._keys_url + quote_key(key),
+                    body=data,
+                    headers=content_type_headers(content_type),
+                )
+                data = stream.read()
+                stream.close()
+            finally:
+                self._forget(key)
+            if status in WRITE_ERRORS:
+                raise WRITE_ERRORS[status](data)
+            if status not in SUCCESS_STATUSES:
+                return False
+            if old_manifest is not None:
+                self._delete_chunks(key, old_manifest)
+            return True
+
+    def set_many(self, values, content_type="text/plain", time=0):
         """Set the value of multiple keys at once for the client's `bucket`
 
         :param values: the key -> value pairings for the keys to set
         :type values: dict
         :param content_type: the Content-Type for all of the values provided
         :type content_type: str
+        :param time: when the keys expire, 0 for never, see :func:`set`
+        :type time: int
         :returns: dict - the keys are the keys provided and the values are True or False from
             the calls to :func:`set`
         :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
         :raises: :class:`riakcached.exceptions.RiakcachedPreconditionFailed`
         """
-        return dict(
-            (key, self.set(key, value, content_type))
-            for key, value in values.iteritems()
-        )
+        with self.tracer.span("riakcached.set_many", self._bucket, values):
+            return dict(
+                (key, self.set(key, value, content_type, time))
+                for key, value in values.iteritems()
+            )
 
     def delete(self, key):
         """Delete the provided key from the client's `bucket`
@@ -214,13 +746,21 @@ class RiakClient(object):
         :returns: bool - True if the key was removed, False otherwise
         :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
         """
-        status, data, _ = self.pool.request(
-            method="DELETE",
-            url="%s/buckets/%s/keys/%s" % (self.base_url, self.bucket, key),
-        )
-        if status == 400:
-            raise exceptions.RiakcachedBadRequest(data)
-        return status in (204, 404)
+        with self.tracer.span("riakcached.delete", self._bucket, key):
+            manifest = None
+            if self.chunk_threshold is not None:
+                manifest = self._get_manifest(key)
+
+            status, data, _ = self.pool.request(
+                method="DELETE",
+                url=self._keys_url + quote_key(key),
+            )
+            self._forget(key)
+            if status in BAD_REQUEST_ERRORS:
+                raise BAD_REQUEST_ERRORS[status](data)
+            if manifest is not None:
+                self._delete_chunks(key, manifest)
+            return status in DELETED_STATUSES
 
     def delete_many(self, keys):
         """Delete multiple keys at once from the client's `bucket`
@@ -231,7 +771,8 @@ class RiakClient(object):
             the calls to :func:`delete`
         :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
         """
-        return dict((key, self.delete(key)) for key in keys)
+        with self.tracer.span("riakcached.delete_many", self._bucket, keys):
+            return dict((key, self.delete(key)) for key in keys)
 
     def stats(self):
         """Get the server stats
@@ -239,27 +780,37 @@ class RiakClient(object):
         :returns: dict - the stats from the server
         :returns: None - when the call is not successful
         """
-        status, data, _ = self.pool.request(
-            method="GET",
-            url="%s/stats" % self.base_url,
-        )
-        if status == 200:
-            return self.deserialize(data, "application/json")
-        return None
+        with self.tracer.span("riakcached.stats", self._bucket):
+            status, data, _ = self.pool.request(
+                method="GET",
+                url="%s/stats" % self.base_url,
+            )
+            if status == 200:
+                return self.deserialize(data, "application/json")
+            return None
 
     def props(self):
         """Get the properties for the client's `bucket`
 
+        The properties are cached when the client was created with `props_ttl`.
+
         :returns: dict - the `bucket`'s set properties
         :returns: None - when the call is not successful
         """
-        status, data, _ = self.pool.request(
-            method="GET",
-            url="%s/buckets/%s/props" % (self.base_url, self.bucket),
-        )
-        if status == 200:
-            return json.loads(data)
-        return None
+        with self.tracer.span("riakcached.props", self._bucket):
+            if self.props_cache is not None:
+                data = self.props_cache.get(self.bucket)
+                if data is not None:
+                    return json.loads(data)
+            status, data, _ = self.pool.request(
+                method="GET",
+                url=self._bucket_url + "/props",
+            )
+            if status == 200:
+                if self.props_cache is not None:
+                    self.props_cache.set(self.bucket, data)
+                return json.loads(data)
+            return None
 
     def set_props(self, props):
         """Set the properties for the client's `bucket`
@@ -268,40 +819,217 @@ class RiakClient(object):
         :type props: dict
         :returns: bool - True if it is successful otherwise False
         """
-        status, _, _ = self.pool.request(
-            method="PUT",
-            url="%s/buckets/%s/props" % (self.base_url, self.bucket),
-            body=self.serialize(props, "application/json"),
-            headers={
-                "Content-Type": "application/json",
-            }
-        )
-        return status == 200
+        with self.tracer.span("riakcached.set_props", self._bucket):
+            status, _, _ = self.pool.request(
+                method="PUT",
+                url=self._bucket_url + "/props",
+                body=self.serialize(props, "application/json"),
+                headers=JSON_HEADERS,
+            )
+            if self.props_cache is not None:
+                self.props_cache.delete(self.bucket)
+            return status == 200
 
     def keys(self):
         """Get a list of all keys
 
+        Chunks of large values (see `chunk_threshold`) are skipped, like in :func:`iter_keys`.
+
         :returns: list - list of keys on the server
         :returns: None - when the call is not successful
         """
-        status, data, _ = self.pool.request(
-            method="GET",
-            url="%s/buckets/%s/keys?keys=true" % (self.base_url, self.bucket),
-        )
-        if status == 200:
-            return self.deserialize(data, "application/json")
-        return None
+        with self.tracer.span("riakcached.keys", self._bucket):
+            status, data, _ = self.pool.request(
+                method="GET",
+                url=self._bucket_url + "/keys?keys=true",
+            )
+            if status != 200:
+                return None
+            result = self.deserialize(data, "application/json")
+            if isinstance(result, dict):
+                result["keys"] = self._without_chunks(result.get("keys", []))
+                return result
+            return self._without_chunks(result)
+
+    def iter_keys(self):
+        """Stream the keys of the client's `bucket` without loading them all at once
+
+        Chunks of large values (see `chunk_threshold`) are skipped.
+
+        Traced as a `riakcached.iter_keys` span around the request opening the key stream,
+        rather than the whole iteration, so that the span is not left active (collecting the
+        caller's operations) between keys.
+
+        :returns: generator - yields every `str` key in the bucket
+        :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
+        :raises: :class:`riakcached.exceptions.RiakcachedServiceUnavailable`
+        """
+        with self.tracer.span("riakcached.iter_keys", self._bucket):
+            status, stream, _ = self.pool.request_stream(
+                method="GET",
+                url=self._bucket_url + "/keys?keys=stream",
+            )
+            if status != 200:
+                data = stream.read()
+                stream.close()
+                if status in READ_ERRORS:
+                    raise READ_ERRORS[status](data)
+                return
+
+        try:
+            decoder = json.JSONDecoder()
+            buffered = ""
+            for chunk in stream:
+                buffered += chunk
+                while True:
+                    buffered = buffered.lstrip()
+                    try:
+                        message, end = decoder.raw_decode(buffered)
+                    except ValueError:
+                        break
+                    buffered = buffered[end:]
+                    for key in message.get("keys", []):
+                        if isinstance(key, unicode):
+                            key = key.encode("utf-8")
+                        if not CHUNK_KEY_PATTERN.match(key):
+                            yield key
+        finally:
+            stream.close()
+
+    def scan(self, prefix=None, key_filters=None, window=8, partition=None, lazy=False):
+        """Iterate over every object of the client's `bucket`, fetching values concurrently
+
+        Keys are streamed (see :func:`iter_keys`) rather than listed at once. With a `prefix`
+        or `key_filters` (Riak key filters, e.g. ``[["ends_with", ":draft"]]``) the keys are
+        selected by a MapReduce job instead, so only the matching keys leave the cluster.
+
+        Values are fetched with :func:`get`, `window` keys at a time. Keys whose values are
+        missing or expired by the time they are fetched are skipped. Every batch of values,
+        and the MapReduce request, is traced as a `riakcached.scan` span, see
+        :func:`iter_keys`.
+
+        To split a scan across processes, or machines, give each of `count` workers its own
+        ``partition=(index, count)``: worker `index` only fetches the keys whose crc32 modulo
+        `count` is `index`, so every key is handled by exactly one worker::
+
+            def reprocess(index):
+                for key, value in client.scan(partition=(index, 4)):
+                    ...
+
+            multiprocessing.Pool(4).map(reprocess, range(4))
+
+        :param prefix: only scan keys starting with `prefix`
+        :type prefix: str
+        :param key_filters: only scan keys matching these Riak key filters
+        :type key_filters: list
+        :param window: the maximum number of values fetched at once
+        :type window: int
+        :param partition: ``(index, count)``, only scan the `index`-th of `count` partitions
+        :type partition: tuple
+        :param lazy: whether to yield :class:`riakcached.serializers.LazyValue` values, see
+            :func:`get`
+        :type lazy: bool
+        :returns: generator - yields ``(key, value)`` pairs
+        :raises: ValueError - when `partition` is not a valid ``(index, count)``
+        :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
+        :raises: :class:`riakcached.exceptions.RiakcachedServiceUnavailable`
+        """
+        if partition is not None:
+            index, count = partition
+            if count < 1 or not 0 <= index < count:
+                raise ValueError("invalid partition %r" % (partition, ))
+
+        if prefix is not None:
+            filters = [["starts_with", prefix]]
+            if key_filters:
+                filters = [["and", filters, key_filters]]
+            key_filters = filters
+        if key_filters:
+            keys = self._filter_keys(key_filters)
+        else:
+            keys = self.iter_keys()
+
+        batch = []
+        for key in keys:
+            if partition is not None and (zlib.crc32(key) & 0xffffffff) % count != index:
+                continue
+            batch.append(key)
+            if len(batch) >= window:
+                for pair in self._scan_batch(batch, window, lazy):
+                    yield pair
+                batch = []
+        for pair in self._scan_batch(batch, window, lazy):
+            yield pair
+
+    def _scan_batch(self, keys, window, lazy):
+        if not keys:
+            return []
+        with self.tracer.span("riakcached.scan", self._bucket, keys):
+            values = self._map(lambda key: self.get(key, lazy=lazy), keys, window)
+            return [(key, value) for key, value in zip(keys, values) if value is not None]
+
+    def _filter_keys(self, key_filters):
+        # a reduce_identity job returns the [bucket, key] inputs matching the key filters,
+        # streamed as multipart/mixed parts of {"phase": 0, "data": [...]}
+        job = {
+            "inputs": {"bucket": self.bucket, "key_filters": key_filters},
+            "query": [{"reduce": {
+                "language": "erlang",
+                "module": "riak_kv_mapreduce",
+                "function": "reduce_identity",
+                "keep": True,
+            }}],
+        }
+        with self.tracer.span("riakcached.scan", self._bucket):
+            status, stream, headers = self.pool.request_stream(
+                method="POST",
+                url=self.base_url + "/mapred?chunked=true",
+                body=json.dumps(job),
+                headers=JSON_HEADERS,
+            )
+            if status != 200:
+                data = stream.read()
+                stream.close()
+                if status in MAPRED_ERRORS:
+                    raise MAPRED_ERRORS[status](data)
+                return
+
+        try:
+            boundary = headers.get("content-type", "").partition("boundary=")[2].strip('"')
+            delimiter = "\r\n--" + boundary
+            buffered = "\r\n"
+            for chunk in stream:
+                buffered += chunk
+                while True:
+                    start = buffered.find(delimiter)
+                    end = buffered.find(delimiter, start + len(delimiter))
+                    if start < 0 or end < 0:
+                        break
+                    part = buffered[start + len(delimiter):end]
+                    buffered = buffered[end:]
+                    body = part.partition("\r\n\r\n")[2]
+                    if not body.strip():
+                        continue
+                    for item in json.loads(body).get("data", []):
+                        key = item[1]
+                        if isinstance(key, unicode):
+                            key = key.encode("utf-8")
+                        if not CHUNK_KEY_PATTERN.match(key):
+                            yield key
+        finally:
+            stream.close()
 
     def ping(self):
         """Ping the server to ensure it is up
 
         :returns: bool - True if it is successful, False otherwise
         """
-        status, _, _ = self.pool.request(
-            method="GET",
-            url="%s/ping" % self.base_url,
-        )
-        return status == 200
+        with self.tracer.span("riakcached.ping", self._bucket):
+            status, _, _ = self.pool.request(
+                method="GET",
+                url="%s/ping" % self.base_url,
+            )
+            return status == 200
 
     def incr(self, key, value=1):
         """Increment the counter with the provided key
@@ -314,16 +1042,255 @@ class RiakClient(object):
         :raises: :class:`riakcached.exceptions.RiakcachedConflict`
         :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
         """
+        with self.tracer.span("riakcached.incr", self._bucket, key):
+            self._found(key)
+            status, data, _ = self.pool.request(
+                method="POST",
+                url=self._counters_url + quote_key(key),
+                body=str(value),
+            )
+            if status in COUNTER_ERRORS:
+                raise COUNTER_ERRORS[status](data)
+            return status in SUCCESS_STATUSES
+
+    def close(self):
+        """Close the client's connection pool and stop its expired key reaper
+
+        The pool and reaper are shared with the client's :func:`for_bucket` handles, which
+        can no longer be used either.
+        """
+        if self.reaper is not None:
+            self.reaper.stop()
+        self.pool.close()
+
+    def _get_raw(self, key, counter):
+        url = self._keys_url + quote_key(key)
+        if counter:
+            url = self._counters_url + quote_key(key)
+        elif self.negative_cache is not None and key in self.negative_cache:
+            return None
+        elif self.near_cache is not None:
+            cached = self.near_cache.get(self._near_cache_key(key))
+            if cached is not None:
+                return marshal.loads(cached)
+        status, data, headers = self.pool.request(method="GET", url=url)
+        if status in READ_ERRORS:
+            raise READ_ERRORS[status](data)
+
+        if status not in FOUND_STATUSES:
+            if status == 404 and not counter:
+                self._not_found(key)
+            return None
+        if not counter and is_expired(headers):
+            self._expired(key)
+            return None
+
+        if headers.get("content-type") == MANIFEST_CONTENT_TYPE:
+            manifest = json.loads(data)
+            data = self._get_chunks(key, manifest)
+            if data is None:
+                return None
+            headers = dict(headers)
+            headers["content-type"] = manifest["content_type"]
+        if not counter and self.near_cache is not None:
+            self._near_cache_set(key, data, headers)
+        return data, headers
+
+    def _set_raw(self, key, value, content_type, time, meta, etag=None):
+        self._found(key)
+        try:
+            return self._store(key, value, content_type, time, meta, etag)
+        finally:
+            self._forget(key)
+
+    def _store(self, key, value, content_type, time, meta, etag):
+        headers = self._store_headers(content_type, time, meta)
+        if etag is not None:
+            headers = dict(headers)
+            headers["If-Match"] = etag
+
+        if self.chunk_threshold is not None:
+            old_manifest = self._get_manifest(key)
+            if len(value) > self.chunk_threshold:
+                return self._set_chunks(key, value, headers, old_manifest)
+            elif old_manifest is not None:
+                self._delete_chunks(key, old_manifest)
+
         status, data, _ = self.pool.request(
             method="POST",
-            url="%s/buckets/%s/counters/%s" % (self.base_url, self.bucket, key),
-            body=str(value),
+            url=self._keys_url + quote_key(key),
+            body=value,
+            headers=headers,
+        )
+        if status in WRITE_ERRORS:
+            raise WRITE_ERRORS[status](data)
+        return status in SUCCESS_STATUSES
+
+    def _store_headers(self, content_type, time, meta):
+        # the common case of a value without expiry or metadata shares its headers
+        if not time and not meta:
+            return content_type_headers(content_type)
+        headers = {
+            "Content-Type": content_type,
+        }
+        expires = expires_at(time)
+        if expires is not None:
+            headers[EXPIRES_HEADER] = str(expires)
+        if meta:
+            for name, value in meta.iteritems():
+                headers["X-Riak-Meta-%s" % name] = str(value)
+        return headers
+
+    def is_expired(self, key):
+        """Check whether the key in the client's `bucket` has expired
+
+        :param key: the key to check
+        :type key: str
+        :returns: bool - True if the key exists and has expired, False otherwise
+        """
+        with self.tracer.span("riakcached.is_expired", self._bucket, key):
+            status, _, headers = self.pool.request(
+                method="HEAD",
+                url=self._keys_url + quote_key(key),
+            )
+            return status == 200 and is_expired(headers)
+
+    def _expired(self, key):
+        self._not_found(key)
+        if self.reaper is not None:
+            self.reaper.queue(key, self)
+
+    def _not_found(self, key):
+        if self.negative_cache is not None:
+            self.negative_cache.set(key, True)
+
+    def _found(self, key):
+        if self.negative_cache is not None:
+            self.negative_cache.delete(key)
+        self._forget(key)
+
+    def _forget(self, key):
+        # also called once a write returns, as another process sharing the near cache may
+        # have cached the previous value again while the write was in flight
+        if self.near_cache is not None:
+            self.near_cache.delete(self._near_cache_key(key))
+
+    def _near_cache_key(self, key):
+        bucket = self.bucket
+        if isinstance(bucket, unicode):
+            bucket = bucket.encode("utf-8")
+        if isinstance(key, unicode):
+            key = key.encode("utf-8")
+        return "%s/%s" % (bucket, key)
+
+    def _near_cache_set(self, key, data, headers):
+        ttl = self.near_cache.ttl
+        expires = headers.get(EXPIRES_HEADER.lower())
+        if expires:
+            try:
+                ttl = min(ttl, int(expires) - time.time())
+            except ValueError:
+                pass
+        if ttl <= 0:
+            return
+        kept = dict(
+            (name, value) for name, value in headers.iteritems()
+            if name in NEAR_CACHE_HEADERS or name.startswith("x-riak-meta-")
         )
-        if status == 409:
-            raise exceptions.RiakcachedConflict(data)
-        elif status == 400:
-            raise exceptions.RiakcachedBadRequest(data)
-        return status in (200, 201, 204, 300)
+        self.near_cache.set(self._near_cache_key(key), marshal.dumps((data, kept)), ttl)
+
+    def _map(self, func, items, workers):
+        return parallel_map(self.tracer.wrap(func), items, workers)
+
+    def _without_chunks(self, keys):
+        return [key for key in keys if not CHUNK_KEY_PATTERN.match(key)]
+
+    def _chunk_url(self, key, manifest, index):
+        return "%s%s.chunk.%s.%d" % (self._keys_url, quote_key(key), manifest["id"], index)
+
+    def _get_manifest(self, key):
+        status, _, headers = self.pool.request(
+            method="HEAD",
+            url=self._keys_url + quote_key(key),
+        )
+        if status != 200 or headers.get("content-type") != MANIFEST_CONTENT_TYPE:
+            return None
+
+        status, data, headers = self.pool.request(
+            method="GET",
+            url=self._keys_url + quote_key(key),
+        )
+        if status != 200 or headers.get("content-type") != MANIFEST_CONTENT_TYPE:
+            return None
+        return json.loads(data)
+
+    def _get_chunks(self, key, manifest):
+        def get_chunk(index):
+            status, data, _ = self.pool.request(
+                method="GET",
+                url=self._chunk_url(key, manifest, index),
+            )
+            if status == 200:
+                return data
+            return None
+
+        chunks = self._map(get_chunk, xrange(manifest["chunks"]), self.chunk_workers)
+        if None in chunks:
+            return None
+        data = "".join(chunks)
+        if len(data) != manifest["size"]:
+            return None
+        return data
+
+    def _set_chunks(self, key, value, headers, old_manifest):
+        manifest = {
+            "id": uuid.uuid4().hex,
+            "chunks": (len(value) + self.chunk_size - 1) // self.chunk_size,
+            "size": len(value),
+            "content_type": headers["Content-Type"],
+        }
+        headers = dict(headers, **{"Content-Type": MANIFEST_CONTENT_TYPE})
+
+        def set_chunk(index):
+            offset = index * self.chunk_size
+            status, data, _ = self.pool.request(
+                method="POST",
+                url=self._chunk_url(key, manifest, index),
+                body=value[offset:offset + self.chunk_size],
+                headers=OCTET_STREAM_HEADERS,
+            )
+            if status in BAD_REQUEST_ERRORS:
+                raise BAD_REQUEST_ERRORS[status](data)
+            return status in SUCCESS_STATUSES
+
+        if not all(self._map(set_chunk, xrange(manifest["chunks"]), self.chunk_workers)):
+            self._delete_chunks(key, manifest)
+            return False
+
+        status, data, _ = self.pool.request(
+            method="POST",
+            url=self._keys_url + quote_key(key),
+            body=json.dumps(manifest),
+            headers=headers,
+        )
+        if status in WRITE_ERRORS:
+            raise WRITE_ERRORS[status](data)
+
+        if status not in SUCCESS_STATUSES:
+            self._delete_chunks(key, manifest)
+            return False
+        if old_manifest is not None:
+            self._delete_chunks(key, old_manifest)
+        return True
+
+    def _delete_chunks(self, key, manifest):
+        def delete_chunk(index):
+            self.pool.request(
+                method="DELETE",
+                url=self._chunk_url(key, manifest, index),
+            )
+
+        self._map(delete_chunk, xrange(manifest["chunks"]), self.chunk_workers)
 
 
 class ThreadedRiakClient(RiakClient):
@@ -331,7 +1298,41 @@ class ThreadedRiakClient(RiakClient):
 
     The threaded version uses threads to try to parallelize the {set,get,delete}_many method calls
     """
+    __slots__ = ["process_deserializer"]
+
+    def __init__(self, *args, **kwargs):
+        """Constructor for a new :class:`riakcached.clients.ThreadedRiakClient`
+
+        Takes the same arguments as :class:`riakcached.clients.RiakClient`, plus:
+
+        Process deserialization - when `deserializer_processes` is set, :func:`get_many`
+        deserializes values of at least `deserializer_threshold` bytes on a pool of worker
+        processes, see :class:`riakcached.serializers.ProcessDeserializer`.
+
+        :param deserializer_processes: the number of worker processes, 0 for one per CPU,
+            None disables
+        :type deserializer_processes: int
+        :param deserializer_threshold: the size in bytes from which values are deserialized
+            by a worker process
+        :type deserializer_threshold: int
+        """
+        processes = kwargs.pop("deserializer_processes", None)
+        threshold = kwargs.pop("deserializer_threshold", 65536)
+        super(ThreadedRiakClient, self).__init__(*args, **kwargs)
+        self.process_deserializer = None
+        if processes is not None:
+            self.process_deserializer = ProcessDeserializer(processes, threshold)
+
+    def close(self):
+        """Close the connection pool and stop any deserializer processes
+        """
+        super(ThreadedRiakClient, self).close()
+        if self.process_deserializer is not None:
+            self.process_deserializer.close()
+
     def _many(self, target, args_list):
+        # the workers' spans are children of the calling thread's span
+        target = self.tracer.wrap(target)
         workers = []
         worker_results = Queue.Queue()
         for args in args_list:
@@ -359,45 +1360,61 @@ class ThreadedRiakClient(RiakClient):
             the calls to :func:`delete`
         :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
         """
-        def worker(key, results):
-            results.put((key, self.delete(key)))
+        with self.tracer.span("riakcached.delete_many", self._bucket, keys):
+            def worker(key, results):
+                results.put((key, self.delete(key)))
 
-        args = [[key] for key in keys]
+            args = [[key] for key in keys]
 
-        return self._many(worker, args)
+            return self._many(worker, args)
 
-    def set_many(self, values):
+    def set_many(self, values, content_type="text/plain", time=0):
         """Set the value of multiple keys at once for the client's `bucket`
 
         :param values: the key -> value pairings for the keys to set
         :type values: dict
         :param content_type: the Content-Type for all of the values provided
         :type content_type: str
+        :param time: when the keys expire, 0 for never, see :func:`set`
+        :type time: int
         :returns: dict - the keys are the keys provided and the values are True or False from
             the calls to :func:`set`
         :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
         :raises: :class:`riakcached.exceptions.RiakcachedPreconditionFailed`
         """
-        def worker(key, value, results):
-            results.put((key, self.set(key, value)))
+        with self.tracer.span("riakcached.set_many", self._bucket, values):
+            def worker(key, value, results):
+                results.put((key, self.set(key, value, content_type, time)))
 
-        args = [list(data) for data in values.items()]
-        return self._many(worker, args)
+            args = [list(data) for data in values.items()]
+            return self._many(worker, args)
 
-    def get_many(self, keys):
+    def get_many(self, keys, lazy=False):
         """Get the value of multiple keys at once from the client's `bucket`
 
         :param keys: the list of keys to get
         :type keys: list
+        :param lazy: whether to return :class:`riakcached.serializers.LazyValue` values, see
+            :func:`get`
+        :type lazy: bool
         :returns: dict - the keys are the keys provided and the values are the results from calls
             to :func:`get`, except keys whose values are `None` are not included in the result
         :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
         :raises: :class:`riakcached.exceptions.RiakcachedServiceUnavailable`
         """
-        def worker(key, results):
-            results.put((key, self.get(key)))
-
-        args = [[key] for key in keys]
-        results = self._many(worker, args)
-        results = dict((key, value) for key, value in results.iteritems() if value is not None)
-        return results or None
+        with self.tracer.span("riakcached.get_many", self._bucket, keys):
+            in_processes = self.process_deserializer is not None and not lazy
+
+            def worker(key, results):
+                results.put((key, self.get(key, lazy=lazy or in_processes)))
+
+            if self.negative_cache is not None:
+                keys = [key for key in keys if key not in self.negative_cache]
+            args = [[key] for key in keys]
+            results = self._many(worker, args)
+            results = dict((key, value) for key, value in results.iteritems() if value is not None)
+            if in_processes and results:
+                keys = list(results)
+                values = self.process_deserializer.deserialize_many([results[key] for key in keys])
+                results = dict(zip(keys, values))
+            return results or None
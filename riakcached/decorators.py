@@ -0,0 +1,139 @@
+import functools
+import hashlib
+import math
+import random
+import time
+
+from riakcached import exceptions
+
+
+def make_key(prefix, args, kwargs):
+    """Build a cache key from a function call's arguments
+
+    The arguments are identified by their `repr()`, so they need a `repr()` which is the same
+    for equal values in every process. The default `repr()` of objects includes their memory
+    address, use the `key_func` of :func:`cached` for those.
+
+    :param prefix: the prefix for the key, usually the function's qualified name
+    :type prefix: str
+    :param args: the positional arguments of the call
+    :type args: tuple
+    :param kwargs: the keyword arguments of the call
+    :type kwargs: dict
+    :returns: str - the cache key
+    """
+    arguments = repr((args, sorted(kwargs.items())))
+    return "%s:%s" % (prefix, hashlib.sha1(arguments).hexdigest())
+
+
+def cached(client, ttl, prefix=None, beta=1.0, lock_timeout=10, poll_interval=0.05,
+           key_func=None):
+    """Decorator which caches a function's results in Riak using `client`
+
+    Results are stored as JSON together with their expiry time and how long they took to
+    compute, and expire in Riak `lock_timeout` seconds after `ttl` so that a stale value can
+    still be served while it is being recomputed. To avoid every worker recomputing a value
+    at once when it expires:
+
+    * values are recomputed probabilistically before they expire, more likely the closer they
+      are to expiring and the longer they took to compute (scaled by `beta`)
+    * only the worker holding the value's lock key (see :func:`riakcached.clients.RiakClient.add`)
+      recomputes it, other workers keep returning the current value. An abandoned lock is
+      taken over with a conditional write, so only one worker can take it over
+    * when there is no value at all, workers without the lock wait up to `lock_timeout` seconds
+      for the lock holder's result before computing it themselves
+
+    Example::
+
+        @cached(client, ttl=300)
+        def expensive(user_id):
+            return compute(user_id)
+
+    :param client: the client to cache results with
+    :type client: :class:`riakcached.clients.RiakClient`
+    :param ttl: how many seconds results are cached for
+    :type ttl: int
+    :param prefix: the prefix for cache keys, defaults to the function's qualified name
+    :type prefix: str
+    :param beta: how eagerly to recompute values early, 0 disables early recomputation
+    :type beta: float
+    :param lock_timeout: how many seconds a lock is held before it is considered abandoned
+    :type lock_timeout: float
+    :param poll_interval: how often to check for the lock holder's result
+    :type poll_interval: float
+    :param key_func: called with the function's arguments to get a `str` identifying them,
+        defaults to hashing their `repr()`, see :func:`make_key`
+    :type key_func: function
+    :returns: function - the decorator
+    """
+    def decorator(func):
+        key_prefix = prefix or "%s.%s" % (func.__module__, func.__name__)
+
+        def cache_key(*args, **kwargs):
+            if key_func is not None:
+                return "%s:%s" % (key_prefix, key_func(*args, **kwargs))
+            return make_key(key_prefix, args, kwargs)
+
+        def recompute(key, args, kwargs):
+            start = time.time()
+            value = func(*args, **kwargs)
+            now = time.time()
+            client.set(key, {
+                "value": value,
+                "expires": now + ttl,
+                "delta": now - start,
+            }, content_type="application/json", time=int(math.ceil(ttl + lock_timeout)))
+            return value
+
+        def acquire(lock_key):
+            now = time.time()
+            if client.add(lock_key, now + lock_timeout):
+                return True
+            lock = client.get_raw(lock_key)
+            if lock is None or float(lock[0]) >= now:
+                return False
+            # only replace the abandoned lock if no other worker replaced it first
+            try:
+                return client.set_raw(lock_key, str(now + lock_timeout), "text/plain",
+                                      etag=lock[1]["etag"])
+            except exceptions.RiakcachedPreconditionFailed:
+                return False
+
+        def poll(key):
+            # the key was not found before waiting, which a negative cache would remember
+            if client.negative_cache is not None:
+                client.negative_cache.delete(key)
+            return client.get(key)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = cache_key(*args, **kwargs)
+            lock_key = "%s:lock" % key
+            entry = client.get(key)
+            now = time.time()
+            if entry is not None:
+                early = entry["delta"] * beta * -math.log(1.0 - random.random())
+                if now + early < entry["expires"]:
+                    return entry["value"]
+
+            if acquire(lock_key):
+                try:
+                    return recompute(key, args, kwargs)
+                finally:
+                    client.delete(lock_key)
+
+            if entry is not None:
+                return entry["value"]
+
+            deadline = now + lock_timeout
+            while time.time() < deadline:
+                time.sleep(poll_interval)
+                entry = poll(key)
+                if entry is not None and entry["expires"] > time.time():
+                    return entry["value"]
+            return recompute(key, args, kwargs)
+
+        wrapper.cache_key = cache_key
+        return wrapper
+
+    return decorator
@@ -58,3 +58,11 @@ class RiakcachedConnectionError(RiakcachedException):
     Inherits from :class:`riakcached.exceptions.RiakcachedException`
     """
     pass
+
+
+class RiakcachedRateLimited(RiakcachedException):
+    """Exception that is raised when a request is not admitted by a pool's limiter in time
+
+    Inherits from :class:`riakcached.exceptions.RiakcachedException`
+    """
+    pass
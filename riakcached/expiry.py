@@ -0,0 +1,141 @@
+import threading
+import time
+
+
+EXPIRES_HEADER = "X-Riak-Meta-Expires"
+MAX_RELATIVE_EXPIRY = 60 * 60 * 24 * 30
+
+
+def expires_at(expiry, now=None):
+    """Convert a memcached style expiry time into a unix timestamp
+
+    Like memcached, an `expiry` of up to 30 days is a number of seconds from now and anything
+    larger is already a unix timestamp.
+
+    :param expiry: the expiry time, 0 for no expiry
+    :type expiry: int
+    :param now: the current unix timestamp, defaults to `time.time()`
+    :type now: float
+    :returns: int - the unix timestamp the value expires at, or None for no expiry
+    """
+    if not expiry:
+        return None
+    if expiry > MAX_RELATIVE_EXPIRY:
+        return int(expiry)
+    if now is None:
+        now = time.time()
+    return int(now + expiry)
+
+
+def is_expired(headers, now=None):
+    """Check the expiry metadata of a Riak response
+
+    :param headers: the response headers, with lower case names
+    :type headers: dict
+    :param now: the current unix timestamp, defaults to `time.time()`
+    :type now: float
+    :returns: bool - True if the value has expired, False otherwise
+    """
+    expires = headers.get(EXPIRES_HEADER.lower())
+    if not expires:
+        return False
+    if now is None:
+        now = time.time()
+    try:
+        return int(expires) <= now
+    except ValueError:
+        return False
+
+
+class Reaper(object):
+    """Deletes expired keys found by a :class:`riakcached.clients.RiakClient` in the background
+
+    Expired keys are queued by :func:`riakcached.clients.RiakClient.get` and deleted by a
+    daemon thread in batches of up to `batch_size` keys using
+    :func:`riakcached.clients.RiakClient.delete_many`, at most every `interval` seconds. Every
+    key is checked again before it is deleted in case it has been set since it was queued.
+
+    A client and its :func:`riakcached.clients.RiakClient.for_bucket` handles share a single
+    reaper, each key is deleted through the client which queued it. :func:`stop` (called by
+    :func:`riakcached.clients.RiakClient.close`) ends the thread.
+    """
+    __slots__ = ["_condition", "_pending", "_stopped", "_thread", "batch_size", "client",
+                 "interval", "max_pending"]
+
+    def __init__(self, client, batch_size=100, interval=1.0, max_pending=10000):
+        """Constructs a new :class:`riakcached.expiry.Reaper`
+
+        :param client: the client to delete keys with when :func:`queue` is not given one
+        :type client: :class:`riakcached.clients.RiakClient`
+        :param batch_size: the maximum number of keys to delete at once
+        :type batch_size: int
+        :param interval: the number of seconds to wait between batches
+        :type interval: float
+        :param max_pending: the maximum number of queued keys, more keys are dropped
+        :type max_pending: int
+        """
+        self.client = client
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = set()
+        self._stopped = False
+        self._condition = threading.Condition(threading.Lock())
+        self._thread = None
+
+    def queue(self, key, client=None):
+        """Queue an expired key to be deleted
+
+        :param key: the expired key
+        :type key: str
+        :param client: the client to delete the key with, defaults to `client`
+        :type client: :class:`riakcached.clients.RiakClient`
+        """
+        with self._condition:
+            if self._stopped or len(self._pending) >= self.max_pending:
+                return
+            self._pending.add((client or self.client, key))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+
+    def reap(self):
+        """Delete a single batch of queued keys which are still expired
+
+        :returns: list - the keys which were deleted
+        """
+        with self._condition:
+            batch = [self._pending.pop() for _ in xrange(min(self.batch_size, len(self._pending)))]
+        by_client = {}
+        for client, key in batch:
+            by_client.setdefault(client, []).append(key)
+        deleted = []
+        for client, keys in by_client.iteritems():
+            expired = [key for key in keys if client.is_expired(key)]
+            if expired:
+                client.delete_many(expired)
+                deleted.extend(expired)
+        return deleted
+
+    def stop(self):
+        """Drop the queued keys and stop the background thread
+        """
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+            try:
+                self.reap()
+            except Exception:
+                pass
+            time.sleep(self.interval)
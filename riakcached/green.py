@@ -0,0 +1,214 @@
+"""A cooperative connection pool and client for applications running on gevent
+
+:class:`riakcached.green.GeventPool` makes requests over gevent sockets, so a request waiting
+for Riak yields to other greenlets instead of blocking the process, without having to monkey
+patch the standard library. :class:`riakcached.green.GeventRiakClient` fans the `*_many`
+calls out over a bounded pool of greenlets instead of one OS thread per key.
+
+Requires the `gevent` package.
+"""
+try:
+    import gevent
+    import gevent.lock
+    import gevent.pool
+    import gevent.queue
+    import gevent.socket
+except ImportError:
+    gevent = None
+
+from riakcached.clients import RiakClient
+from riakcached.expiry import Reaper
+from riakcached.pools import SocketConnection
+from riakcached.pools import SocketPool
+
+
+def _require_gevent(name):
+    if gevent is None:
+        raise ImportError("%s requires the gevent package" % name)
+
+
+class GeventPool(SocketPool):
+    """A :class:`riakcached.pools.SocketPool` which makes requests over gevent sockets
+
+    At most `maxsize` connections are open at once, requests made while every connection is
+    in use wait for one to be released, for up to `pool_timeout` seconds. Only `http://`
+    urls are supported.
+
+    The pool must only be used from the thread it was created in, like any gevent object.
+    """
+    __slots__ = []
+
+    def __init__(self, base_url="http://127.0.0.1:8098", timeout=2, auto_connect=True,
+                 adaptive_timeouts=None, maxsize=100, pool_timeout=None, tracer=None):
+        """Constructs a new :class:`riakcached.green.GeventPool`
+
+        :param base_url: the base url that the client should use for requests
+        :type base_url: str
+        :param timeout: the connection timeout to use
+        :type timeout: int
+        :param auto_connect: whether or not to call :func:`connect` on __init__
+        :type auto_connect: bool
+        :param adaptive_timeouts: the latency tracker to derive timeouts from
+        :type adaptive_timeouts: :class:`riakcached.metrics.AdaptiveTimeouts`
+        :param maxsize: the maximum number of connections to open
+        :type maxsize: int
+        :param pool_timeout: the maximum seconds to wait for a free connection, None waits
+            as long as needed
+        :type pool_timeout: float
+        :param tracer: the tracer to record requests with, see :mod:`riakcached.tracing`, the
+            time spent waiting for a free connection is tagged as `riak.pool_wait`
+        :type tracer: :class:`riakcached.tracing.Tracer`
+        :raises: ImportError - when gevent is not installed
+        """
+        _require_gevent(self.__class__.__name__)
+        super(GeventPool, self).__init__(
+            base_url=base_url, timeout=timeout, auto_connect=auto_connect,
+            adaptive_timeouts=adaptive_timeouts, maxsize=maxsize, pool_timeout=pool_timeout,
+            tracer=tracer,
+        )
+
+    def _queue(self, maxsize):
+        return gevent.queue.LifoQueue(maxsize)
+
+    def _connection(self):
+        return SocketConnection((self.host, self.port), gevent.socket.create_connection)
+
+
+class GeventReaper(Reaper):
+    """A :class:`riakcached.expiry.Reaper` deleting expired keys from a greenlet
+    """
+    __slots__ = ["_greenlet"]
+
+    def __init__(self, *args, **kwargs):
+        """Constructs a new :class:`riakcached.green.GeventReaper`
+
+        Takes the same arguments as :class:`riakcached.expiry.Reaper`.
+        """
+        super(GeventReaper, self).__init__(*args, **kwargs)
+        self._condition = gevent.lock.RLock()
+        self._greenlet = None
+
+    def queue(self, key, client=None):
+        """Queue an expired key to be deleted
+
+        :param key: the expired key
+        :type key: str
+        :param client: the client to delete the key with, defaults to `client`
+        :type client: :class:`riakcached.clients.RiakClient`
+        """
+        with self._condition:
+            if self._stopped or len(self._pending) >= self.max_pending:
+                return
+            self._pending.add((client or self.client, key))
+            if self._greenlet is None or self._greenlet.dead:
+                self._greenlet = gevent.spawn(self._run)
+
+    def stop(self):
+        """Drop the queued keys, the greenlet exits once its current batch is done
+        """
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+
+    def _run(self):
+        while self._pending:
+            try:
+                self.reap()
+            except Exception:
+                pass
+            gevent.sleep(self.interval)
+
+
+class GeventRiakClient(RiakClient):
+    """A version of :class:`riakcached.clients.RiakClient` for applications running on gevent
+
+    The `{get,set,delete}_many` methods (and chunked values) make their requests from a pool
+    of at most `concurrency` greenlets, so thousands of keys can be in flight at once for
+    the memory of a greenlet each. Expired keys are reaped from a greenlet rather than a
+    thread.
+
+    Example::
+
+        pool = GeventPool(base_url="http://riak:8098", maxsize=500)
+        client = GeventRiakClient("my_bucket", pool=pool, concurrency=1000)
+        values = client.get_many(keys)
+    """
+    __slots__ = ["concurrency"]
+
+    def __init__(self, bucket, pool=None, concurrency=100, reap_expired=True, **kwargs):
+        """Constructor for a new :class:`riakcached.green.GeventRiakClient`
+
+        Takes the same arguments as :class:`riakcached.clients.RiakClient`, plus:
+
+        :param concurrency: the maximum number of requests in flight for a `*_many` call
+        :type concurrency: int
+        :raises: ImportError - when gevent is not installed
+        """
+        _require_gevent(self.__class__.__name__)
+        if pool is None:
+            pool = GeventPool()
+        super(GeventRiakClient, self).__init__(bucket, pool=pool, reap_expired=False, **kwargs)
+        self.concurrency = concurrency
+        if reap_expired:
+            self.reaper = GeventReaper(self)
+
+    def _map(self, func, items, workers=None):
+        items = list(items)
+        if not items:
+            return []
+        group = gevent.pool.Pool(min(workers or self.concurrency, len(items)))
+        return group.map(self.tracer.wrap(func), items)
+
+    def get_many(self, keys, lazy=False):
+        """Get the value of multiple keys at once from the client's `bucket`
+
+        :param keys: the list of keys to get
+        :type keys: list
+        :param lazy: whether to return :class:`riakcached.serializers.LazyValue` values, see
+            :func:`get`
+        :type lazy: bool
+        :returns: dict - the keys are the keys provided and the values are the results from calls
+            to :func:`get`, except keys whose values are `None` are not included in the result
+        :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
+        :raises: :class:`riakcached.exceptions.RiakcachedServiceUnavailable`
+        """
+        with self.tracer.span("riakcached.get_many", self._bucket, keys):
+            if self.negative_cache is not None:
+                keys = [key for key in keys if key not in self.negative_cache]
+            keys = list(keys)
+            values = self._map(lambda key: self.get(key, lazy=lazy), keys)
+            return dict((key, value) for key, value in zip(keys, values) if value is not None)
+
+    def set_many(self, values, content_type="text/plain", time=0):
+        """Set the value of multiple keys at once for the client's `bucket`
+
+        :param values: the key -> value pairings for the keys to set
+        :type values: dict
+        :param content_type: the Content-Type for all of the values provided
+        :type content_type: str
+        :param time: when the keys expire, 0 for never, see :func:`set`
+        :type time: int
+        :returns: dict - the keys are the keys provided and the values are True or False from
+            the calls to :func:`set`
+        :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
+        :raises: :class:`riakcached.exceptions.RiakcachedPreconditionFailed`
+        """
+        with self.tracer.span("riakcached.set_many", self._bucket, values):
+            items = values.items()
+            results = self._map(
+                lambda (key, value): self.set(key, value, content_type, time), items,
+            )
+            return dict((key, result) for (key, _), result in zip(items, results))
+
+    def delete_many(self, keys):
+        """Delete multiple keys at once from the client's `bucket`
+
+        :param keys: list of `str` keys to delete
+        :type keys: list
+        :returns: dict - the keys are the keys provided and the values are True or False from
+            the calls to :func:`delete`
+        :raises: :class:`riakcached.exceptions.RiakcachedBadRequest`
+        """
+        with self.tracer.span("riakcached.delete_many", self._bucket, keys):
+            keys = list(keys)
+            return dict(zip(keys, self._map(self.delete, keys)))
@@ -0,0 +1,301 @@
+import threading
+import time
+
+from riakcached import exceptions
+from riakcached.pools import classify_request
+from riakcached.pools import Pool
+
+
+READ_OPERATIONS = frozenset(["get", "keys", "stats", "ping", "mapred"])
+
+
+class Limiter(object):
+    """Base class for request admission limiters
+
+    Subclasses implement :func:`_acquire` and optionally :func:`release`, the base class keeps
+    track of the queueing metrics returned by :func:`metrics`.
+    """
+    __slots__ = ["_lock", "admitted", "max_wait", "rejected", "total_wait", "waiting"]
+
+    def __init__(self):
+        """Constructs a new :class:`riakcached.limiters.Limiter`
+        """
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+        self.waiting = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self, timeout=None):
+        """Wait for permission to make a request
+
+        :param timeout: the maximum number of seconds to wait, 0 to not wait at all and None
+            to wait as long as needed
+        :type timeout: float
+        :returns: bool - True if the request is admitted, False otherwise
+        """
+        start = time.time()
+        admitted = False
+        with self._lock:
+            self.waiting += 1
+        try:
+            admitted = self._acquire(timeout)
+        finally:
+            waited = time.time() - start
+            with self._lock:
+                self.waiting -= 1
+                if admitted:
+                    self.admitted += 1
+                    self.total_wait += waited
+                    self.max_wait = max(self.max_wait, waited)
+                else:
+                    self.rejected += 1
+        return admitted
+
+    def _acquire(self, timeout):
+        raise NotImplementedError("You must not use %s directly" % self.__class__.__name__)
+
+    def release(self):
+        """Signal that an admitted request has finished
+        """
+        pass
+
+    def metrics(self):
+        """Get the queueing metrics for this limiter
+
+        :returns: dict - the number of requests admitted, rejected and currently waiting, and
+            the total and maximum time spent waiting in seconds
+        """
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "waiting": self.waiting,
+                "total_wait": self.total_wait,
+                "max_wait": self.max_wait,
+            }
+
+
+class TokenBucket(Limiter):
+    """A :class:`riakcached.limiters.Limiter` admitting `rate` requests per second
+
+    Up to `burst` requests can be admitted at once, after that requests are spaced out evenly.
+    Waiting requests reserve their token up front so they are admitted in arrival order.
+    """
+    __slots__ = ["_last", "_tokens", "burst", "rate"]
+
+    def __init__(self, rate, burst=None):
+        """Constructs a new :class:`riakcached.limiters.TokenBucket`
+
+        :param rate: the number of requests to admit per second
+        :type rate: float
+        :param burst: the maximum number of requests to admit at once, defaults to `rate`
+        :type burst: float
+        """
+        super(TokenBucket, self).__init__()
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self._tokens = self.burst
+        self._last = time.time()
+
+    def _acquire(self, timeout):
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            wait = (1 - self._tokens) / self.rate
+            if wait > 0 and timeout is not None and wait > timeout:
+                return False
+            self._tokens -= 1
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+
+class ConcurrencyLimiter(Limiter):
+    """A :class:`riakcached.limiters.Limiter` admitting at most `limit` concurrent requests
+    """
+    __slots__ = ["_condition", "_active", "limit"]
+
+    def __init__(self, limit):
+        """Constructs a new :class:`riakcached.limiters.ConcurrencyLimiter`
+
+        :param limit: the maximum number of requests in flight at once
+        :type limit: int
+        """
+        super(ConcurrencyLimiter, self).__init__()
+        self.limit = limit
+        self._active = 0
+        self._condition = threading.Condition(threading.Lock())
+
+    def _acquire(self, timeout):
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        with self._condition:
+            while self._active >= self.limit:
+                if deadline is None:
+                    self._condition.wait()
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self._active += 1
+        return True
+
+    def release(self):
+        """Signal that an admitted request has finished
+        """
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    def metrics(self):
+        """Get the queueing metrics for this limiter
+
+        :returns: dict - the metrics from :func:`riakcached.limiters.Limiter.metrics` and the
+            number of requests currently in flight
+        """
+        metrics = super(ConcurrencyLimiter, self).metrics()
+        metrics["active"] = self._active
+        return metrics
+
+
+class LimitedPool(Pool):
+    """A :class:`riakcached.pools.Pool` which admits requests to another pool through limiters
+
+    `limiters` maps an operation class to the :class:`riakcached.limiters.Limiter` for it. A
+    request uses the limiter for its operation (see :func:`riakcached.pools.classify_request`),
+    falling back to the limiter for "read" or "write" and then to the limiter for "*". Requests
+    without a matching limiter are not limited.
+
+    Several :class:`riakcached.limiters.LimitedPool` can wrap the same pool, e.g. to give each
+    client its own budget over a single set of connections.
+
+    Example::
+
+        pool = LimitedPool(shared_pool, {
+            "write": TokenBucket(rate=500, burst=50),
+            "*": ConcurrencyLimiter(20),
+        }, timeout=0.5)
+    """
+    __slots__ = ["limit_timeout", "limiters", "pool"]
+
+    def __init__(self, pool, limiters, block=True, timeout=None):
+        """Constructs a new :class:`riakcached.limiters.LimitedPool`
+
+        :param pool: the pool to make admitted requests with
+        :type pool: :class:`riakcached.pools.Pool`
+        :param limiters: operation class -> :class:`riakcached.limiters.Limiter`
+        :type limiters: dict
+        :param block: whether to wait for admission or fail immediately
+        :type block: bool
+        :param timeout: the maximum seconds to wait for admission, None waits as long as needed
+        :type timeout: float
+        """
+        self.pool = pool
+        self.limiters = limiters
+        self.limit_timeout = timeout if block else 0
+        super(LimitedPool, self).__init__(
+            base_url=pool.url, timeout=pool.timeout, auto_connect=False,
+        )
+
+    def connect(self):
+        """Create the wrapped connection pool
+        """
+        self.pool.connect()
+
+    def close(self):
+        """Closes the wrapped connection pool
+        """
+        self.pool.close()
+
+    def reset(self):
+        """Close every connection and create the wrapped connection pool again
+        """
+        self.pool.reset()
+
+    def limiter_for(self, method, url):
+        """Get the limiter to use for a request
+
+        :param method: the HTTP method of the request
+        :type method: str
+        :param url: the full url of the request
+        :type url: str
+        :returns: :class:`riakcached.limiters.Limiter` - or None if the request is not limited
+        """
+        operation = classify_request(method, url)
+        limiter = self.limiters.get(operation)
+        if limiter is None:
+            if operation in READ_OPERATIONS or (operation == "props" and method == "GET"):
+                limiter = self.limiters.get("read")
+            else:
+                limiter = self.limiters.get("write")
+        if limiter is None:
+            limiter = self.limiters.get("*")
+        return limiter
+
+    def _admit(self, method, url):
+        limiter = self.limiter_for(method, url)
+        if limiter is not None and not limiter.acquire(self.limit_timeout):
+            raise exceptions.RiakcachedRateLimited(
+                "%s %s was not admitted within %s seconds" % (method, url, self.limit_timeout)
+            )
+        return limiter
+
+    def request(self, method, url, body=None, headers=None):
+        """Makes a single HTTP request once it is admitted by its limiter
+
+        :param method: the HTTP method to make the requets with
+        :type method: str
+        :param url: the full url for the request
+        :type url: str
+        :param body: the data to POST or PUT with the request
+        :type body: str
+        :param headers: extra headers to add to the request
+        :type headers: dict
+        :returns: tuple - status, data, headers
+        :raises: :class:`riakcached.exceptions.RiakcachedRateLimited`
+        :raises: :class:`riakcached.exceptions.RiakcachedTimeout`
+        :raises: :class:`riakcached.exceptions.RiakcachedConnectionError`
+        """
+        limiter = self._admit(method, url)
+        try:
+            return self.pool.request(method=method, url=url, body=body, headers=headers)
+        finally:
+            if limiter is not None:
+                limiter.release()
+
+    def request_stream(self, method, url, body=None, headers=None):
+        """Makes a single streaming HTTP request once it is admitted by its limiter
+
+        The limiter is released once the response headers have been received.
+
+        :param method: the HTTP method to make the requets with
+        :type method: str
+        :param url: the full url for the request
+        :type url: str
+        :param body: the data to POST or PUT with the request
+        :type body: object
+        :param headers: extra headers to add to the request
+        :type headers: dict
+        :returns: tuple - status, :class:`riakcached.pools.StreamingResponse`, headers
+        :raises: :class:`riakcached.exceptions.RiakcachedRateLimited`
+        :raises: :class:`riakcached.exceptions.RiakcachedTimeout`
+        :raises: :class:`riakcached.exceptions.RiakcachedConnectionError`
+        """
+        limiter = self._admit(method, url)
+        try:
+            return self.pool.request_stream(method=method, url=url, body=body, headers=headers)
+        finally:
+            if limiter is not None:
+                limiter.release()
+
+    def metrics(self):
+        """Get the queueing metrics of every limiter
+
+        :returns: dict - operation class -> the limiter's metrics
+        """
+        return dict((name, limiter.metrics()) for name, limiter in self.limiters.iteritems())
@@ -0,0 +1,259 @@
+import bisect
+import collections
+import threading
+
+
+HISTOGRAM_BOUNDS = tuple(
+    base * 10 ** exponent
+    for exponent in xrange(-5, 2)
+    for base in (1.0, 2.0, 5.0)
+)
+
+
+class LatencyWindow(object):
+    """A sliding window of the most recent request latencies
+
+    Percentiles are computed from a sorted copy of the window which is only rebuilt once
+    enough new samples have been added, so reading a percentile on every request is cheap.
+    """
+    __slots__ = ["_lock", "_samples", "_sorted", "_stale", "size"]
+
+    def __init__(self, size=1000):
+        """Constructs a new :class:`riakcached.metrics.LatencyWindow`
+
+        :param size: the maximum number of samples to keep
+        :type size: int
+        """
+        self.size = size
+        self._lock = threading.Lock()
+        self._samples = collections.deque(maxlen=size)
+        self._sorted = []
+        self._stale = 0
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, latency):
+        """Add a latency sample to the window
+
+        :param latency: the latency in seconds
+        :type latency: float
+        """
+        with self._lock:
+            self._samples.append(latency)
+            self._stale += 1
+
+    def percentile(self, percent, default=None):
+        """Get the `percent` percentile of the latencies in the window
+
+        :param percent: the percentile to compute, between 0 and 100
+        :type percent: float
+        :param default: the value to return when the window is empty
+        :type default: float
+        :returns: float - the latency in seconds
+        """
+        with self._lock:
+            if not self._samples:
+                return default
+            if self._stale * 20 > len(self._sorted):
+                self._sorted = sorted(self._samples)
+                self._stale = 0
+            samples = self._sorted
+        index = int(round(percent / 100.0 * (len(samples) - 1)))
+        return samples[index]
+
+
+class LatencyHistogram(object):
+    """A fixed bucket histogram of latencies
+
+    Latencies are counted in 1-2-5 buckets from 10 microseconds to 50 seconds (plus one
+    bucket for anything slower), so histograms take constant memory no matter how many
+    latencies are added and can be merged, e.g. to combine per interval histograms.
+    Percentiles are reported as the upper bound of the bucket they fall in.
+    """
+    __slots__ = ["_lock", "counts", "max", "total"]
+
+    def __init__(self):
+        """Constructs a new :class:`riakcached.metrics.LatencyHistogram`
+        """
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def add(self, latency):
+        """Add a latency to the histogram
+
+        :param latency: the latency in seconds
+        :type latency: float
+        """
+        index = bisect.bisect_left(HISTOGRAM_BOUNDS, latency)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += latency
+            if latency > self.max:
+                self.max = latency
+
+    def merge(self, other):
+        """Add every latency of another histogram to this one
+
+        :param other: the histogram to merge
+        :type other: :class:`riakcached.metrics.LatencyHistogram`
+        """
+        with self._lock:
+            self.counts = [count + extra for count, extra in zip(self.counts, other.counts)]
+            self.total += other.total
+            self.max = max(self.max, other.max)
+
+    def mean(self, default=None):
+        """Get the mean latency
+
+        :param default: the value to return when the histogram is empty
+        :type default: float
+        :returns: float - the latency in seconds
+        """
+        count = len(self)
+        if not count:
+            return default
+        return self.total / count
+
+    def percentile(self, percent, default=None):
+        """Get the `percent` percentile latency
+
+        :param percent: the percentile to compute, between 0 and 100
+        :type percent: float
+        :param default: the value to return when the histogram is empty
+        :type default: float
+        :returns: float - the upper bound of the percentile's bucket in seconds, or the
+            maximum latency for the last bucket
+        """
+        count = len(self)
+        if not count:
+            return default
+        rank = max(1, percent / 100.0 * count)
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                break
+        if index < len(HISTOGRAM_BOUNDS):
+            return min(HISTOGRAM_BOUNDS[index], self.max)
+        return self.max
+
+    def buckets(self):
+        """Get the non-empty buckets of the histogram
+
+        :returns: list - (upper bound in seconds, count) tuples, the upper bound of the
+            last bucket is None
+        """
+        bounds = HISTOGRAM_BOUNDS + (None, )
+        return [(bound, count) for bound, count in zip(bounds, self.counts) if count]
+
+
+class AdaptiveTimeouts(object):
+    """Per node and per operation timeouts derived from observed latencies
+
+    The read timeout for an operation is `multiplier` times the `percentile` latency observed
+    for that operation on that node, and the connect timeout is `multiplier` times the
+    `percentile` latency of the fastest operation seen on the node. Both are clamped to their
+    floor and ceiling, and the default timeout is used until `min_samples` latencies have been
+    observed.
+
+    A single instance can be shared between several pools, latencies are tracked per node url.
+    """
+    __slots__ = [
+        "_lock",
+        "_windows",
+        "connect_ceiling",
+        "connect_floor",
+        "min_samples",
+        "multiplier",
+        "percentile",
+        "read_ceiling",
+        "read_floor",
+        "window_size",
+    ]
+
+    def __init__(self, percentile=99, multiplier=2.0, read_floor=0.05, read_ceiling=30.0,
+                 connect_floor=0.05, connect_ceiling=2.0, min_samples=50, window_size=1000):
+        """Constructs a new :class:`riakcached.metrics.AdaptiveTimeouts`
+
+        :param percentile: the latency percentile to base timeouts on
+        :type percentile: float
+        :param multiplier: how many times the percentile latency to allow
+        :type multiplier: float
+        :param read_floor: the minimum read timeout in seconds
+        :type read_floor: float
+        :param read_ceiling: the maximum read timeout in seconds
+        :type read_ceiling: float
+        :param connect_floor: the minimum connect timeout in seconds
+        :type connect_floor: float
+        :param connect_ceiling: the maximum connect timeout in seconds
+        :type connect_ceiling: float
+        :param min_samples: the number of samples needed before adapting a timeout
+        :type min_samples: int
+        :param window_size: the number of samples to keep per node and operation
+        :type window_size: int
+        """
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.read_floor = read_floor
+        self.read_ceiling = read_ceiling
+        self.connect_floor = connect_floor
+        self.connect_ceiling = connect_ceiling
+        self.min_samples = min_samples
+        self.window_size = window_size
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def _window(self, node, operation):
+        window = self._windows.get((node, operation))
+        if window is None:
+            with self._lock:
+                window = self._windows.setdefault(
+                    (node, operation), LatencyWindow(self.window_size)
+                )
+        return window
+
+    def observe(self, node, operation, latency):
+        """Record the latency of a request
+
+        :param node: the base url of the node the request was made to
+        :type node: str
+        :param operation: the operation, see :func:`riakcached.pools.classify_request`
+        :type operation: str
+        :param latency: the latency of the request in seconds
+        :type latency: float
+        """
+        self._window(node, operation).add(latency)
+
+    def timeouts(self, node, operation, default):
+        """Get the connect and read timeouts to use for a request
+
+        :param node: the base url of the node the request will be made to
+        :type node: str
+        :param operation: the operation, see :func:`riakcached.pools.classify_request`
+        :type operation: str
+        :param default: the timeout to use when not enough latencies have been observed
+        :type default: float
+        :returns: tuple - connect timeout, read timeout
+        """
+        read = default
+        window = self._window(node, operation)
+        if len(window) >= self.min_samples:
+            read = self.multiplier * window.percentile(self.percentile)
+            read = min(self.read_ceiling, max(self.read_floor, read))
+
+        connect = default
+        fastest = [
+            window.percentile(self.percentile)
+            for (window_node, _), window in self._windows.items()
+            if window_node == node and len(window) >= self.min_samples
+        ]
+        if fastest:
+            connect = self.multiplier * min(fastest)
+            connect = min(self.connect_ceiling, max(self.connect_floor, connect))
+        return connect, read
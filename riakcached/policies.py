@@ -0,0 +1,268 @@
+import Queue
+import random
+import threading
+import time
+
+from riakcached import exceptions
+from riakcached.metrics import LatencyWindow
+from riakcached.pools import classify_request
+from riakcached.pools import Pool
+
+
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "DELETE"])
+
+
+class RetryBudget(object):
+    """A token bucket limiting retries and hedged requests to a fraction of all requests
+
+    Every request deposits `ratio` tokens and every retry or hedge withdraws a whole token,
+    so over time no more than `ratio` extra requests are sent per request, no matter how
+    many requests are failing. Up to `reserve` tokens can be saved up to absorb bursts.
+    """
+    __slots__ = ["_lock", "_tokens", "ratio", "reserve"]
+
+    def __init__(self, ratio=0.1, reserve=10):
+        """Constructs a new :class:`riakcached.policies.RetryBudget`
+
+        :param ratio: the number of tokens deposited per request
+        :type ratio: float
+        :param reserve: the maximum (and initial) number of tokens
+        :type reserve: int
+        """
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = float(reserve)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """Deposit `ratio` tokens for a new request
+        """
+        with self._lock:
+            self._tokens = min(self.reserve, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """Try to withdraw a token for a retry or hedged request
+
+        :returns: bool - True if the retry or hedge is allowed, False otherwise
+        """
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class PolicyPool(Pool):
+    """A :class:`riakcached.pools.Pool` which retries and hedges requests over several nodes
+
+    Each node is its own :class:`riakcached.pools.Pool`, requests are made against the first
+    node and urls are rewritten for the other nodes when retrying or hedging.
+
+    Retries - idempotent requests (`GET`, `HEAD` and `DELETE`, so `get`, `delete`, `ping`,
+    `keys`, ...) which time out, fail to connect or get a 503 response are retried on the
+    next node after a jittered exponential backoff.
+
+    Hedging - when an object read (see :func:`riakcached.pools.classify_request`) has not
+    completed after the `hedge_percentile` latency of recent object reads, a backup request
+    is sent to the next node and whichever response arrives first is used. Latencies are
+    kept per operation, so slow key listings or mapreduce jobs do not delay hedging reads.
+
+    Retries and hedges share a :class:`riakcached.policies.RetryBudget` so that they cannot
+    multiply the load on the cluster during an outage.
+
+    Tracing - every request is made in a `riakcached.policy` span tagged with the number of
+    `riak.retries` and whether it was `riak.hedged`, the requests to the nodes are traced by
+    the tracers of the node pools.
+    """
+    __slots__ = [
+        "_latencies",
+        "_lock",
+        "backoff",
+        "budget",
+        "hedge_min_samples",
+        "hedge_percentile",
+        "max_backoff",
+        "pools",
+        "retries",
+    ]
+
+    def __init__(self, pools, retries=2, backoff=0.05, max_backoff=1.0, hedge_percentile=95,
+                 hedge_min_samples=100, budget=None, tracer=None):
+        """Constructs a new :class:`riakcached.policies.PolicyPool`
+
+        :param pools: the pools for each node, the first one is the primary node
+        :type pools: list
+        :param retries: the maximum number of retries for an idempotent request
+        :type retries: int
+        :param backoff: the base backoff in seconds, doubled after every retry
+        :type backoff: float
+        :param max_backoff: the maximum backoff in seconds
+        :type max_backoff: float
+        :param hedge_percentile: the read latency percentile after which to hedge,
+            None disables hedging
+        :type hedge_percentile: float
+        :param hedge_min_samples: the number of reads to observe before hedging
+        :type hedge_min_samples: int
+        :param budget: the budget for retries and hedges, defaults to a new
+            :class:`riakcached.policies.RetryBudget`
+        :type budget: :class:`riakcached.policies.RetryBudget`
+        :param tracer: the tracer to record requests with, see :mod:`riakcached.tracing`
+        :type tracer: :class:`riakcached.tracing.Tracer`
+        """
+        self.pools = list(pools)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.budget = budget or RetryBudget()
+        self._latencies = {}
+        self._lock = threading.Lock()
+        super(PolicyPool, self).__init__(
+            base_url=self.pools[0].url, timeout=self.pools[0].timeout, auto_connect=False,
+            tracer=tracer,
+        )
+
+    def connect(self):
+        """Create the connection pool for every node
+        """
+        for pool in self.pools:
+            pool.connect()
+
+    def close(self):
+        """Closes the connection pool for every node
+        """
+        for pool in self.pools:
+            pool.close()
+
+    def reset(self):
+        """Close every connection and create the connection pool for every node again
+        """
+        for pool in self.pools:
+            pool.reset()
+
+    def metrics(self):
+        """Get the metrics of the pool for every node
+
+        :returns: dict - node url -> the node pool's metrics
+        """
+        return dict((pool.url, pool.metrics()) for pool in self.pools)
+
+    def request(self, method, url, body=None, headers=None):
+        """Makes a single HTTP request, retrying and hedging it when allowed
+
+        :param method: the HTTP method to make the requets with
+        :type method: str
+        :param url: the full url for the request
+        :type url: str
+        :param body: the data to POST or PUT with the request
+        :type body: str
+        :param headers: extra headers to add to the request
+        :type headers: dict
+        :returns: tuple - status, data, headers
+        :raises: :class:`riakcached.exceptions.RiakcachedTimeout`
+        :raises: :class:`riakcached.exceptions.RiakcachedConnectionError`
+        """
+        self.budget.deposit()
+        retryable = method in IDEMPOTENT_METHODS
+        operation = classify_request(method, url)
+        hedged = (operation == "get" and self.hedge_percentile is not None and
+                  len(self.pools) > 1)
+        node = 0
+        attempt = 0
+        with self.tracer.span("riakcached.policy") as span:
+            while True:
+                span.set_tag("riak.retries", attempt)
+                try:
+                    if hedged:
+                        result = self._hedged(node, method, url, body, headers, operation, span)
+                    else:
+                        result = self._send(node, method, url, body, headers, operation)
+                    if result[0] != 503 or not self._should_retry(retryable, attempt):
+                        return result
+                except (exceptions.RiakcachedTimeout, exceptions.RiakcachedConnectionError):
+                    if not self._should_retry(retryable, attempt):
+                        raise
+
+                backoff = min(self.max_backoff, self.backoff * 2 ** attempt)
+                attempt += 1
+                node = (node + 1) % len(self.pools)
+                time.sleep(random.uniform(0, backoff))
+
+    def request_stream(self, method, url, body=None, headers=None):
+        """Makes a single streaming HTTP request against the primary node
+
+        Streaming requests are neither retried nor hedged since their bodies can only be
+        read once.
+
+        :param method: the HTTP method to make the requets with
+        :type method: str
+        :param url: the full url for the request
+        :type url: str
+        :param body: the data to POST or PUT with the request
+        :type body: object
+        :param headers: extra headers to add to the request
+        :type headers: dict
+        :returns: tuple - status, :class:`riakcached.pools.StreamingResponse`, headers
+        :raises: :class:`riakcached.exceptions.RiakcachedTimeout`
+        :raises: :class:`riakcached.exceptions.RiakcachedConnectionError`
+        """
+        return self.pools[0].request_stream(method=method, url=url, body=body, headers=headers)
+
+    def _should_retry(self, retryable, attempt):
+        return retryable and attempt < self.retries and self.budget.withdraw()
+
+    def _window(self, operation):
+        window = self._latencies.get(operation)
+        if window is None:
+            with self._lock:
+                window = self._latencies.setdefault(operation, LatencyWindow())
+        return window
+
+    def _send(self, node, method, url, body, headers, operation):
+        pool = self.pools[node]
+        prefix = self.url.rstrip("/")
+        if node and url.startswith(prefix):
+            url = pool.url.rstrip("/") + url[len(prefix):]
+
+        start = time.time()
+        result = pool.request(method=method, url=url, body=body, headers=headers)
+        self._window(operation).add(time.time() - start)
+        return result
+
+    def _hedged(self, node, method, url, body, headers, operation, span):
+        window = self._window(operation)
+        if len(window) < self.hedge_min_samples:
+            return self._send(node, method, url, body, headers, operation)
+
+        delay = window.percentile(self.hedge_percentile)
+        results = Queue.Queue()
+
+        def send(node):
+            try:
+                results.put((True, self._send(node, method, url, body, headers, operation)))
+            except Exception, e:
+                results.put((False, e))
+
+        def spawn(node):
+            thread = threading.Thread(target=self.tracer.wrap(send), args=(node, ))
+            thread.daemon = True
+            thread.start()
+
+        spawn(node)
+        outstanding = 1
+        try:
+            success, result = results.get(timeout=delay)
+        except Queue.Empty:
+            if self.budget.withdraw():
+                span.set_tag("riak.hedged", True)
+                spawn((node + 1) % len(self.pools))
+                outstanding += 1
+            success, result = results.get()
+        outstanding -= 1
+
+        if not success and outstanding:
+            success, result = results.get()
+        if not success:
+            raise result
+        return result
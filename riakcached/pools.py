@@ -1,6 +1,175 @@
+import httplib
+import os
+import Queue
+import select
+import socket
+import time
+import urlparse
+
 import urllib3
+import urllib3.response
 
 from riakcached import exceptions
+from riakcached.tracing import NOOP_TRACER
+
+
+try:
+    from urllib3.util import Timeout as UrllibTimeout
+except ImportError:
+    UrllibTimeout = None
+
+RECV_SIZE = 65536
+MAX_HEAD_SIZE = 65536
+# requests which can safely be sent again when a reused connection fails
+IDEMPOTENT_METHODS = frozenset(["DELETE", "GET", "HEAD", "PUT"])
+
+
+def iter_chunks(source, chunk_size=65536):
+    """Iterate over `source` in chunks of at most `chunk_size` bytes
+
+    `source` can be a `memoryview`, anything supporting the buffer interface (`str`,
+    `bytearray`, `mmap.mmap`, ...), a file-like object (anything with a `read` method) or
+    an iterable of `str` chunks. Buffers are sliced without copying the underlying data.
+
+    :param source: the data to iterate over
+    :type source: object
+    :param chunk_size: the maximum size of each chunk
+    :type chunk_size: int
+    :returns: generator - yields each chunk of `source`
+    """
+    if isinstance(source, memoryview):
+        for offset in xrange(0, len(source), chunk_size):
+            yield source[offset:offset + chunk_size]
+        return
+
+    try:
+        length = len(source)
+        buffer(source, 0, 0)
+    except (AttributeError, TypeError):
+        pass
+    else:
+        for offset in xrange(0, length, chunk_size):
+            yield buffer(source, offset, chunk_size)
+        return
+
+    if hasattr(source, "read"):
+        chunk = source.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = source.read(chunk_size)
+    else:
+        for chunk in source:
+            if chunk:
+                yield chunk
+
+
+def classify_request(method, url):
+    """Classify a request to the Riak HTTP interface by the operation it performs
+
+    :param method: the HTTP method of the request
+    :type method: str
+    :param url: the full url of the request
+    :type url: str
+    :returns: str - one of "get", "set", "delete", "counter", "keys", "props", "stats",
+        "ping", "mapred" or "other"
+    """
+    path = url.split("?", 1)[0]
+    if "://" in path:
+        path = path.split("/", 3)[3] if path.count("/") > 2 else ""
+    segments = path.strip("/").split("/")
+    if "buckets" in segments:
+        # classify by position, keys and buckets can be named "keys", "counters" or "props"
+        parts = segments[segments.index("buckets") + 1:]
+        kind = parts[1] if len(parts) > 1 else None
+        if kind == "keys" and len(parts) == 2:
+            return "keys"
+        elif kind == "props" and len(parts) == 2:
+            return "props"
+        elif kind == "counters" and len(parts) == 3:
+            return "counter"
+        elif kind == "keys" and len(parts) == 3:
+            if method in ("GET", "HEAD"):
+                return "get"
+            elif method in ("POST", "PUT"):
+                return "set"
+            elif method == "DELETE":
+                return "delete"
+    elif segments[-1] in ("ping", "stats", "mapred"):
+        return segments[-1]
+    return "other"
+
+
+class StreamingResponse(object):
+    """A file-like wrapper around a response body which has not been read yet
+
+    Iterating over a :class:`riakcached.pools.StreamingResponse` yields the body in chunks
+    of `chunk_size` bytes. The underlying connection is released back to the pool when
+    :func:`close` is called or when used as a context manager.
+    """
+    __slots__ = ["chunk_size", "response"]
+
+    def __init__(self, response, chunk_size=65536):
+        """Constructs a new :class:`riakcached.pools.StreamingResponse`
+
+        :param response: the underlying response, must provide `read(amt)`
+        :type response: object
+        :param chunk_size: the size of chunks to yield when iterating
+        :type chunk_size: int
+        """
+        self.response = response
+        self.chunk_size = chunk_size
+
+    def read(self, amt=None):
+        """Read at most `amt` bytes from the response, or the rest of it if `amt` is `None`
+
+        :param amt: the number of bytes to read
+        :type amt: int
+        :returns: str - the data read, an empty string once the body is exhausted
+        """
+        return self.response.read(amt)
+
+    def readinto(self, target):
+        """Read up to `len(target)` bytes into the writable buffer `target`
+
+        :param target: the buffer to read into, e.g. a `bytearray` or `mmap.mmap`
+        :type target: object
+        :returns: int - the number of bytes read
+        """
+        readinto = getattr(self.response, "readinto", None)
+        if readinto is not None:
+            return readinto(target)
+        data = self.response.read(len(target))
+        target[:len(data)] = data
+        return len(data)
+
+    def __iter__(self):
+        chunk = self.response.read(self.chunk_size)
+        while chunk:
+            yield chunk
+            chunk = self.response.read(self.chunk_size)
+
+    def close(self):
+        """Release the underlying connection
+
+        If the body has not been read entirely the connection is closed instead of being
+        reused for another request.
+        """
+        release_conn = getattr(self.response, "release_conn", None)
+        if release_conn is None:
+            self.response.close()
+            return
+
+        if not self.response.closed:
+            connection = getattr(self.response, "_connection", None)
+            if connection is not None:
+                connection.close()
+        release_conn()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
 
 class Pool(object):
@@ -8,24 +177,89 @@ class Pool(object):
 
     This is the base class that should be used for any custom connection
     pool to be used by any of the :class:`riakcached.clients.RiakClient`
+
+    Connections must not be shared between processes, so pools remember the process they
+    were connected in and :func:`check_fork` rebuilds them the first time they are used after
+    a `fork()`. Subclasses should call :func:`check_fork` at the start of every request.
+
+    Subclasses should also make every request in a `riakcached.request` span of their
+    `tracer`, tagged with :func:`riakcached.tracing.Span.set_request`.
     """
-    __slots__ = ["timeout", "url"]
+    __slots__ = ["_pid", "adaptive_timeouts", "timeout", "tracer", "url"]
 
-    def __init__(self, base_url="http://127.0.0.1:8098", timeout=2, auto_connect=True):
+    def __init__(self, base_url="http://127.0.0.1:8098", timeout=2, auto_connect=True,
+                 adaptive_timeouts=None, tracer=None):
         """Constructs a new :class:`riakcached.pools.Pool`
 
+        Adaptive timeouts - when `adaptive_timeouts` is provided the connect and read timeouts
+        of each request are derived from the latencies observed for the same operation,
+        `timeout` is only used until enough latencies have been observed.
+
         :param base_url: the base url that the client should use for requests
         :type base_url: str
         :param timeout: the connection timeout to use
         :type timeout: int
         :param auto_connect: whether or not to call :func:`connect` on __init__
         :type auto_connect: bool
+        :param adaptive_timeouts: the latency tracker to derive timeouts from
+        :type adaptive_timeouts: :class:`riakcached.metrics.AdaptiveTimeouts`
+        :param tracer: the tracer to record requests with, see :mod:`riakcached.tracing`
+        :type tracer: :class:`riakcached.tracing.Tracer`
         """
         self.url = base_url
         self.timeout = timeout
+        self.adaptive_timeouts = adaptive_timeouts
+        self.tracer = tracer or NOOP_TRACER
+        self._pid = os.getpid()
         if auto_connect:
             self.connect()
 
+    def reset(self):
+        """Close every connection and create the connection pool again
+        """
+        self.close()
+        self.connect()
+        self._pid = os.getpid()
+
+    def check_fork(self):
+        """Reset the connection pool when used from a different process than it was created in
+
+        The connections inherited from the parent process are closed in the child process
+        only, the parent process can keep using them.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self.reset()
+
+    def timeouts_for(self, operation):
+        """Get the connect and read timeouts to use for a request
+
+        :param operation: the operation, see :func:`riakcached.pools.classify_request`
+        :type operation: str
+        :returns: tuple - connect timeout, read timeout
+        """
+        if self.adaptive_timeouts is None:
+            return self.timeout, self.timeout
+        return self.adaptive_timeouts.timeouts(self.url, operation, self.timeout)
+
+    def observe(self, operation, latency):
+        """Record the latency of a request made with this pool
+
+        :param operation: the operation, see :func:`riakcached.pools.classify_request`
+        :type operation: str
+        :param latency: the latency of the request in seconds
+        :type latency: float
+        """
+        if self.adaptive_timeouts is not None:
+            self.adaptive_timeouts.observe(self.url, operation, latency)
+
+    def metrics(self):
+        """Get the client side metrics of the pool, e.g. how many connections are open
+
+        :returns: dict - metric name -> value, empty unless implemented by the pool
+        """
+        return {}
+
     def connect(self):
         """Create the connection pool
         """
@@ -53,16 +287,65 @@ class Pool(object):
         """
         raise NotImplementedError("You must not use %s directly" % self.__class__.__name__)
 
+    def request_stream(self, method, url, body=None, headers=None):
+        """Makes a single HTTP request without buffering the request or response body
+
+        When `body` is given it is sent with `Transfer-Encoding: chunked`, it can be anything
+        supported by :func:`riakcached.pools.iter_chunks`.
+
+        :param method: the HTTP method to make the requets with
+        :type method: str
+        :param url: the full url for the request
+        :type url: str
+        :param body: the data to POST or PUT with the request
+        :type body: object
+        :param headers: extra headers to add to the request
+        :type headers: dict
+        :returns: tuple - status, :class:`riakcached.pools.StreamingResponse`, headers
+        :raises: :class:`riakcached.exceptions.RiakcachedTimeout`
+        :raises: :class:`riakcached.exceptions.RiakcachedConnectionError`
+        """
+        raise NotImplementedError("You must not use %s directly" % self.__class__.__name__)
+
 
 class Urllib3Pool(Pool):
     """A subclass of :class:`riakcached.pools.Pool` which uses `urllib3` for requests
     """
-    __slots__ = ["pool"]
+    __slots__ = ["maxsize", "pool", "warm"]
+
+    def __init__(self, base_url="http://127.0.0.1:8098", timeout=2, auto_connect=True,
+                 adaptive_timeouts=None, maxsize=1, warm=0, tracer=None):
+        """Constructs a new :class:`riakcached.pools.Urllib3Pool`
+
+        :param base_url: the base url that the client should use for requests
+        :type base_url: str
+        :param timeout: the connection timeout to use
+        :type timeout: int
+        :param auto_connect: whether or not to call :func:`connect` on __init__
+        :type auto_connect: bool
+        :param adaptive_timeouts: the latency tracker to derive timeouts from
+        :type adaptive_timeouts: :class:`riakcached.metrics.AdaptiveTimeouts`
+        :param maxsize: the number of connections to keep open for reuse
+        :type maxsize: int
+        :param warm: the number of connections to open on :func:`connect`, including after a
+            fork, at most `maxsize`
+        :type warm: int
+        :param tracer: the tracer to record requests with, see :mod:`riakcached.tracing`
+        :type tracer: :class:`riakcached.tracing.Tracer`
+        """
+        self.maxsize = maxsize
+        self.warm = warm
+        super(Urllib3Pool, self).__init__(
+            base_url=base_url, timeout=timeout, auto_connect=auto_connect,
+            adaptive_timeouts=adaptive_timeouts, tracer=tracer,
+        )
 
     def connect(self):
         """Create the connection pool
         """
-        self.pool = urllib3.connection_from_url(self.url)
+        self.pool = urllib3.connection_from_url(self.url, maxsize=self.maxsize)
+        if self.warm:
+            self.warm_up(self.warm)
 
     def close(self):
         """Closes the connection pool if it is opened
@@ -70,6 +353,44 @@ class Urllib3Pool(Pool):
         if self.pool:
             self.pool.close()
 
+    def metrics(self):
+        """Get the connection metrics of the pool
+
+        :returns: dict - the `connections` opened and `requests` made so far, and the number
+            of `idle` connections
+        """
+        if not self.pool:
+            return {}
+        return {
+            "connections": self.pool.num_connections,
+            "requests": self.pool.num_requests,
+            "idle": sum(1 for conn in list(self.pool.pool.queue) if conn is not None),
+        }
+
+    def warm_up(self, count):
+        """Open connections ahead of the first requests
+
+        Warming up is best effort, connections which cannot be opened are left to be opened
+        by the requests using them.
+
+        :param count: the number of connections to open, at most `maxsize`
+        :type count: int
+        :returns: int - the number of connections opened
+        """
+        connections = [self.pool._get_conn() for _ in xrange(min(count, self.maxsize))]
+        opened = 0
+        for conn in connections:
+            try:
+                if conn.sock is None:
+                    conn.timeout = self.timeout
+                    conn.connect()
+                opened += 1
+            except (socket.error, httplib.HTTPException):
+                conn.close()
+        for conn in connections:
+            self.pool._put_conn(conn)
+        return opened
+
     def request(self, method, url, body=None, headers=None):
         """Makes a single HTTP request
 
@@ -85,17 +406,665 @@ class Urllib3Pool(Pool):
         :raises: :class:`riakcached.exceptions.RiakcachedTimeout`
         :raises: :class:`riakcached.exceptions.RiakcachedConnectionError`
         """
+        self.check_fork()
+        operation = classify_request(method, url)
+        with self.tracer.span("riakcached.request") as span:
+            start = time.time()
+            try:
+                response = self.pool.urlopen(
+                    method=method,
+                    url=url,
+                    body=body,
+                    headers=headers,
+                    timeout=self._urllib3_timeout(operation),
+                    redirect=False,
+                )
+            except urllib3.exceptions.TimeoutError, e:
+                self.observe(operation, time.time() - start)
+                raise exceptions.RiakcachedTimeout(e.message)
+            except urllib3.exceptions.HTTPError, e:
+                raise exceptions.RiakcachedConnectionError(e.message)
+            self.observe(operation, time.time() - start)
+            data = response.data
+            span.set_request(method, self.url, body, response.status, data)
+            return response.status, data, response.getheaders()
+
+    def _urllib3_timeout(self, operation):
+        if self.adaptive_timeouts is None:
+            return self.timeout
+
+        connect, read = self.timeouts_for(operation)
+        if UrllibTimeout is None:
+            return max(connect, read)
+        return UrllibTimeout(connect=connect, read=read)
+
+    def request_stream(self, method, url, body=None, headers=None):
+        """Makes a single HTTP request without buffering the request or response body
+
+        When `body` is given it is sent with `Transfer-Encoding: chunked`, it can be anything
+        supported by :func:`riakcached.pools.iter_chunks`.
+
+        :param method: the HTTP method to make the requets with
+        :type method: str
+        :param url: the full url for the request
+        :type url: str
+        :param body: the data to POST or PUT with the request
+        :type body: object
+        :param headers: extra headers to add to the request
+        :type headers: dict
+        :returns: tuple - status, :class:`riakcached.pools.StreamingResponse`, headers
+        :raises: :class:`riakcached.exceptions.RiakcachedTimeout`
+        :raises: :class:`riakcached.exceptions.RiakcachedConnectionError`
+        """
+        self.check_fork()
+        operation = classify_request(method, url)
+        with self.tracer.span("riakcached.request") as span:
+            try:
+                if body is None:
+                    response = self.pool.urlopen(
+                        method=method,
+                        url=url,
+                        headers=headers,
+                        timeout=self._urllib3_timeout(operation),
+                        redirect=False,
+                        preload_content=False,
+                    )
+                else:
+                    response = self._send_chunked(method, url, body, headers, operation)
+            except urllib3.exceptions.TimeoutError, e:
+                raise exceptions.RiakcachedTimeout(e.message)
+            except urllib3.exceptions.HTTPError, e:
+                raise exceptions.RiakcachedConnectionError(e.message)
+            except socket.timeout, e:
+                raise exceptions.RiakcachedTimeout(str(e))
+            except (socket.error, httplib.HTTPException), e:
+                raise exceptions.RiakcachedConnectionError(str(e))
+            span.set_request(method, self.url, body, response.status, None)
+            return response.status, StreamingResponse(response), response.getheaders()
+
+    def _send_chunked(self, method, url, body, headers, operation):
+        connect_timeout, read_timeout = self.timeouts_for(operation)
+        conn = self.pool._get_conn()
         try:
-            response = self.pool.urlopen(
-                method=method,
-                url=url,
-                body=body,
-                headers=headers,
-                timeout=self.timeout,
-                redirect=False,
-            )
-            return response.status, response.data, response.getheaders()
-        except urllib3.exceptions.TimeoutError, e:
-            raise exceptions.RiakcachedTimeout(e.message)
-        except urllib3.exceptions.HTTPError, e:
-            raise exceptions.RiakcachedConnectionError(e.message)
+            conn.timeout = connect_timeout
+            conn.putrequest(method, url, skip_accept_encoding=True)
+            for header, value in (headers or {}).iteritems():
+                conn.putheader(header, value)
+            conn.putheader("Transfer-Encoding", "chunked")
+            conn.endheaders()
+            conn.sock.settimeout(read_timeout)
+            for chunk in iter_chunks(body):
+                conn.send("%x\r\n" % len(chunk))
+                conn.send(chunk)
+                conn.send("\r\n")
+            conn.send("0\r\n\r\n")
+            response = conn.getresponse(buffering=True)
+        except:
+            conn.close()
+            self.pool._put_conn(None)
+            raise
+        return urllib3.response.HTTPResponse.from_httplib(
+            response, pool=self.pool, connection=conn, preload_content=False,
+        )
+
+
+class SocketConnection(object):
+    """A keep-alive HTTP/1.1 connection over a plain socket, used by
+    :class:`riakcached.pools.SocketPool`
+
+    Data received past the end of what has been read is kept for the next read, only the
+    status line and headers of responses are parsed.
+    """
+    __slots__ = ["_buffer", "address", "create_connection", "sock"]
+
+    def __init__(self, address, create_connection=socket.create_connection):
+        """Constructs a new :class:`riakcached.pools.SocketConnection`
+
+        :param address: the host and port to connect to
+        :type address: tuple
+        :param create_connection: the function opening the socket, see
+            `socket.create_connection`
+        :type create_connection: function
+        """
+        self.address = address
+        self.create_connection = create_connection
+        self.sock = None
+        self._buffer = ""
+
+    def connect(self, timeout):
+        """Open the connection
+
+        :param timeout: the connect timeout in seconds
+        :type timeout: float
+        """
+        self.sock = self.create_connection(self.address, timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._buffer = ""
+
+    def close(self):
+        """Close the connection, it is opened again by the next :func:`connect`
+        """
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self._buffer = ""
+
+    def is_dropped(self):
+        """Check whether an idle connection was closed by the server
+
+        An idle keep-alive connection has nothing to read, so a readable socket means the
+        server closed it (or sent something unexpected) and it should not be used.
+
+        :returns: bool - True if the connection should be opened again
+        """
+        if self.sock is None:
+            return True
+        readable, _, _ = select.select([self.sock], [], [], 0)
+        return bool(readable)
+
+    def send(self, data):
+        """Send all of `data`
+
+        :param data: the data to send
+        :type data: str
+        """
+        self.sock.sendall(data)
+
+    def _fill(self):
+        data = self.sock.recv(RECV_SIZE)
+        if not data:
+            raise httplib.IncompleteRead(self._buffer)
+        self._buffer += data
+
+    def read_line(self):
+        """Read a line, without its line ending
+
+        :returns: str - the line
+        """
+        index = self._buffer.find("\r\n")
+        while index < 0:
+            if len(self._buffer) > MAX_HEAD_SIZE:
+                raise httplib.LineTooLong("line")
+            self._fill()
+            index = self._buffer.find("\r\n")
+        line = self._buffer[:index]
+        self._buffer = self._buffer[index + 2:]
+        return line
+
+    def read_head(self):
+        """Read the status line and headers of a response
+
+        Repeated headers are joined with commas, like `urllib3` does.
+
+        :returns: tuple - HTTP version, status and headers (lower case names)
+        :raises: `httplib.BadStatusLine` - when the connection was closed before a response
+        """
+        index = self._buffer.find("\r\n\r\n")
+        while index < 0:
+            if len(self._buffer) > MAX_HEAD_SIZE:
+                raise httplib.LineTooLong("header")
+            data = self.sock.recv(RECV_SIZE)
+            if not data:
+                raise httplib.BadStatusLine(self._buffer)
+            self._buffer += data
+            index = self._buffer.find("\r\n\r\n")
+        lines = self._buffer[:index].split("\r\n")
+        self._buffer = self._buffer[index + 4:]
+
+        try:
+            version, status = lines[0].split(" ", 2)[:2]
+            status = int(status)
+        except ValueError:
+            raise httplib.BadStatusLine(lines[0])
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            name = name.strip().lower()
+            value = value.strip()
+            if name in headers:
+                headers[name] = "%s, %s" % (headers[name], value)
+            else:
+                headers[name] = value
+        return version, status, headers
+
+    def read(self, size):
+        """Read exactly `size` bytes
+
+        Bodies larger than what has already been received are read into a single buffer
+        allocated up front.
+
+        :param size: the number of bytes to read
+        :type size: int
+        :returns: str - the data read
+        :raises: `httplib.IncompleteRead` - when the connection is closed before `size` bytes
+        """
+        if len(self._buffer) >= size:
+            data = self._buffer[:size]
+            self._buffer = self._buffer[size:]
+            return data
+
+        target = bytearray(size)
+        view = memoryview(target)
+        received = len(self._buffer)
+        view[:received] = self._buffer
+        self._buffer = ""
+        while received < size:
+            count = self.sock.recv_into(view[received:], size - received)
+            if not count:
+                raise httplib.IncompleteRead(str(target[:received]), size - received)
+            received += count
+        return str(target)
+
+    def read_some(self, size):
+        """Read at most `size` bytes, as soon as some are available
+
+        :param size: the maximum number of bytes to read
+        :type size: int
+        :returns: str - the data read, an empty string once the connection is closed
+        """
+        if self._buffer:
+            data = self._buffer[:size]
+            self._buffer = self._buffer[size:]
+            return data
+        return self.sock.recv(size)
+
+    def readinto(self, target):
+        """Read at most `len(target)` bytes into `target`, as soon as some are available
+
+        Data not received yet is received straight into `target`, without copying.
+
+        :param target: the writable buffer to read into
+        :type target: object
+        :returns: int - the number of bytes read, 0 once the connection is closed
+        """
+        if self._buffer:
+            count = min(len(target), len(self._buffer))
+            target[:count] = self._buffer[:count]
+            self._buffer = self._buffer[count:]
+            return count
+        return self.sock.recv_into(target)
+
+    def read_all(self):
+        """Read until the connection is closed
+
+        :returns: str - the data read
+        """
+        pieces = [self._buffer]
+        self._buffer = ""
+        data = self.sock.recv(RECV_SIZE)
+        while data:
+            pieces.append(data)
+            data = self.sock.recv(RECV_SIZE)
+        return "".join(pieces)
+
+
+class SocketResponse(object):
+    """A response being read from a connection of a :class:`riakcached.pools.SocketPool`
+
+    Used by :class:`riakcached.pools.StreamingResponse`, the connection goes back to the pool
+    once the response is released.
+    """
+    __slots__ = ["_chunk_left", "_connection", "_done", "_length", "chunked", "headers", "pool",
+                 "status", "will_close"]
+
+    def __init__(self, connection, pool, method):
+        """Constructs a new :class:`riakcached.pools.SocketResponse` and reads its head
+
+        :param connection: the connection the response is read from
+        :type connection: :class:`riakcached.pools.SocketConnection`
+        :param pool: the pool to return `connection` to
+        :type pool: :class:`riakcached.pools.SocketPool`
+        :param method: the HTTP method of the request
+        :type method: str
+        """
+        self._connection = connection
+        self.pool = pool
+        version, self.status, self.headers = connection.read_head()
+        keep_alive = self.headers.get("connection", "").lower()
+        if version == "HTTP/1.0":
+            self.will_close = keep_alive != "keep-alive"
+        else:
+            self.will_close = keep_alive == "close"
+        self.chunked = False
+        self._chunk_left = None
+        self._length = None
+        if method == "HEAD" or self.status in (204, 304) or 100 <= self.status < 200:
+            self._length = 0
+        elif self.headers.get("transfer-encoding", "").lower() == "chunked":
+            self.chunked = True
+        elif "content-length" in self.headers:
+            self._length = int(self.headers["content-length"])
+        else:
+            self.will_close = True
+        self._done = self._length == 0
+
+    @property
+    def closed(self):
+        return self._done
+
+    def _next_chunk(self):
+        if self._chunk_left == 0:
+            self._connection.read(2)
+        self._chunk_left = int(self._connection.read_line().split(";", 1)[0], 16)
+        if not self._chunk_left:
+            while self._connection.read_line():
+                pass
+            self._done = True
+
+    def read(self, amt=None):
+        """Read at most `amt` bytes of the body, or the rest of it if `amt` is `None`
+
+        :param amt: the number of bytes to read
+        :type amt: int
+        :returns: str - the data read, an empty string once the body is exhausted
+        """
+        if self._done:
+            return ""
+        if self.chunked:
+            pieces = []
+            while amt is None or amt > 0:
+                if not self._chunk_left:
+                    self._next_chunk()
+                    if self._done:
+                        break
+                size = self._chunk_left if amt is None else min(amt, self._chunk_left)
+                pieces.append(self._connection.read(size))
+                self._chunk_left -= size
+                if amt is not None:
+                    amt -= size
+            return "".join(pieces)
+        elif self._length is None:
+            if amt is None:
+                data = self._connection.read_all()
+            else:
+                data = self._connection.read_some(amt)
+            self._done = amt is None or not data
+            return data
+
+        if amt is None or amt >= self._length:
+            data = self._connection.read(self._length)
+        else:
+            data = self._connection.read_some(amt)
+            if not data:
+                raise httplib.IncompleteRead("", self._length)
+        self._length -= len(data)
+        self._done = not self._length
+        return data
+
+    def readinto(self, target):
+        """Read at most `len(target)` bytes of the body into `target`
+
+        Bodies with a Content-Length are received straight into `target`, without copying.
+
+        :param target: the writable buffer to read into
+        :type target: object
+        :returns: int - the number of bytes read, 0 once the body is exhausted
+        """
+        if self._done:
+            return 0
+        if self.chunked or self._length is None:
+            data = self.read(len(target))
+            target[:len(data)] = data
+            return len(data)
+
+        count = self._connection.readinto(memoryview(target)[:min(len(target), self._length)])
+        if not count:
+            raise httplib.IncompleteRead("", self._length)
+        self._length -= count
+        self._done = not self._length
+        return count
+
+    def release_conn(self):
+        """Return the connection to the pool, closing it unless it can be reused
+        """
+        if self._connection is not None:
+            if self.will_close or not self._done:
+                self._connection.close()
+            self.pool._put_conn(self._connection)
+            self._connection = None
+
+
+class SocketPool(Pool):
+    """A subclass of :class:`riakcached.pools.Pool` which speaks HTTP/1.1 over plain sockets
+
+    A lighter alternative to :class:`riakcached.pools.Urllib3Pool` without its per-request
+    objects: requests are written with a single `sendall`, only the status line and headers
+    of responses are parsed and bodies are received into a buffer allocated once for their
+    Content-Length. :func:`riakcached.pools.StreamingResponse.readinto` receives bodies
+    straight into the caller's buffer.
+
+    At most `maxsize` connections are open at once and kept alive between requests, requests
+    made while every connection is in use wait for one to be released, for up to
+    `pool_timeout` seconds. Only `http://` urls are supported.
+    """
+    __slots__ = ["connections", "host", "maxsize", "netloc", "pool_timeout", "port", "prefix"]
+
+    def __init__(self, base_url="http://127.0.0.1:8098", timeout=2, auto_connect=True,
+                 adaptive_timeouts=None, maxsize=10, pool_timeout=None, tracer=None):
+        """Constructs a new :class:`riakcached.pools.SocketPool`
+
+        :param base_url: the base url that the client should use for requests
+        :type base_url: str
+        :param timeout: the connection timeout to use
+        :type timeout: int
+        :param auto_connect: whether or not to call :func:`connect` on __init__
+        :type auto_connect: bool
+        :param adaptive_timeouts: the latency tracker to derive timeouts from
+        :type adaptive_timeouts: :class:`riakcached.metrics.AdaptiveTimeouts`
+        :param maxsize: the maximum number of connections to open
+        :type maxsize: int
+        :param pool_timeout: the maximum seconds to wait for a free connection, None waits
+            as long as needed
+        :type pool_timeout: float
+        :param tracer: the tracer to record requests with, see :mod:`riakcached.tracing`, the
+            time spent waiting for a free connection is tagged as `riak.pool_wait`
+        :type tracer: :class:`riakcached.tracing.Tracer`
+        """
+        parsed = urlparse.urlsplit(base_url)
+        if parsed.scheme != "http":
+            raise ValueError("%s only supports http:// urls" % self.__class__.__name__)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.netloc = parsed.netloc
+        self.prefix = "%s://%s" % (parsed.scheme, parsed.netloc)
+        self.maxsize = maxsize
+        self.pool_timeout = pool_timeout
+        self.connections = None
+        super(SocketPool, self).__init__(
+            base_url=base_url, timeout=timeout, auto_connect=auto_connect,
+            adaptive_timeouts=adaptive_timeouts, tracer=tracer,
+        )
+
+    def connect(self):
+        """Create the connection pool
+
+        Connections are opened when they are first needed.
+        """
+        self.connections = self._queue(self.maxsize)
+        for _ in xrange(self.maxsize):
+            self.connections.put(None)
+
+    def close(self):
+        """Closes the idle connections of the pool
+        """
+        connections = self.connections
+        if connections is None:
+            return
+        idle = []
+        while True:
+            try:
+                idle.append(connections.get_nowait())
+            except Queue.Empty:
+                break
+        for conn in idle:
+            if conn is not None:
+                conn.close()
+            connections.put(None)
+
+    def metrics(self):
+        """Get the connection metrics of the pool
+
+        :returns: dict - the number of connections `in_use` and of open `idle` connections
+        """
+        if self.connections is None:
+            return {}
+        idle = list(self.connections.queue)
+        return {
+            "in_use": self.maxsize - len(idle),
+            "idle": sum(1 for conn in idle if conn is not None and conn.sock is not None),
+        }
+
+    def _queue(self, maxsize):
+        return Queue.LifoQueue(maxsize)
+
+    def _connection(self):
+        return SocketConnection((self.host, self.port))
+
+    def _get_conn(self):
+        try:
+            conn = self.connections.get(timeout=self.pool_timeout)
+        except Queue.Empty:
+            raise exceptions.RiakcachedTimeout("no connection available to %s" % self.url)
+        if conn is None:
+            conn = self._connection()
+        return conn
+
+    def _put_conn(self, conn):
+        # after a reset the new queue is already full, connections still in use when it was
+        # replaced are closed rather than waiting forever for a free slot
+        try:
+            self.connections.put_nowait(conn)
+        except Queue.Full:
+            conn.close()
+
+    def _path(self, url):
+        if url.startswith(self.prefix):
+            return url[len(self.prefix):] or "/"
+        parsed = urlparse.urlsplit(url)
+        if parsed.query:
+            return "%s?%s" % (parsed.path, parsed.query)
+        return parsed.path or "/"
+
+    def _head(self, method, url, headers, length):
+        lines = ["%s %s HTTP/1.1\r\nHost: %s\r\n" % (method, self._path(url), self.netloc)]
+        for header, value in (headers or {}).iteritems():
+            lines.append("%s: %s\r\n" % (header, value))
+        if length is None:
+            lines.append("Transfer-Encoding: chunked\r\n\r\n")
+        else:
+            lines.append("Content-Length: %d\r\n\r\n" % length)
+        return "".join(lines)
+
+    def _send(self, conn, method, url, body, headers, operation):
+        connect_timeout, read_timeout = self.timeouts_for(operation)
+        if conn.sock is not None and conn.is_dropped():
+            conn.close()
+        reused = conn.sock is not None
+        buffered = body is None or isinstance(body, basestring)
+        try:
+            if not reused:
+                conn.connect(connect_timeout)
+            conn.sock.settimeout(read_timeout)
+            if body is None:
+                conn.send(self._head(method, url, headers, 0))
+            elif buffered and len(body) <= 65536:
+                conn.send(self._head(method, url, headers, len(body)) + body)
+            elif buffered:
+                conn.send(self._head(method, url, headers, len(body)))
+                conn.send(body)
+            else:
+                conn.send(self._head(method, url, headers, None))
+                for chunk in iter_chunks(body):
+                    conn.send("%x\r\n" % len(chunk))
+                    conn.send(chunk)
+                    conn.send("\r\n")
+                conn.send("0\r\n\r\n")
+            return SocketResponse(conn, self, method)
+        except socket.timeout:
+            conn.close()
+            raise
+        except (socket.error, httplib.HTTPException):
+            conn.close()
+            # the server may have closed an idle keep-alive connection after it was checked,
+            # which is only noticed when it is used, so retry once on a new connection. Other
+            # requests (counter increments, mapreduce, ...) may already have been applied.
+            if reused and buffered and method in IDEMPOTENT_METHODS:
+                return self._send(conn, method, url, body, headers, operation)
+            raise
+
+    def request(self, method, url, body=None, headers=None):
+        """Makes a single HTTP request
+
+        :param method: the HTTP method to make the requets with
+        :type method: str
+        :param url: the full url for the request
+        :type url: str
+        :param body: the data to POST or PUT with the request
+        :type body: str
+        :param headers: extra headers to add to the request
+        :type headers: dict
+        :returns: tuple - status, data, headers
+        :raises: :class:`riakcached.exceptions.RiakcachedTimeout`
+        :raises: :class:`riakcached.exceptions.RiakcachedConnectionError`
+        """
+        self.check_fork()
+        operation = classify_request(method, url)
+        with self.tracer.span("riakcached.request") as span:
+            waiting = time.time()
+            conn = self._get_conn()
+            start = time.time()
+            span.set_tag("riak.pool_wait", start - waiting)
+            try:
+                response = self._send(conn, method, url, body, headers, operation)
+                data = response.read()
+                if response.will_close:
+                    conn.close()
+            except socket.timeout, e:
+                conn.close()
+                self.observe(operation, time.time() - start)
+                raise exceptions.RiakcachedTimeout(str(e))
+            except (socket.error, httplib.HTTPException), e:
+                conn.close()
+                raise exceptions.RiakcachedConnectionError(str(e) or e.__class__.__name__)
+            finally:
+                self._put_conn(conn)
+            self.observe(operation, time.time() - start)
+            span.set_request(method, self.url, body, response.status, data)
+            return response.status, data, response.headers
+
+    def request_stream(self, method, url, body=None, headers=None):
+        """Makes a single HTTP request without buffering the request or response body
+
+        When `body` is given it is sent with `Transfer-Encoding: chunked`, it can be anything
+        supported by :func:`riakcached.pools.iter_chunks`.
+
+        :param method: the HTTP method to make the requets with
+        :type method: str
+        :param url: the full url for the request
+        :type url: str
+        :param body: the data to POST or PUT with the request
+        :type body: object
+        :param headers: extra headers to add to the request
+        :type headers: dict
+        :returns: tuple - status, :class:`riakcached.pools.StreamingResponse`, headers
+        :raises: :class:`riakcached.exceptions.RiakcachedTimeout`
+        :raises: :class:`riakcached.exceptions.RiakcachedConnectionError`
+        """
+        self.check_fork()
+        operation = classify_request(method, url)
+        if isinstance(body, basestring):
+            body = [body]
+        with self.tracer.span("riakcached.request") as span:
+            waiting = time.time()
+            conn = self._get_conn()
+            span.set_tag("riak.pool_wait", time.time() - waiting)
+            try:
+                response = self._send(conn, method, url, body, headers, operation)
+            except socket.timeout, e:
+                self._put_conn(conn)
+                raise exceptions.RiakcachedTimeout(str(e))
+            except (socket.error, httplib.HTTPException), e:
+                self._put_conn(conn)
+                raise exceptions.RiakcachedConnectionError(str(e) or e.__class__.__name__)
+            span.set_request(method, self.url, body, response.status, None)
+            return response.status, StreamingResponse(response), response.headers
@@ -0,0 +1,365 @@
+import contextlib
+import cPickle
+import gc
+import json
+import marshal
+import multiprocessing
+import os
+import threading
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+MAX_RESOLVED = 1024
+MARSHAL_SCALAR_TYPES = frozenset([
+    type(None), bool, complex, float, int, long, str, unicode,
+])
+MARSHAL_CONTAINER_TYPES = frozenset([frozenset, list, set, tuple])
+
+
+def media_type(content_type):
+    """Strip the parameters from a Content-Type and normalize its case
+
+    Example::
+
+        media_type("Application/JSON; charset=UTF-8") == "application/json"
+
+    :param content_type: the Content-Type
+    :type content_type: str
+    :returns: str - the lower case media type
+    """
+    return content_type.split(";", 1)[0].strip().lower()
+
+
+class LazyValue(object):
+    """A raw value which is only deserialized when it is first accessed
+
+    Returned by :func:`riakcached.clients.RiakClient.get` and
+    :func:`riakcached.clients.RiakClient.get_many` when called with `lazy=True`, so callers
+    only pay for deserializing the values they actually use. `size` is the length of the raw
+    value in bytes. A :class:`riakcached.serializers.LazyValue` is always truthy, even for an
+    empty stored value, so it can be tested like the `None` returned for missing keys.
+
+    Example::
+
+        values = client.get_many(keys, lazy=True)
+        wanted = [value.value for value in values.itervalues() if value.size < 1024]
+    """
+    __slots__ = ["_value", "content_type", "data", "deserializer", "loaded", "size"]
+
+    def __init__(self, data, content_type, deserializer):
+        """Constructs a new :class:`riakcached.serializers.LazyValue`
+
+        :param data: the raw value
+        :type data: str
+        :param content_type: the Content-Type of `data`
+        :type content_type: str
+        :param deserializer: the function deserializing `data`
+        :type deserializer: function
+        """
+        self.data = data
+        self.size = len(data)
+        self.content_type = content_type
+        self.deserializer = deserializer
+        self.loaded = False
+        self._value = None
+
+    def __repr__(self):
+        return "<LazyValue %s, %d bytes%s>" % (
+            self.content_type, self.size, ", loaded" if self.loaded else "",
+        )
+
+    @property
+    def value(self):
+        """The deserialized value, deserialized on first access and memoized
+        """
+        if not self.loaded:
+            self._value = self.deserializer(self.data)
+            self.loaded = True
+        return self._value
+
+
+class SerializerRegistry(object):
+    """Serializers and deserializers registered by Content-Type
+
+    Lookups are tolerant of Content-Type parameters and case, so values stored as
+    `application/json; charset=utf-8` are deserialized as `application/json`, and structured
+    syntax suffixes fall back to their base format, so `application/vnd.example+json` is
+    also handled as `application/json`. Anything else is passed through `str`.
+
+    The function used for each distinct Content-Type string is resolved once and cached, so
+    the lookup on every request is a single dict access.
+
+    Built in formats are `application/json` and, when the `msgpack` package is installed,
+    `application/msgpack` and `application/x-msgpack`. `marshal` is faster but not safe for
+    untrusted or crafted data, register it explicitly when every writer is trusted::
+
+        registry.add("application/x-python-marshal", marshal.dumps, marshal.loads)
+    """
+    __slots__ = ["_lock", "_resolved_deserializers", "_resolved_serializers", "deserializers",
+                 "serializers"]
+
+    def __init__(self, defaults=True):
+        """Constructs a new :class:`riakcached.serializers.SerializerRegistry`
+
+        :param defaults: whether to register the built in formats
+        :type defaults: bool
+        """
+        self.serializers = {}
+        self.deserializers = {}
+        self._resolved_serializers = {}
+        self._resolved_deserializers = {}
+        self._lock = threading.Lock()
+        if defaults:
+            self.add("application/json", json.dumps, json.loads)
+            if msgpack is not None:
+                self.add("application/msgpack", msgpack.packb, msgpack.unpackb)
+                self.add("application/x-msgpack", msgpack.packb, msgpack.unpackb)
+
+    def add(self, content_type, serializer, deserializer):
+        """Register both the serializer and deserializer for a Content-Type
+
+        :param content_type: the Content-Type to register
+        :type content_type: str
+        :param serializer: the function converting an object to a `str`
+        :type serializer: function
+        :param deserializer: the function converting a `str` back to an object
+        :type deserializer: function
+        """
+        self.add_serializer(content_type, serializer)
+        self.add_deserializer(content_type, deserializer)
+
+    def add_serializer(self, content_type, serializer):
+        """Register the serializer for a Content-Type
+
+        :param content_type: the Content-Type to register
+        :type content_type: str
+        :param serializer: the function converting an object to a `str`
+        :type serializer: function
+        """
+        with self._lock:
+            self.serializers[content_type.lower()] = serializer
+            self._resolved_serializers = {}
+
+    def add_deserializer(self, content_type, deserializer):
+        """Register the deserializer for a Content-Type
+
+        :param content_type: the Content-Type to register
+        :type content_type: str
+        :param deserializer: the function converting a `str` back to an object
+        :type deserializer: function
+        """
+        with self._lock:
+            self.deserializers[content_type.lower()] = deserializer
+            self._resolved_deserializers = {}
+
+    def _resolve(self, registered, resolved, content_type):
+        lowered = content_type.lower()
+        function = registered.get(lowered)
+        if function is None:
+            base = media_type(lowered)
+            function = registered.get(base)
+            if function is None and "+" in base:
+                kind = base.split("/", 1)[0]
+                function = registered.get("%s/%s" % (kind, base.rsplit("+", 1)[1]))
+        if function is None:
+            function = str
+        with self._lock:
+            if len(resolved) >= MAX_RESOLVED:
+                resolved.clear()
+            resolved[content_type] = function
+        return function
+
+    def serializer_for(self, content_type):
+        """Get the serializer to use for a Content-Type
+
+        :param content_type: the Content-Type, parameters are allowed
+        :type content_type: str
+        :returns: function - the serializer, `str` when none is registered
+        """
+        resolved = self._resolved_serializers
+        function = resolved.get(content_type)
+        if function is None:
+            function = self._resolve(self.serializers, resolved, content_type)
+        return function
+
+    def deserializer_for(self, content_type):
+        """Get the deserializer to use for a Content-Type
+
+        :param content_type: the Content-Type, parameters are allowed
+        :type content_type: str
+        :returns: function - the deserializer, `str` when none is registered
+        """
+        resolved = self._resolved_deserializers
+        function = resolved.get(content_type)
+        if function is None:
+            function = self._resolve(self.deserializers, resolved, content_type)
+        return function
+
+    def serialize(self, data, content_type):
+        """Serialize `data` to `content_type`
+
+        :param data: the data to serialize
+        :type data: object
+        :param content_type: the Content-Type to serialize `data` to
+        :type content_type: str
+        :returns: str - the serialized data
+        """
+        return self.serializer_for(content_type)(data)
+
+    def deserialize(self, data, content_type):
+        """Deserialize `data` from `content_type`
+
+        :param data: the data to deserialize
+        :type data: str
+        :param content_type: the Content-Type to deserialize `data` from
+        :type content_type: str
+        :returns: object - whatever the deserializer returns
+        """
+        return self.deserializer_for(content_type)(data)
+
+    def lazy(self, data, content_type):
+        """Wrap `data` to be deserialized from `content_type` on first access
+
+        :param data: the data to deserialize
+        :type data: str
+        :param content_type: the Content-Type to deserialize `data` from
+        :type content_type: str
+        :returns: :class:`riakcached.serializers.LazyValue` - the lazy value
+        """
+        return LazyValue(data, content_type, self.deserializer_for(content_type))
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    # building large object graphs repeatedly triggers the cyclic garbage collector, which
+    # can take as long as the deserializing itself
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _marshallable(value):
+    # marshal silently turns subclasses (and bytearray) into their base type, so only values
+    # made of exactly the builtin types it handles are sent back marshalled
+    pending = [value]
+    while pending:
+        value = pending.pop()
+        kind = type(value)
+        if kind is dict:
+            pending.extend(value.iterkeys())
+            pending.extend(value.itervalues())
+        elif kind in MARSHAL_CONTAINER_TYPES:
+            pending.extend(value)
+        elif kind not in MARSHAL_SCALAR_TYPES:
+            return False
+    return True
+
+
+def _deserialize_batch(batch):
+    with _gc_paused():
+        results = [deserializer(data) for deserializer, data in batch]
+    if not _marshallable(results):
+        return results
+    # marshal is much cheaper to load than pickle, which is used for anything else
+    return marshal.dumps(results)
+
+
+class ProcessDeserializer(object):
+    """Deserializes batches of large values on a pool of worker processes
+
+    Deserializing is CPU bound, so threads cannot deserialize several values at once. Values
+    of at least `threshold` bytes are split into one batch per process and deserialized by the
+    worker processes while smaller values are deserialized in this process. Values whose
+    deserializer cannot be pickled (e.g. lambdas or closures) are also deserialized in this
+    process, and so are batches with only a single large value.
+
+    The worker processes are started on first use, and started again when used from a forked
+    child process.
+    """
+    __slots__ = ["_lock", "_picklable", "_pid", "_pool", "processes", "threshold"]
+
+    def __init__(self, processes=None, threshold=65536):
+        """Constructs a new :class:`riakcached.serializers.ProcessDeserializer`
+
+        :param processes: the number of worker processes, defaults to the number of CPUs
+        :type processes: int
+        :param threshold: the size in bytes from which values are deserialized in a worker
+        :type threshold: int
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.threshold = threshold
+        self._picklable = {}
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _is_picklable(self, deserializer):
+        picklable = self._picklable.get(deserializer)
+        if picklable is None:
+            try:
+                cPickle.dumps(deserializer, cPickle.HIGHEST_PROTOCOL)
+                picklable = True
+            except Exception:
+                picklable = False
+            self._picklable[deserializer] = picklable
+        return picklable
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = multiprocessing.Pool(self.processes)
+                self._pid = os.getpid()
+            return self._pool
+
+    def deserialize_many(self, values):
+        """Deserialize several values
+
+        :param values: the values to deserialize
+        :type values: list
+        :returns: list - the deserialized `values`, in the same order
+        :raises: whatever a deserializer raises
+        """
+        remote = [
+            index for index, value in enumerate(values)
+            if not value.loaded and value.size >= self.threshold
+            and self._is_picklable(value.deserializer)
+        ]
+        if len(remote) < 2:
+            return [value.value for value in values]
+
+        batches = [remote[offset::self.processes] for offset in xrange(self.processes)]
+        batches = [batch for batch in batches if batch]
+        pending = self._get_pool().map_async(_deserialize_batch, [
+            [(values[index].deserializer, values[index].data) for index in batch]
+            for batch in batches
+        ], chunksize=1)
+
+        remote_indexes = set(remote)
+        results = [
+            None if index in remote_indexes else value.value
+            for index, value in enumerate(values)
+        ]
+        for batch, deserialized in zip(batches, pending.get()):
+            if isinstance(deserialized, str):
+                with _gc_paused():
+                    deserialized = marshal.loads(deserialized)
+            for index, value in zip(batch, deserialized):
+                results[index] = value
+        return results
+
+    def close(self):
+        """Stop the worker processes
+        """
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.terminate()
+                self._pool.join()
+            self._pool = None
@@ -0,0 +1,499 @@
+"""A memcached text protocol server backed by a :class:`riakcached.clients.RiakClient`
+
+Connections are served from a single `asyncore` event loop, while the Riak requests for each
+command run on a bounded pool of worker threads sharing one client, and so one connection
+pool. Commands from a connection run one at a time and in order, so clients can pipeline
+commands, while multi-key `get`/`gets` commands fetch their keys concurrently on several of
+the worker threads.
+
+Supported commands are `get`, `gets`, `set`, `add`, `delete`, `incr`, `decr`, `stats`,
+`version` and `quit`. Values are stored as `application/octet-stream` with their memcached
+flags in the `X-Riak-Meta-Flags` metadata, and the CAS unique returned by `gets` is derived
+from the object's ETag.
+
+Like memcached, `incr` and `decr` update a decimal value stored with `set`: a missing key is
+`NOT_FOUND`, other values are a `CLIENT_ERROR`, `incr` wraps around at 2**64 and `decr`
+stops at 0. The new value is stored only if the object's ETag did not change since it was
+read (`If-Match`), retrying on concurrent updates. Riak being eventually consistent, updates
+racing on different nodes during a partition can still be lost.
+
+Usage::
+
+    riakcached-server --port 11211 --riak-url http://127.0.0.1:8098 --bucket cache
+"""
+import argparse
+import asynchat
+import asyncore
+import collections
+import os
+import Queue
+import socket
+import threading
+import time
+import zlib
+
+import riakcached
+from riakcached.clients import RiakClient
+from riakcached.exceptions import RiakcachedPreconditionFailed
+from riakcached.expiry import EXPIRES_HEADER
+from riakcached.pools import Urllib3Pool
+
+
+MAX_LINE_LENGTH = 2048
+MAX_KEY_LENGTH = 250
+MAX_COUNTER_RETRIES = 10
+VALUE_CONTENT_TYPE = "application/octet-stream"
+
+
+class ProtocolError(Exception):
+    """Raised for malformed commands, reported to the client as `CLIENT_ERROR`
+    """
+    pass
+
+
+class Trigger(asyncore.file_dispatcher):
+    """Wakes up the event loop from worker threads to write finished responses
+    """
+    def __init__(self, server, map=None):
+        self.server = server
+        self.reader, self.writer = os.pipe()
+        asyncore.file_dispatcher.__init__(self, self.reader, map=map)
+        os.close(self.reader)
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        try:
+            self.recv(8192)
+        except socket.error:
+            pass
+        self.server.deliver()
+
+    def pull(self):
+        os.write(self.writer, "x")
+
+    def handle_close(self):
+        self.close()
+        os.close(self.writer)
+
+
+class MultiGet(object):
+    """The keys of a multi-key get, fetched by every worker thread which picks it up
+
+    The worker running the command fetches keys too, and only waits for the keys other
+    workers are already fetching, so it never waits for a worker which is busy elsewhere.
+    """
+    __slots__ = ["_condition", "_fetching", "errors", "fetch", "pending", "results"]
+
+    def __init__(self, fetch, keys):
+        self.fetch = fetch
+        self.pending = collections.deque(enumerate(keys))
+        self.results = [None] * len(keys)
+        self.errors = []
+        self._fetching = 0
+        self._condition = threading.Condition(threading.Lock())
+
+    def run(self):
+        """Fetch keys until there are none left
+        """
+        while True:
+            with self._condition:
+                if not self.pending or self.errors:
+                    return
+                index, key = self.pending.popleft()
+                self._fetching += 1
+            try:
+                self.results[index] = self.fetch(key)
+            except Exception, e:
+                self.errors.append(e)
+            finally:
+                with self._condition:
+                    self._fetching -= 1
+                    self._condition.notify_all()
+
+    def wait(self):
+        """Fetch keys until there are none left and wait for the keys being fetched
+
+        :returns: list - the results for each key, in order
+        :raises: the first exception raised by fetching a key
+        """
+        self.run()
+        with self._condition:
+            while self._fetching:
+                self._condition.wait()
+        if self.errors:
+            raise self.errors[0]
+        return self.results
+
+
+class Response(object):
+    """A response slot, filled in by a worker thread and written in command order
+    """
+    __slots__ = ["data", "close"]
+
+    def __init__(self):
+        self.data = None
+        self.close = False
+
+
+class MemcachedConnection(asynchat.async_chat):
+    """A single client connection speaking the memcached text protocol
+    """
+    def __init__(self, server, sock, map=None):
+        asynchat.async_chat.__init__(self, sock, map=map)
+        self.server = server
+        self.buffer = []
+        self.buffered = 0
+        self.pending_set = None
+        self.responses = collections.deque()
+        self.queued = collections.deque()
+        self.busy = False
+        self.set_terminator("\r\n")
+
+    def collect_incoming_data(self, data):
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.pending_set is None and self.buffered > MAX_LINE_LENGTH:
+            self.buffer = []
+            self.buffered = 0
+            self.respond_now("CLIENT_ERROR line too long\r\n", close=True)
+
+    def found_terminator(self):
+        data = "".join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+
+        if self.pending_set is not None:
+            command, args = self.pending_set
+            self.pending_set = None
+            self.set_terminator("\r\n")
+            if not data.endswith("\r\n"):
+                self.respond_now("CLIENT_ERROR bad data chunk\r\n")
+                return
+            self.dispatch(command, args + [data[:-2]])
+            return
+
+        parts = data.split()
+        if not parts:
+            self.respond_now("ERROR\r\n")
+            return
+        command, args = parts[0].lower(), parts[1:]
+        try:
+            if command in ("set", "add"):
+                if len(args) not in (4, 5):
+                    raise ProtocolError("bad command line format")
+                self.check_key(args[0])
+                length = int(args[3])
+                if length < 0:
+                    raise ProtocolError("bad data chunk")
+                self.pending_set = (command, args)
+                self.set_terminator(length + 2)
+            elif command == "quit":
+                self.respond_now("", close=True)
+            elif command in self.server.commands:
+                for key in args[:1] if command in ("delete", "incr", "decr") else args:
+                    self.check_key(key)
+                self.dispatch(command, args)
+            else:
+                self.respond_now("ERROR\r\n")
+        except (ProtocolError, ValueError), e:
+            message = str(e) if isinstance(e, ProtocolError) else "bad command line format"
+            self.respond_now("CLIENT_ERROR %s\r\n" % message)
+
+    def check_key(self, key):
+        if len(key) > MAX_KEY_LENGTH:
+            raise ProtocolError("key too long")
+
+    def dispatch(self, command, args):
+        response = Response()
+        self.responses.append(response)
+        self.queued.append((response, command, args))
+        self.run_next()
+
+    def run_next(self):
+        if not self.busy and self.queued:
+            self.busy = True
+            response, command, args = self.queued.popleft()
+            self.server.submit(self, response, command, args)
+
+    def respond_now(self, data, close=False):
+        response = Response()
+        response.data = data
+        response.close = close
+        self.responses.append(response)
+        self.flush_responses()
+
+    def flush_responses(self):
+        while self.responses and self.responses[0].data is not None:
+            response = self.responses.popleft()
+            if response.data:
+                self.push(response.data)
+            if response.close:
+                self.close_when_done()
+                self.responses.clear()
+                return
+
+    def handle_close(self):
+        self.server.connection_closed()
+        self.close()
+
+
+class MemcachedServer(asyncore.dispatcher):
+    """A memcached text protocol server translating commands onto a RiakClient
+
+    :param client: the client to serve commands with, shared by every connection
+    :type client: :class:`riakcached.clients.RiakClient`
+    :param host: the address to listen on
+    :type host: str
+    :param port: the port to listen on
+    :type port: int
+    :param workers: the number of threads making Riak requests
+    :type workers: int
+    :param get_concurrency: the number of worker threads fetching the keys of a multi-key
+        `get` at once
+    :type get_concurrency: int
+    """
+    commands = frozenset(["get", "gets", "set", "add", "delete", "incr", "decr", "stats",
+                          "version"])
+
+    def __init__(self, client, host="127.0.0.1", port=11211, workers=16, get_concurrency=16,
+                 map=None):
+        asyncore.dispatcher.__init__(self, map=map)
+        self.client = client
+        self.get_concurrency = get_concurrency
+        self.map = map
+        self.jobs = Queue.Queue()
+        self.done = Queue.Queue()
+        self.trigger = Trigger(self, map=map)
+        self.started = time.time()
+        self.stats = collections.defaultdict(int)
+        self.stats_lock = threading.Lock()
+
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((host, port))
+        self.address = self.socket.getsockname()
+        self.listen(1024)
+
+        for _ in xrange(workers):
+            worker = threading.Thread(target=self.work)
+            worker.daemon = True
+            worker.start()
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is None:
+            return
+        sock, _ = pair
+        self.incr_stat("total_connections")
+        self.incr_stat("curr_connections")
+        MemcachedConnection(self, sock, map=self.map)
+
+    def connection_closed(self):
+        self.incr_stat("curr_connections", -1)
+
+    def incr_stat(self, name, value=1):
+        with self.stats_lock:
+            self.stats[name] += value
+
+    def submit(self, connection, response, command, args):
+        self.jobs.put((connection, response, command, args))
+
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            if isinstance(job, MultiGet):
+                job.run()
+                continue
+            connection, response, command, args = job
+            try:
+                data = getattr(self, "command_%s" % command)(*args)
+            except (TypeError, ValueError):
+                data = "CLIENT_ERROR bad command line format\r\n"
+            except ProtocolError, e:
+                data = "CLIENT_ERROR %s\r\n" % e
+            except Exception, e:
+                data = "SERVER_ERROR %s\r\n" % (str(e).splitlines() or [e.__class__.__name__])[0]
+            self.done.put((connection, response, data))
+            self.trigger.pull()
+
+    def deliver(self):
+        """Write every finished response, called from the event loop
+        """
+        connections = {}
+        while True:
+            try:
+                connection, response, data = self.done.get_nowait()
+            except Queue.Empty:
+                break
+            response.data = data
+            connection.busy = False
+            connections[id(connection)] = connection
+        for connection in connections.itervalues():
+            if connection.connected:
+                connection.flush_responses()
+                connection.run_next()
+
+    def serve_forever(self, timeout=30.0):
+        """Run the event loop
+        """
+        asyncore.loop(timeout=timeout, use_poll=True, map=self.map)
+
+    def _retrieve(self, keys, with_cas):
+        self.incr_stat("cmd_get", len(keys))
+        unique_keys = list(collections.OrderedDict.fromkeys(keys))
+        if len(unique_keys) == 1:
+            values = [self.client.get_raw(unique_keys[0])]
+        else:
+            multiget = MultiGet(self.client.get_raw, unique_keys)
+            for _ in xrange(min(self.get_concurrency, len(unique_keys)) - 1):
+                self.jobs.put(multiget)
+            values = multiget.wait()
+        found = dict(zip(unique_keys, values))
+
+        output = []
+        for key in keys:
+            result = found[key]
+            if result is None:
+                self.incr_stat("get_misses")
+                continue
+            self.incr_stat("get_hits")
+            data, headers = result
+            flags = headers.get("x-riak-meta-flags", "0")
+            if with_cas:
+                cas = zlib.crc32(headers.get("etag", "")) & 0xffffffff
+                output.append("VALUE %s %s %d %d\r\n" % (key, flags, len(data), cas))
+            else:
+                output.append("VALUE %s %s %d\r\n" % (key, flags, len(data)))
+            output.append(data)
+            output.append("\r\n")
+        output.append("END\r\n")
+        return "".join(output)
+
+    def command_get(self, *keys):
+        if not keys:
+            raise ProtocolError("bad command line format")
+        return self._retrieve(keys, with_cas=False)
+
+    def command_gets(self, *keys):
+        if not keys:
+            raise ProtocolError("bad command line format")
+        return self._retrieve(keys, with_cas=True)
+
+    def _store(self, store, key, flags, exptime, length, *args):
+        noreply = args[:-1] == ("noreply", )
+        data = args[-1]
+        self.incr_stat("cmd_set")
+        stored = store(
+            key, data, content_type=VALUE_CONTENT_TYPE, time=int(exptime),
+            meta={"Flags": int(flags)},
+        )
+        if noreply:
+            return ""
+        return "STORED\r\n" if stored else "NOT_STORED\r\n"
+
+    def command_set(self, *args):
+        return self._store(self.client.set, *args)
+
+    def command_add(self, *args):
+        return self._store(self.client.add, *args)
+
+    def command_delete(self, key, *args):
+        deleted = self.client.delete(key)
+        if "noreply" in args:
+            return ""
+        return "DELETED\r\n" if deleted else "NOT_FOUND\r\n"
+
+    def _counter(self, key, delta, sign, noreply):
+        if not delta.isdigit():
+            raise ProtocolError("invalid numeric delta argument")
+        for _ in xrange(MAX_COUNTER_RETRIES):
+            result = self.client.get_raw(key)
+            if result is None:
+                value = None
+                break
+            data, headers = result
+            if not data.isdigit() or len(data) > 20:
+                raise ProtocolError("cannot increment or decrement non-numeric value")
+            value = int(data) + sign * int(delta)
+            value = max(value, 0) if sign < 0 else value % 2 ** 64
+            meta = dict(
+                (name[len("x-riak-meta-"):], meta_value)
+                for name, meta_value in headers.iteritems()
+                if name.startswith("x-riak-meta-") and name != EXPIRES_HEADER.lower()
+            )
+            try:
+                self.client.set_raw(
+                    key, str(value), content_type=headers.get("content-type", VALUE_CONTENT_TYPE),
+                    time=int(headers.get(EXPIRES_HEADER.lower(), 0)), meta=meta,
+                    etag=headers.get("etag"),
+                )
+                break
+            except RiakcachedPreconditionFailed:
+                continue
+        else:
+            return "SERVER_ERROR too many concurrent updates\r\n"
+        if noreply:
+            return ""
+        if value is None:
+            return "NOT_FOUND\r\n"
+        return "%d\r\n" % value
+
+    def command_incr(self, key, delta, noreply=None):
+        return self._counter(key, delta, 1, noreply)
+
+    def command_decr(self, key, delta, noreply=None):
+        return self._counter(key, delta, -1, noreply)
+
+    def command_stats(self, *args):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats.update({
+            "pid": os.getpid(),
+            "uptime": int(time.time() - self.started),
+            "time": int(time.time()),
+            "version": riakcached.__version__,
+            "threads": threading.active_count(),
+        })
+        lines = ["STAT %s %s\r\n" % (name, stats[name]) for name in sorted(stats)]
+        return "".join(lines) + "END\r\n"
+
+    def command_version(self):
+        return "VERSION %s\r\n" % riakcached.__version__
+
+
+def main(argv=None):
+    """Entry point of the `riakcached-server` command
+    """
+    parser = argparse.ArgumentParser(description="memcached protocol proxy for Riak")
+    parser.add_argument("--host", default="127.0.0.1", help="the address to listen on")
+    parser.add_argument("--port", type=int, default=11211, help="the port to listen on")
+    parser.add_argument("--riak-url", default="http://127.0.0.1:8098", help="the Riak HTTP url")
+    parser.add_argument("--bucket", default="riakcached", help="the Riak bucket to use")
+    parser.add_argument("--timeout", type=float, default=2, help="the Riak request timeout")
+    parser.add_argument("--workers", type=int, default=16, help="threads making Riak requests")
+    parser.add_argument("--get-concurrency", type=int, default=16,
+                        help="workers fetching the keys of a multi-key get at once")
+    parser.add_argument("--negative-cache-ttl", type=float, default=None,
+                        help="seconds to remember missing keys for")
+    args = parser.parse_args(argv)
+
+    # multi-key gets are fetched on the workers, so each has at most one request in flight
+    pool = Urllib3Pool(base_url=args.riak_url, timeout=args.timeout, maxsize=args.workers)
+    client = RiakClient(args.bucket, pool=pool, negative_cache_ttl=args.negative_cache_ttl)
+    server = MemcachedServer(
+        client, host=args.host, port=args.port, workers=args.workers,
+        get_concurrency=args.get_concurrency,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
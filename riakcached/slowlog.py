@@ -0,0 +1,201 @@
+import json
+import random
+
+from riakcached.tracing import RecordedSpan
+from riakcached.tracing import RecordingTracer
+from riakcached.tracing import span_tags
+
+
+class OperationSpan(RecordedSpan):
+    """A span recorded by a :class:`riakcached.slowlog.SlowLog`
+
+    Root spans collect every span finished under them, so that a whole operation can be
+    summarized by :func:`to_record` once it finishes.
+    """
+    __slots__ = ["children", "key", "slow"]
+
+    def __init__(self, tracer, name, parent, tags, key=None):
+        """Constructs a new :class:`riakcached.slowlog.OperationSpan`
+
+        :param tracer: the slow log recording the span
+        :type tracer: :class:`riakcached.slowlog.SlowLog`
+        :param name: the name of the span
+        :type name: str
+        :param parent: the parent span, None for the root span of an operation
+        :type parent: :class:`riakcached.slowlog.OperationSpan`
+        :param tags: the tags of the span
+        :type tags: dict
+        :param key: the key of the operation, if any
+        :type key: str
+        """
+        super(OperationSpan, self).__init__(tracer, name, parent, tags)
+        self.key = key
+        self.children = []
+        self.slow = False
+
+    def root(self):
+        """Get the root span of the operation this span belongs to
+
+        :returns: :class:`riakcached.slowlog.OperationSpan`
+        """
+        span = self
+        while span.parent is not None:
+            span = span.parent
+        return span
+
+    def to_record(self):
+        """Summarize the operation of this (root) span
+
+        The record looks like::
+
+            {
+                "time": 1382400000.0,
+                "operation": "riakcached.get",
+                "bucket": "users",
+                "key": "user:1",
+                "keys": None,
+                "duration": 0.25,
+                "slow": True,
+                "error": None,
+                "requests": 1,
+                "statuses": [300],
+                "nodes": ["http://riak1:8098"],
+                "request_size": 0,
+                "response_size": 5242880,
+                "timings": {"requests": 0.24, "pool_wait": 0.0, "client": 0.01},
+            }
+
+        `keys` is the number of keys of `*_many` operations. `timings` splits the duration
+        into the time spent in requests (summed, so concurrent requests can add up to more
+        than the duration), waiting for a connection (included in `requests`) and in the
+        client itself, e.g. (de)serializing values.
+
+        :returns: dict - the record
+        """
+        requests = [
+            span for span in [self] + self.children if span.name == "riakcached.request"
+        ]
+        request_time = sum(span.duration for span in requests)
+        key = self.key
+        if isinstance(key, str):
+            key = key.decode("utf-8", "replace")
+        error = None
+        if self.error is not None:
+            error = str(self.error) or self.error.__class__.__name__
+        return {
+            "time": self.start,
+            "operation": self.name,
+            "bucket": self.tags.get("riak.bucket"),
+            "key": key,
+            "keys": self.tags.get("riak.keys"),
+            "duration": self.duration,
+            "slow": self.slow,
+            "error": error,
+            "requests": len(requests),
+            "statuses": [span.tags.get("http.status_code") for span in requests],
+            "nodes": sorted(set(span.tags["riak.node"] for span in requests
+                                if "riak.node" in span.tags)),
+            "request_size": sum(span.tags.get("riak.request_size", 0) for span in requests),
+            "response_size": sum(span.tags.get("riak.response_size", 0) for span in requests),
+            "timings": {
+                "requests": request_time,
+                "pool_wait": sum(span.tags.get("riak.pool_wait", 0) for span in requests),
+                "client": max(0, self.duration - request_time),
+            },
+        }
+
+
+class SlowLog(RecordingTracer):
+    """A tracer keeping the operations slower than `threshold` and a sample of the others
+
+    Pass it as the `tracer` of a client and its pool. Every operation taking at least
+    `threshold` seconds, and a random `sample_rate` of the other operations for comparison,
+    is kept in a ring buffer of the last `maxsize` operations and, when a `logger` is given,
+    logged as JSON. Records (see :func:`riakcached.slowlog.OperationSpan.to_record`) include
+    the key, the statuses and payload sizes of the requests and where the time went, to find
+    pathological keys such as huge values or objects with many siblings (status 300).
+
+    Example::
+
+        slow_log = SlowLog(threshold=0.1, sample_rate=0.001, logger=logging.getLogger("riak"))
+        client = RiakClient("bucket", pool=Urllib3Pool(tracer=slow_log), tracer=slow_log)
+        ...
+        slow_log.dump(open("slow.ndjson", "w"))
+    """
+    __slots__ = ["logger", "sample_rate", "threshold"]
+
+    def __init__(self, threshold=0.1, sample_rate=0.001, maxsize=1000, logger=None, local=None):
+        """Constructs a new :class:`riakcached.slowlog.SlowLog`
+
+        :param threshold: the duration in seconds from which operations are kept
+        :type threshold: float
+        :param sample_rate: the fraction of the faster operations to keep
+        :type sample_rate: float
+        :param maxsize: the maximum number of operations to keep
+        :type maxsize: int
+        :param logger: the logger to log every kept operation to, slow ones as warnings and
+            sampled ones as info
+        :type logger: `logging.Logger`
+        :param local: where to keep the current span, see
+            :class:`riakcached.tracing.RecordingTracer`
+        :type local: object
+        """
+        super(SlowLog, self).__init__(maxsize=maxsize, local=local)
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.logger = logger
+
+    def span(self, name, bucket=None, key=None):
+        """Start a span, see :func:`riakcached.tracing.span_tags` for `bucket` and `key`
+
+        :param name: the name of the span
+        :type name: str
+        :param bucket: the bucket of the operation, if any
+        :type bucket: str
+        :param key: the key (or keys) of the operation, if any
+        :type key: object
+        :returns: :class:`riakcached.slowlog.OperationSpan` - the span, to use as a context
+            manager
+        """
+        tags = span_tags(bucket, key, {})
+        if not isinstance(key, basestring):
+            key = None
+        return OperationSpan(self, name, self.active(), tags, key)
+
+    def record(self, span):
+        """Keep a finished operation if it was slow or is sampled
+
+        :param span: the finished span
+        :type span: :class:`riakcached.slowlog.OperationSpan`
+        """
+        if span.parent is not None:
+            span.root().children.append(span)
+            return
+
+        span.slow = span.duration >= self.threshold
+        if not span.slow and random.random() >= self.sample_rate:
+            span.children = []
+            return
+        self.finished.append(span)
+        if self.logger is not None:
+            log = self.logger.warning if span.slow else self.logger.info
+            log("riak operation %s", json.dumps(span.to_record()))
+
+    def records(self):
+        """Get the records of the kept operations, oldest first
+
+        :returns: list - of dict, see :func:`riakcached.slowlog.OperationSpan.to_record`
+        """
+        return [span.to_record() for span in self.spans()]
+
+    def dump(self, output):
+        """Write the records of the kept operations as newline-delimited JSON
+
+        :param output: the file-like object to write to
+        :type output: file
+        :returns: int - the number of records written
+        """
+        records = self.records()
+        for record in records:
+            output.write(json.dumps(record) + "\n")
+        return len(records)
@@ -0,0 +1,195 @@
+import json
+import threading
+import time
+
+from riakcached.clients import parallel_map
+
+
+def is_counter(name):
+    """Check whether a Riak stat is a counter which only ever increases
+
+    :param name: the name of the stat
+    :type name: str
+    :returns: bool - True for counters, e.g. `node_gets_total`
+    """
+    return name.endswith("_total")
+
+
+def _is_number(value):
+    return isinstance(value, (int, long, float)) and not isinstance(value, bool)
+
+
+class StatsCollector(object):
+    """Polls `/stats` of every Riak node in the background and keeps the latest snapshot
+
+    Every `interval` seconds every node is polled in parallel. The snapshot returned by
+    :func:`snapshot` is read from memory, so monitoring can read it as often as it likes
+    without adding load to the cluster. It looks like::
+
+        {
+            "time": 1382400000.0,
+            "nodes": {
+                "http://riak1:8098": {
+                    "time": 1382400000.0,
+                    "error": None,
+                    "stats": {"node_gets_total": 1200, ...},
+                    "deltas": {"node_gets_total": 100, ...},
+                    "rates": {"node_gets_total": 10.0, ...},
+                },
+                ...
+            },
+            "cluster": {
+                "nodes": 3,
+                "available": 3,
+                "totals": {"node_gets_total": 3600, ...},
+                "rates": {"node_gets_total": 30.0, ...},
+                "max": {"node_get_fsm_time_99": 4150, ...},
+            },
+            "pools": {"http://riak1:8098": {"connections": 4, ...}, ...},
+        }
+
+    `deltas` and `rates` (per second) are computed for counters (see `is_counter`) from the
+    previous successful poll of the same node, the counters reset by a node restart are
+    skipped. The cluster view sums the counters and rates of the available nodes and keeps
+    the maximum of every other numeric stat, e.g. the worst latency percentile. `pools` are
+    the client side metrics of the pools, see :func:`riakcached.pools.Pool.metrics`.
+
+    Example::
+
+        collector = StatsCollector(policy_pool.pools, interval=10).start()
+        print collector.snapshot()["cluster"]["rates"]["node_gets_total"]
+    """
+    __slots__ = ["_lock", "_previous", "_snapshot", "_stop", "_thread", "counter", "interval",
+                 "pools"]
+
+    def __init__(self, pools, interval=10, counter=is_counter):
+        """Constructs a new :class:`riakcached.stats.StatsCollector`
+
+        :param pools: the pool of every node to poll
+        :type pools: list
+        :param interval: the number of seconds between polls
+        :type interval: float
+        :param counter: the function telling whether a stat name is a counter
+        :type counter: function
+        """
+        self.pools = list(pools)
+        self.interval = interval
+        self.counter = counter
+        self._lock = threading.Lock()
+        self._previous = {}
+        self._snapshot = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Poll every node now and then every `interval` seconds from a daemon thread
+
+        :returns: :class:`riakcached.stats.StatsCollector` - the collector itself
+        """
+        self.poll()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop polling
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                pass
+
+    def snapshot(self):
+        """Get the latest snapshot, polling once if there is none yet
+
+        :returns: dict - the snapshot
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.poll()
+        return snapshot
+
+    def poll(self):
+        """Poll every node now and replace the snapshot
+
+        :returns: dict - the new snapshot
+        """
+        nodes = dict(zip(
+            [pool.url for pool in self.pools],
+            parallel_map(self._poll_node, self.pools, len(self.pools)),
+        ))
+        snapshot = {
+            "time": time.time(),
+            "nodes": nodes,
+            "cluster": self._merge(nodes.values()),
+            "pools": dict((pool.url, pool.metrics()) for pool in self.pools),
+        }
+        self._snapshot = snapshot
+        return snapshot
+
+    def _poll_node(self, pool):
+        now = time.time()
+        node = {"time": now, "error": None, "stats": None, "deltas": {}, "rates": {}}
+        try:
+            status, data, _ = pool.request(method="GET", url=pool.url.rstrip("/") + "/stats")
+            if status != 200:
+                raise ValueError("unexpected status %d" % status)
+            stats = json.loads(data)
+        except Exception, e:
+            node["error"] = str(e) or e.__class__.__name__
+            return node
+
+        node["stats"] = stats
+        with self._lock:
+            previous = self._previous.get(pool.url)
+            self._previous[pool.url] = (now, stats)
+        if previous is not None:
+            elapsed = now - previous[0]
+            for name, value in stats.iteritems():
+                last = previous[1].get(name)
+                if not (self.counter(name) and _is_number(value) and _is_number(last)):
+                    continue
+                if value < last:
+                    continue
+                node["deltas"][name] = value - last
+                if elapsed > 0:
+                    node["rates"][name] = (value - last) / elapsed
+        return node
+
+    def _merge(self, nodes):
+        available = [node for node in nodes if node["stats"] is not None]
+        totals = {}
+        rates = {}
+        maximums = {}
+        for node in available:
+            for name, value in node["stats"].iteritems():
+                if not _is_number(value):
+                    continue
+                if self.counter(name):
+                    totals[name] = totals.get(name, 0) + value
+                elif name not in maximums or value > maximums[name]:
+                    maximums[name] = value
+            for name, rate in node["rates"].iteritems():
+                rates[name] = rates.get(name, 0) + rate
+        return {
+            "nodes": len(nodes),
+            "available": len(available),
+            "totals": totals,
+            "rates": rates,
+            "max": maximums,
+        }
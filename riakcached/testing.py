@@ -0,0 +1,296 @@
+import BaseHTTPServer
+import hashlib
+import json
+import re
+import SocketServer
+import threading
+import time
+import urllib
+import urlparse
+
+
+KEY_TRANSFORMS = {
+    "to_lower": lambda value: value.lower(),
+    "to_upper": lambda value: value.upper(),
+    "tokenize": lambda value, separator, index: (value.split(separator) + [""] * index)[index - 1],
+    "urldecode": lambda value: urllib.unquote(value),
+}
+KEY_PREDICATES = {
+    "eq": lambda value, other: value == other,
+    "neq": lambda value, other: value != other,
+    "starts_with": lambda value, prefix: value.startswith(prefix),
+    "ends_with": lambda value, suffix: value.endswith(suffix),
+    "matches": lambda value, pattern: re.search(pattern, value) is not None,
+    "set_member": lambda value, *members: value in members,
+}
+
+
+def match_key_filters(key, key_filters):
+    """Check a key against a list of Riak key filters
+
+    Supports the string transforms (`to_lower`, `to_upper`, `tokenize`, `urldecode`), the
+    string predicates (`eq`, `neq`, `starts_with`, `ends_with`, `matches`, `set_member`) and
+    the `and`, `or` and `not` combinations.
+
+    :param key: the key to check
+    :type key: unicode
+    :param key_filters: the key filters, e.g. ``[["tokenize", "-", 1], ["eq", "user"]]``
+    :type key_filters: list
+    :returns: bool - whether the key matches every filter
+    :raises: ValueError - when a filter is not supported
+    """
+    value = key
+    for key_filter in key_filters:
+        name, args = key_filter[0], key_filter[1:]
+        if name in KEY_TRANSFORMS:
+            value = KEY_TRANSFORMS[name](value, *args)
+        elif name in KEY_PREDICATES:
+            if not KEY_PREDICATES[name](value, *args):
+                return False
+        elif name == "and":
+            if not all(match_key_filters(value, filters) for filters in args):
+                return False
+        elif name == "or":
+            if not any(match_key_filters(value, filters) for filters in args):
+                return False
+        elif name == "not":
+            if match_key_filters(value, args[0]):
+                return False
+        else:
+            raise ValueError("unsupported key filter %r" % (name, ))
+    return True
+
+
+class FakeRiakStore(object):
+    """The in-memory buckets of a :class:`riakcached.testing.FakeRiakServer`
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.counters = {}
+        self.props = {}
+        self.requests = 0
+
+
+class FakeRiakHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Request handler implementing the parts of the Riak HTTP interface used by riakcached
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def read_body(self):
+        if self.headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                length = int(self.rfile.readline().split(";")[0].strip(), 16)
+                if not length:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(length))
+                self.rfile.readline()
+            return "".join(chunks)
+        return self.rfile.read(int(self.headers.get("content-length") or 0))
+
+    def respond(self, status, body="", headers=None, send_body=True):
+        self.send_response(status)
+        for name, value in (headers or {}).iteritems():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body and body:
+            self.wfile.write(body)
+
+    def respond_chunked(self, chunks, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            if chunk:
+                self.wfile.write("%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write("0\r\n\r\n")
+
+    def route(self):
+        url = urlparse.urlsplit(self.path)
+        parts = [urllib.unquote(part) for part in url.path.split("/") if part]
+        query = urlparse.parse_qs(url.query)
+        with self.store.lock:
+            self.store.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        return parts, query
+
+    def do_GET(self, send_body=True):
+        parts, query = self.route()
+        if parts == ["ping"]:
+            return self.respond(200, "OK", send_body=send_body)
+        elif parts == ["stats"]:
+            with self.store.lock:
+                stats = {
+                    "node_gets_total": self.store.requests,
+                    "nodename": "fake@127.0.0.1",
+                }
+            return self.respond(200, json.dumps(stats), {"Content-Type": "application/json"})
+        elif len(parts) == 3 and parts[0] == "buckets" and parts[2] == "props":
+            with self.store.lock:
+                props = {"n_val": 3, "allow_mult": False}
+                props.update(self.store.props.get(parts[1], {}))
+            body = json.dumps({"props": props})
+            return self.respond(200, body, {"Content-Type": "application/json"})
+        elif len(parts) == 3 and parts[0] == "buckets" and parts[2] == "keys":
+            with self.store.lock:
+                keys = [key for bucket, key in self.store.objects if bucket == parts[1]]
+            if query.get("keys") == ["stream"]:
+                chunks = [json.dumps({"keys": keys[i:i + 100]}) for i in xrange(0, len(keys), 100)]
+                return self.respond_chunked(chunks, "application/json")
+            body = json.dumps({"keys": keys})
+            return self.respond(200, body, {"Content-Type": "application/json"})
+        elif len(parts) == 4 and parts[0] == "buckets" and parts[2] == "counters":
+            with self.store.lock:
+                value = self.store.counters.get((parts[1], parts[3]))
+            if value is None:
+                return self.respond(404, "not found\n", send_body=send_body)
+            return self.respond(200, str(value), {"Content-Type": "text/plain"}, send_body)
+        elif len(parts) == 4 and parts[0] == "buckets" and parts[2] == "keys":
+            with self.store.lock:
+                found = self.store.objects.get((parts[1], parts[3]))
+            if found is None:
+                return self.respond(404, "not found\n", send_body=send_body)
+            data, headers = found
+            return self.respond(200, data, headers, send_body=send_body)
+        self.respond(404, "not found\n", send_body=send_body)
+
+    def do_HEAD(self):
+        self.do_GET(send_body=False)
+
+    def map_reduce(self, body, chunked):
+        try:
+            job = json.loads(body)
+            bucket = job["inputs"]["bucket"]
+            key_filters = job["inputs"].get("key_filters", [])
+            with self.store.lock:
+                keys = [
+                    key.decode("utf-8") for stored, key in self.store.objects if stored == bucket
+                ]
+            data = [[bucket, key] for key in keys if match_key_filters(key, key_filters)]
+        except (KeyError, TypeError, ValueError), e:
+            return self.respond(400, "bad map/reduce job: %s\n" % (e, ))
+        if not chunked:
+            return self.respond(200, json.dumps(data), {"Content-Type": "application/json"})
+
+        boundary = "fakeriakboundary"
+        parts = [
+            "\r\n--%s\r\nContent-Type: application/json\r\n\r\n%s" % (
+                boundary, json.dumps({"phase": 0, "data": data[i:i + 100]}),
+            )
+            for i in xrange(0, len(data), 100)
+        ]
+        parts.append("\r\n--%s--\r\n" % boundary)
+        self.respond_chunked(parts, "multipart/mixed; boundary=%s" % boundary)
+
+    def do_POST(self):
+        parts, query = self.route()
+        body = self.read_body()
+        if parts == ["mapred"]:
+            return self.map_reduce(body, query.get("chunked") == ["true"])
+        elif len(parts) == 4 and parts[0] == "buckets" and parts[2] == "counters":
+            with self.store.lock:
+                key = (parts[1], parts[3])
+                self.store.counters[key] = self.store.counters.get(key, 0) + int(body)
+            return self.respond(204)
+        elif len(parts) == 4 and parts[0] == "buckets" and parts[2] == "keys":
+            headers = {
+                "Content-Type": self.headers.get("content-type", "application/octet-stream"),
+                "ETag": hashlib.md5(body + repr(time.time())).hexdigest(),
+            }
+            for name, value in self.headers.items():
+                if name.lower().startswith("x-riak-meta-"):
+                    headers[name] = value
+            with self.store.lock:
+                key = (parts[1], parts[3])
+                if self.headers.get("if-none-match") == "*" and key in self.store.objects:
+                    return self.respond(412, "precondition failed\n")
+                if_match = self.headers.get("if-match")
+                if if_match is not None and (
+                    key not in self.store.objects
+                    or self.store.objects[key][1]["ETag"] != if_match.strip('"')
+                ):
+                    return self.respond(412, "precondition failed\n")
+                self.store.objects[key] = (body, headers)
+            return self.respond(204)
+        self.respond(404, "not found\n")
+
+    def do_PUT(self):
+        parts, _ = self.route()
+        if len(parts) == 3 and parts[0] == "buckets" and parts[2] == "props":
+            props = json.loads(self.read_body()).get("props", {})
+            with self.store.lock:
+                self.store.props.setdefault(parts[1], {}).update(props)
+            return self.respond(204)
+        self.do_POST()
+
+    def do_DELETE(self):
+        parts, _ = self.route()
+        if len(parts) == 4 and parts[0] == "buckets" and parts[2] == "keys":
+            with self.store.lock:
+                found = self.store.objects.pop((parts[1], parts[3]), None)
+            return self.respond(204 if found else 404)
+        self.respond(404, "not found\n")
+
+
+class FakeRiakServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """A local, in-memory stand-in for a Riak node's HTTP interface
+
+    Supports storing, fetching and deleting keys (including conditional stores, user metadata
+    and chunked request bodies), listing and streaming keys, MapReduce jobs listing the keys
+    of a bucket matching key filters (see :func:`riakcached.testing.match_key_filters`),
+    counters, bucket properties, `/ping` and `/stats`. Every request can be delayed by `latency`
+    seconds.
+
+    Example::
+
+        with FakeRiakServer() as server:
+            client = RiakClient("bucket", pool=Urllib3Pool(base_url=server.url))
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0):
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), FakeRiakHandler)
+        self.store = FakeRiakStore()
+        self.latency = latency
+        self.thread = None
+
+    @property
+    def url(self):
+        """The base url of the server
+        """
+        return "http://%s:%d" % self.server_address
+
+    def start(self):
+        """Serve requests from a daemon thread
+        """
+        self.thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving requests and close the listening socket
+        """
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
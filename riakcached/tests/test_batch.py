@@ -0,0 +1,73 @@
+import time
+
+import unittest2
+
+from riakcached.batch import Deferred
+from riakcached.clients import RiakClient
+from riakcached.pools import Urllib3Pool
+from riakcached.testing import FakeRiakServer
+
+
+class TestDeferred(unittest2.TestCase):
+    def test_value_before_run(self):
+        deferred = Deferred("get", "key", (), {})
+        self.assertRaises(RuntimeError, getattr, deferred, "value")
+
+
+class TestBatch(unittest2.TestCase):
+    def setUp(self):
+        self.riak = FakeRiakServer(latency=0.02).start()
+        self.client = RiakClient("bucket", pool=Urllib3Pool(base_url=self.riak.url, maxsize=10))
+
+    def tearDown(self):
+        self.riak.stop()
+
+    def test_mixed_operations(self):
+        self.client.set("existing", "value")
+        with self.client.batch() as batch:
+            existing = batch.get("existing")
+            stored = batch.set("new", {"a": 1}, content_type="application/json")
+            counted = batch.incr("hits", 5)
+            missing = batch.get("missing")
+        self.assertEqual(existing.value, "value")
+        self.assertTrue(stored.value)
+        self.assertTrue(counted.value)
+        self.assertIsNone(missing.value)
+        self.assertEqual(self.client.get("new"), {"a": 1})
+        self.assertEqual(self.client.get("hits", counter=True), "5")
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(batch.errors, [])
+
+    def test_same_key_keeps_order(self):
+        with self.client.batch() as batch:
+            batch.set("key", "first")
+            first = batch.get("key")
+            batch.set("key", "second")
+            second = batch.get("key")
+            batch.delete("key")
+            gone = batch.get("key")
+        self.assertEqual((first.value, second.value, gone.value), ("first", "second", None))
+
+    def test_operations_run_concurrently(self):
+        start = time.time()
+        with self.client.batch(workers=10) as batch:
+            results = [batch.set("key%d" % index, "value") for index in xrange(20)]
+        self.assertTrue(all(result.value for result in results))
+        self.assertLess(time.time() - start, 20 * 0.02)
+
+    def test_exceptions_are_kept_per_operation(self):
+        with self.client.batch() as batch:
+            failed = batch.set("bad", object(), content_type="application/json")
+            stored = batch.set("good", "value")
+        self.assertTrue(stored.value)
+        self.assertIsInstance(failed.error, TypeError)
+        self.assertRaises(TypeError, getattr, failed, "value")
+        self.assertEqual(batch.errors, [failed])
+
+    def test_not_run_when_block_raises(self):
+        with self.assertRaises(KeyError):
+            with self.client.batch() as batch:
+                stored = batch.set("key", "value")
+                raise KeyError("key")
+        self.assertFalse(stored.done)
+        self.assertIsNone(self.client.get("key"))
@@ -0,0 +1,95 @@
+import collections
+import random
+import StringIO
+
+import mock
+import unittest2
+
+from riakcached import bench
+from riakcached.clients import RiakClient
+from riakcached.pools import Urllib3Pool
+from riakcached.testing import FakeRiakServer
+
+
+class TestParseMix(unittest2.TestCase):
+    def test_parse_mix(self):
+        self.assertEqual(
+            bench.parse_mix("get=80, set=15,incr"),
+            [("get", 80.0), ("set", 15.0), ("incr", 1.0)],
+        )
+
+    def test_unknown_operation(self):
+        self.assertRaises(ValueError, bench.parse_mix, "get=1,flush=1")
+
+    def test_zero_weights(self):
+        self.assertRaises(ValueError, bench.parse_mix, "get=0")
+
+
+class TestKeys(unittest2.TestCase):
+    def test_uniform_keys_in_range(self):
+        keys = bench.UniformKeys(10)
+        rng = random.Random(0)
+        self.assertTrue(all(0 <= keys.next(rng) < 10 for _ in xrange(1000)))
+
+    def test_zipfian_keys_are_skewed(self):
+        keys = bench.ZipfianKeys(1000)
+        rng = random.Random(0)
+        counts = collections.Counter(keys.next(rng) for _ in xrange(10000))
+        self.assertTrue(all(0 <= key < 1000 for key in counts))
+        self.assertEqual(counts.most_common(1)[0][0], 0)
+        self.assertGreater(counts[0], counts[1])
+        self.assertGreater(counts[1], counts[10])
+
+    def test_zipfian_theta_out_of_range(self):
+        for theta in (0, 1, 1.5, -0.5):
+            self.assertRaises(ValueError, bench.ZipfianKeys, 10, theta)
+
+    @mock.patch("sys.stderr", new_callable=StringIO.StringIO)
+    def test_main_rejects_theta_out_of_range(self, stderr):
+        with self.assertRaises(SystemExit):
+            bench.main(["--distribution", "zipfian", "--theta", "1"])
+        self.assertIn("theta must be between 0 and 1", stderr.getvalue())
+
+
+class TestWorkload(unittest2.TestCase):
+    def test_operations_follow_mix(self):
+        workload = bench.Workload([("get", 1), ("set_many", 0)], bench.UniformKeys(10))
+        client = mock.Mock()
+        rng = random.Random(0)
+        for _ in xrange(10):
+            operation, run = workload.operation(rng)
+            self.assertEqual(operation, "get")
+            run(client)
+        self.assertEqual(client.get.call_count, 10)
+
+    def test_many_operations_use_batch_size(self):
+        workload = bench.Workload([("set_many", 1)], bench.UniformKeys(1000), min_value_size=5,
+                                  max_value_size=10, batch_size=3)
+        client = mock.Mock()
+        operation, run = workload.operation(random.Random(0))
+        run(client)
+        values = client.set_many.call_args[0][0]
+        self.assertEqual(len(values), 3)
+        self.assertTrue(all(5 <= len(value) <= 10 for value in values.itervalues()))
+
+
+class TestBenchmark(unittest2.TestCase):
+    def test_run_against_fake_server(self):
+        with FakeRiakServer() as riak:
+            client = RiakClient("bench", pool=Urllib3Pool(base_url=riak.url, maxsize=2))
+            workload = bench.Workload(
+                bench.parse_mix("get=2,set=1,incr=1,get_many=1"), bench.UniformKeys(20),
+            )
+            output = StringIO.StringIO()
+            benchmark = bench.Benchmark(client, workload, concurrency=2, duration=0.3,
+                                        interval=0.1, output=output)
+            benchmark.preload(20)
+            latencies = benchmark.run()
+
+        self.assertGreater(len(latencies["get"]), 0)
+        self.assertGreater(len(latencies["get_many"]), 0)
+        self.assertEqual(benchmark.errors, 0)
+        self.assertGreaterEqual(len(output.getvalue().splitlines()), 3)
+        summary = benchmark.summary()
+        self.assertIn("incr: ", summary)
+        self.assertIn("errors: 0", summary)
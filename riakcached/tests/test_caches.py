@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+
+import mock
+import unittest2
+
+from riakcached import caches
+from riakcached.caches import LocalCache
+from riakcached.caches import SharedMemoryCache
+
+
+class TestLocalCache(unittest2.TestCase):
+    def test_get_set_delete(self):
+        cache = LocalCache()
+        self.assertIsNone(cache.get("key"))
+        cache.set("key", "value")
+        self.assertEqual(cache.get("key"), "value")
+        self.assertIn("key", cache)
+        cache.delete("key")
+        self.assertNotIn("key", cache)
+
+    @mock.patch("time.time")
+    def test_entries_expire(self, time):
+        time.return_value = 1000
+        cache = LocalCache(ttl=10)
+        cache.set("key", "value")
+        cache.set("short", "value", ttl=1)
+        time.return_value = 1005
+        self.assertIn("key", cache)
+        self.assertNotIn("short", cache)
+        time.return_value = 1010
+        self.assertNotIn("key", cache)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = LocalCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+
+
+class TestSharedMemoryCache(unittest2.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache")
+        self.cache = SharedMemoryCache(self.path, size=64 * 1024, slot_size=256, ways=4)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory)
+
+    def test_get_set_delete(self):
+        self.assertIsNone(self.cache.get("key"))
+        self.assertTrue(self.cache.set("key", "value"))
+        self.assertEqual(self.cache.get("key"), "value")
+        self.cache.set("key", "other")
+        self.assertEqual(self.cache.get("key"), "other")
+        self.assertEqual(len(self.cache), 1)
+        self.cache.delete("key")
+        self.assertNotIn("key", self.cache)
+
+    def test_values_larger_than_a_slot_are_not_cached(self):
+        self.cache.set("key", "small")
+        self.assertFalse(self.cache.set("key", "x" * 256))
+        self.assertIsNone(self.cache.get("key"))
+
+    @mock.patch("time.time")
+    def test_entries_expire(self, time):
+        time.return_value = 1000
+        self.cache.set("key", "value", ttl=10)
+        time.return_value = 1009
+        self.assertEqual(self.cache.get("key"), "value")
+        time.return_value = 1010
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_least_recently_used_is_evicted_from_a_full_bucket(self):
+        cache = SharedMemoryCache(os.path.join(self.directory, "small"), size=512, slot_size=256,
+                                  ways=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "3")
+        cache.close()
+
+    def test_torn_slots_are_misses(self):
+        self.cache.set("key", "value")
+        for offset in xrange(caches.SHARED_HEADER.size, self.cache.size, self.cache.slot_size):
+            if caches.SHARED_SLOT.unpack_from(self.cache._map, offset)[3]:
+                caches.SHARED_SEQUENCE.pack_into(self.cache._map, offset, 7)
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_shared_between_processes(self):
+        pid = os.fork()
+        if not pid:
+            try:
+                cache = SharedMemoryCache(self.path, size=64 * 1024, slot_size=256, ways=4)
+                cache.set("child", "value")
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(self.cache.get("child"), "value")
+
+    def test_different_settings_raise(self):
+        self.assertRaises(ValueError, SharedMemoryCache, self.path, size=64 * 1024,
+                          slot_size=512, ways=4)
+
+    def test_clear(self):
+        self.cache.set("a", "1")
+        self.cache.set("b", "2")
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
@@ -0,0 +1,159 @@
+import mock
+import unittest2
+
+from riakcached import exceptions
+from riakcached.caches import LocalCache
+from riakcached.decorators import cached
+from riakcached.decorators import make_key
+
+
+class DictClient(object):
+    def __init__(self):
+        self.values = {}
+        self.versions = {}
+        self.negative_cache = None
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def get_raw(self, key):
+        if key not in self.values:
+            return None
+        return str(self.values[key]), {"etag": str(self.versions[key])}
+
+    def set(self, key, value, content_type="text/plain", time=0):
+        self.values[key] = value
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return True
+
+    def set_raw(self, key, value, content_type="application/octet-stream", time=0, meta=None,
+                etag=None):
+        if etag is not None and etag != str(self.versions.get(key)):
+            raise exceptions.RiakcachedPreconditionFailed("")
+        return self.set(key, value)
+
+    def add(self, key, value, content_type="text/plain", time=0):
+        if key in self.values:
+            return False
+        return self.set(key, str(value))
+
+    def delete(self, key):
+        self.values.pop(key, None)
+        return True
+
+
+class TestCached(unittest2.TestCase):
+    def setUp(self):
+        self.client = DictClient()
+        self.calls = []
+
+        @cached(self.client, ttl=60, prefix="test", beta=0)
+        def func(a, b=1):
+            self.calls.append((a, b))
+            return a + b
+
+        self.func = func
+
+    def test_make_key_depends_on_arguments(self):
+        self.assertEqual(make_key("p", (1, ), {"b": 2}), make_key("p", (1, ), {"b": 2}))
+        self.assertNotEqual(make_key("p", (1, ), {"b": 2}), make_key("p", (1, ), {"b": 3}))
+        self.assertTrue(make_key("p", (), {}).startswith("p:"))
+
+    def test_result_is_cached(self):
+        self.assertEqual(self.func(1, b=2), 3)
+        self.assertEqual(self.func(1, b=2), 3)
+        self.assertEqual(self.calls, [(1, 2)])
+        entry = self.client.values[self.func.cache_key(1, b=2)]
+        self.assertEqual(entry["value"], 3)
+        self.assertNotIn(self.func.cache_key(1, b=2) + ":lock", self.client.values)
+
+    def test_expired_value_is_recomputed(self):
+        self.func(1)
+        self.client.values[self.func.cache_key(1)]["expires"] = 0
+        self.func(1)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_expired_value_served_while_locked(self):
+        self.func(1)
+        key = self.func.cache_key(1)
+        self.client.values[key]["expires"] = 0
+        self.client.add(key + ":lock", 2 ** 40)
+        self.assertEqual(self.func(1), 2)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_abandoned_lock_is_taken_over(self):
+        key = self.func.cache_key(1)
+        self.client.add(key + ":lock", 1)
+        self.assertEqual(self.func(1), 2)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_abandoned_lock_is_taken_over_once(self):
+        key = self.func.cache_key(1)
+        self.client.add(key + ":lock", 1)
+        get_raw = self.client.get_raw
+
+        def replaced_by_another_worker(key):
+            result = get_raw(key)
+            self.client.set(key, str(2 ** 40))
+            return result
+
+        def lock_holder_finishes(seconds):
+            self.client.values[key] = {"value": "computed", "expires": 2 ** 40, "delta": 0}
+
+        self.client.get_raw = replaced_by_another_worker
+        with mock.patch("time.sleep") as sleep:
+            sleep.side_effect = lock_holder_finishes
+            self.assertEqual(self.func(1), "computed")
+        self.assertEqual(self.client.values[key + ":lock"], str(2 ** 40))
+        self.assertEqual(self.calls, [])
+
+    @mock.patch("time.sleep")
+    def test_waiting_bypasses_negative_cache(self, sleep):
+        self.client.negative_cache = LocalCache(ttl=60)
+        key = self.func.cache_key(1)
+        self.client.add(key + ":lock", 2 ** 40)
+        self.client.negative_cache.set(key, True)
+        get = self.client.get
+        self.client.get = lambda key: None if key in self.client.negative_cache else get(key)
+
+        def lock_holder_finishes(seconds):
+            self.client.values[key] = {"value": "computed", "expires": 2 ** 40, "delta": 0}
+
+        sleep.side_effect = lock_holder_finishes
+        self.assertEqual(self.func(1), "computed")
+
+    def test_key_func(self):
+        @cached(self.client, ttl=60, prefix="keyed", key_func=lambda user: str(user["id"]))
+        def func(user):
+            self.calls.append(user)
+            return user["id"]
+
+        self.assertEqual(func({"id": 1, "name": "a"}), 1)
+        self.assertEqual(func({"id": 1, "name": "b"}), 1)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(func.cache_key({"id": 1}), "keyed:1")
+
+    @mock.patch("time.sleep")
+    def test_waits_for_lock_holder(self, sleep):
+        key = self.func.cache_key(1)
+        self.client.add(key + ":lock", 2 ** 40)
+
+        def lock_holder_finishes(seconds):
+            self.client.values[key] = {"value": "computed", "expires": 2 ** 40, "delta": 0}
+
+        sleep.side_effect = lock_holder_finishes
+        self.assertEqual(self.func(1), "computed")
+        self.assertEqual(self.calls, [])
+
+    @mock.patch("random.random")
+    def test_early_recomputation(self, random):
+        @cached(self.client, ttl=60, prefix="early", beta=1.0)
+        def func():
+            self.calls.append(())
+            return "value"
+
+        func()
+        self.client.values[func.cache_key()]["delta"] = 120
+        random.return_value = 0.5
+        func()
+        self.assertEqual(len(self.calls), 2)
@@ -0,0 +1,59 @@
+import mock
+import unittest2
+
+from riakcached.expiry import expires_at
+from riakcached.expiry import is_expired
+from riakcached.expiry import Reaper
+
+
+class TestExpiry(unittest2.TestCase):
+    def test_expires_at(self):
+        self.assertIsNone(expires_at(0))
+        self.assertEqual(expires_at(60, now=1000), 1060)
+        self.assertEqual(expires_at(1400000000, now=1000), 1400000000)
+
+    def test_is_expired(self):
+        self.assertFalse(is_expired({}))
+        self.assertFalse(is_expired({"x-riak-meta-expires": "1060"}, now=1000))
+        self.assertTrue(is_expired({"x-riak-meta-expires": "1060"}, now=1060))
+        self.assertFalse(is_expired({"x-riak-meta-expires": "invalid"}, now=1060))
+
+
+class TestReaper(unittest2.TestCase):
+    def test_reap_deletes_still_expired_keys_in_batches(self):
+        client = mock.Mock()
+        client.is_expired.side_effect = lambda key: key != "reset"
+        reaper = Reaper(client, batch_size=2)
+        reaper._pending.update([(client, "a"), (client, "reset")])
+        self.assertEqual(reaper.reap(), ["a"])
+        client.delete_many.assert_called_once_with(["a"])
+        self.assertEqual(reaper.reap(), [])
+
+    def test_keys_are_deleted_by_the_client_which_queued_them(self):
+        client, handle = mock.Mock(), mock.Mock()
+        reaper = Reaper(client)
+        reaper._thread = mock.Mock()
+        reaper.queue("a")
+        reaper.queue("b", handle)
+        self.assertEqual(sorted(reaper.reap()), ["a", "b"])
+        client.delete_many.assert_called_once_with(["a"])
+        handle.delete_many.assert_called_once_with(["b"])
+
+    def test_queue_is_bounded(self):
+        reaper = Reaper(mock.Mock(), max_pending=1)
+        reaper._thread = mock.Mock()
+        reaper.queue("a")
+        reaper.queue("b")
+        self.assertEqual(len(reaper._pending), 1)
+
+    def test_stop_ends_thread(self):
+        client = mock.Mock()
+        client.is_expired.return_value = False
+        reaper = Reaper(client, interval=0.01)
+        reaper.queue("a")
+        thread = reaper._thread
+        reaper.stop()
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+        reaper.queue("b")
+        self.assertEqual(reaper._pending, set())
@@ -0,0 +1,125 @@
+import os
+import time
+
+import mock
+import unittest2
+
+from riakcached import exceptions
+from riakcached import green
+from riakcached.testing import FakeRiakServer
+
+
+@unittest2.skipIf(green.gevent is None, "gevent is not installed")
+class TestGeventPool(unittest2.TestCase):
+    def setUp(self):
+        self.riak = FakeRiakServer().start()
+        self.pool = green.GeventPool(base_url=self.riak.url, maxsize=2)
+
+    def tearDown(self):
+        self.pool.close()
+        self.riak.stop()
+
+    def test_request(self):
+        status, data, headers = self.pool.request(
+            "POST", self.riak.url + "/buckets/b/keys/k", body="value",
+            headers={"Content-Type": "text/plain"},
+        )
+        self.assertEqual(status, 204)
+        status, data, headers = self.pool.request("GET", self.riak.url + "/buckets/b/keys/k")
+        self.assertEqual((status, data), (200, "value"))
+        self.assertEqual(headers["content-type"], "text/plain")
+
+    def test_connections_are_reused(self):
+        for _ in xrange(3):
+            self.assertEqual(self.pool.request("GET", self.riak.url + "/ping")[0], 200)
+        open_connections = [conn for conn in self.pool.connections.queue if conn is not None]
+        self.assertEqual(len(open_connections), 1)
+
+    def test_request_stream(self):
+        status, stream, _ = self.pool.request_stream(
+            "POST", self.riak.url + "/buckets/b/keys/big", body=iter(["ab", "cd"]),
+        )
+        stream.close()
+        self.assertEqual(status, 204)
+        status, stream, _ = self.pool.request_stream("GET", self.riak.url + "/buckets/b/keys/big")
+        with stream:
+            self.assertEqual("".join(stream), "abcd")
+        self.assertEqual(self.pool.connections.qsize(), 2)
+
+    def test_waits_for_free_connection(self):
+        pool = green.GeventPool(base_url=self.riak.url, maxsize=1, pool_timeout=0.05)
+        _, stream, _ = pool.request_stream("GET", self.riak.url + "/ping")
+        self.assertRaises(exceptions.RiakcachedTimeout, pool.request, "GET",
+                          self.riak.url + "/ping")
+        stream.close()
+        self.assertEqual(pool.request("GET", self.riak.url + "/ping")[0], 200)
+
+    def test_connection_error(self):
+        self.riak.stop()
+        pool = green.GeventPool(base_url=self.riak.url)
+        self.assertRaises(exceptions.RiakcachedConnectionError, pool.request, "GET",
+                          self.riak.url + "/ping")
+        self.riak = FakeRiakServer().start()
+
+    @mock.patch("riakcached.pools.os.getpid")
+    def test_reconnects_after_fork(self, getpid):
+        getpid.return_value = os.getpid() + 1
+        connections = self.pool.connections
+        self.pool.request("GET", self.riak.url + "/ping")
+        self.assertIsNot(self.pool.connections, connections)
+
+    def test_reset_with_request_in_flight(self):
+        _, stream, _ = self.pool.request_stream("GET", self.riak.url + "/ping")
+        self.pool.reset()
+        with green.gevent.Timeout(1):
+            stream.close()
+        self.assertEqual(self.pool.request("GET", self.riak.url + "/ping")[:2], (200, "OK"))
+
+    def test_only_http(self):
+        self.assertRaises(ValueError, green.GeventPool, base_url="https://127.0.0.1:8098")
+
+
+@unittest2.skipIf(green.gevent is None, "gevent is not installed")
+class TestGeventRiakClient(unittest2.TestCase):
+    def setUp(self):
+        self.riak = FakeRiakServer(latency=0.05).start()
+        pool = green.GeventPool(base_url=self.riak.url, maxsize=50)
+        self.client = green.GeventRiakClient("bucket", pool=pool, concurrency=50)
+
+    def tearDown(self):
+        self.client.close()
+        self.riak.stop()
+
+    def test_many_calls_are_concurrent(self):
+        values = dict(("key%d" % index, "value%d" % index) for index in xrange(100))
+        start = time.time()
+        self.assertTrue(all(self.client.set_many(values).itervalues()))
+        self.assertEqual(self.client.get_many(list(values) + ["missing"]), values)
+        deleted = self.client.delete_many(values)
+        self.assertLess(time.time() - start, 3)
+        self.assertEqual(sorted(deleted), sorted(values))
+        self.assertEqual(self.client.get_many(values.keys()[:5]), {})
+
+    def test_get_many_empty(self):
+        self.assertEqual(self.client.get_many([]), {})
+
+    def test_expired_keys_are_reaped_from_a_greenlet(self):
+        self.client.set("old", "value", time=time.time() - 10)
+        self.assertIsNone(self.client.get("old"))
+        self.assertIsInstance(self.client.reaper, green.GeventReaper)
+        green.gevent.sleep(0.5)
+        url = self.riak.url + "/buckets/bucket/keys/old"
+        self.assertEqual(self.client.pool.request("GET", url)[0], 404)
+
+    def test_scan_fetches_concurrently(self):
+        values = dict(("key%d" % index, "value%d" % index) for index in xrange(40))
+        self.client.set_many(values)
+        start = time.time()
+        self.assertEqual(dict(self.client.scan(window=20)), values)
+        self.assertLess(time.time() - start, 1)
+
+    def test_chunked_values(self):
+        self.client.chunk_threshold = 10
+        self.client.chunk_size = 4
+        self.assertTrue(self.client.set("big", "x" * 30))
+        self.assertEqual(self.client.get("big"), "x" * 30)
@@ -0,0 +1,87 @@
+import threading
+
+import mock
+import unittest2
+
+from riakcached import exceptions
+from riakcached.limiters import ConcurrencyLimiter
+from riakcached.limiters import LimitedPool
+from riakcached.limiters import TokenBucket
+import riakcached.pools
+
+
+class TestTokenBucket(unittest2.TestCase):
+    def test_burst_then_reject_without_waiting(self):
+        bucket = TokenBucket(rate=1, burst=2)
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertFalse(bucket.acquire(timeout=0))
+        self.assertEqual(bucket.metrics()["admitted"], 2)
+        self.assertEqual(bucket.metrics()["rejected"], 1)
+
+    @mock.patch("time.sleep")
+    def test_blocks_until_token_available(self, sleep):
+        bucket = TokenBucket(rate=10, burst=1)
+        self.assertTrue(bucket.acquire())
+        self.assertTrue(bucket.acquire(timeout=1))
+        self.assertEqual(sleep.call_count, 1)
+        self.assertAlmostEqual(sleep.call_args[0][0], 0.1, places=2)
+
+
+class TestConcurrencyLimiter(unittest2.TestCase):
+    def test_limits_concurrency(self):
+        limiter = ConcurrencyLimiter(1)
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire(timeout=0.01))
+        self.assertEqual(limiter.metrics()["active"], 1)
+        limiter.release()
+        self.assertTrue(limiter.acquire(timeout=0))
+
+    def test_release_wakes_waiter(self):
+        limiter = ConcurrencyLimiter(1)
+        limiter.acquire()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(limiter.acquire(timeout=5)))
+        waiter.start()
+        limiter.release()
+        waiter.join()
+        self.assertEqual(results, [True])
+
+
+class TestLimitedPool(unittest2.TestCase):
+    def setUp(self):
+        self.pool = mock.Mock(spec=riakcached.pools.Pool)
+        self.pool.url = "http://127.0.0.1:8098"
+        self.pool.timeout = 2
+        self.pool.request.return_value = 200, "", {}
+
+    def test_limiter_for_operation_class(self):
+        reads = ConcurrencyLimiter(1)
+        writes = ConcurrencyLimiter(1)
+        default = ConcurrencyLimiter(1)
+        sets = ConcurrencyLimiter(1)
+        pool = LimitedPool(self.pool, {"read": reads, "write": writes, "set": sets, "*": default})
+        url = "http://127.0.0.1:8098/buckets/b/keys/k"
+        self.assertIs(pool.limiter_for("GET", url), reads)
+        self.assertIs(pool.limiter_for("DELETE", url), writes)
+        self.assertIs(pool.limiter_for("POST", url), sets)
+        self.assertIs(LimitedPool(self.pool, {"*": default}).limiter_for("GET", url), default)
+        self.assertIsNone(LimitedPool(self.pool, {}).limiter_for("GET", url))
+
+    def test_request_releases_limiter(self):
+        limiter = ConcurrencyLimiter(1)
+        pool = LimitedPool(self.pool, {"*": limiter})
+        self.assertEqual(pool.request("GET", "http://127.0.0.1:8098/ping"), (200, "", {}))
+        self.assertEqual(limiter.metrics()["active"], 0)
+        self.pool.request.assert_called_once_with(
+            method="GET", url="http://127.0.0.1:8098/ping", body=None, headers=None,
+        )
+
+    def test_non_blocking_raises_rate_limited(self):
+        pool = LimitedPool(self.pool, {"*": TokenBucket(rate=1, burst=1)}, block=False)
+        pool.request("GET", "http://127.0.0.1:8098/ping")
+        self.assertRaises(
+            exceptions.RiakcachedRateLimited,
+            pool.request, "GET", "http://127.0.0.1:8098/ping",
+        )
+        self.assertEqual(pool.metrics()["*"]["rejected"], 1)
@@ -0,0 +1,87 @@
+import unittest2
+
+from riakcached.metrics import AdaptiveTimeouts
+from riakcached.metrics import LatencyHistogram
+from riakcached.metrics import LatencyWindow
+
+
+class TestLatencyWindow(unittest2.TestCase):
+    def test_empty_returns_default(self):
+        self.assertEqual(LatencyWindow().percentile(99, default=2), 2)
+
+    def test_percentile(self):
+        window = LatencyWindow()
+        for latency in xrange(1, 101):
+            window.add(latency / 100.0)
+        self.assertEqual(window.percentile(0), 0.01)
+        self.assertEqual(window.percentile(50), 0.51)
+        self.assertEqual(window.percentile(100), 1.0)
+
+    def test_window_is_bounded(self):
+        window = LatencyWindow(size=10)
+        for latency in xrange(100):
+            window.add(latency)
+        self.assertEqual(len(window), 10)
+        self.assertEqual(window.percentile(0), 90)
+
+
+class TestAdaptiveTimeouts(unittest2.TestCase):
+    def test_default_until_min_samples(self):
+        timeouts = AdaptiveTimeouts(min_samples=10)
+        for _ in xrange(9):
+            timeouts.observe("http://node", "get", 0.01)
+        self.assertEqual(timeouts.timeouts("http://node", "get", 2), (2, 2))
+
+    def test_timeouts_follow_latency_per_operation(self):
+        timeouts = AdaptiveTimeouts(min_samples=10, read_floor=0.01, connect_floor=0.01)
+        for _ in xrange(10):
+            timeouts.observe("http://node", "ping", 0.02)
+            timeouts.observe("http://node", "keys", 3.0)
+        self.assertEqual(timeouts.timeouts("http://node", "ping", 2), (0.04, 0.04))
+        self.assertEqual(timeouts.timeouts("http://node", "keys", 2), (0.04, 6.0))
+        self.assertEqual(timeouts.timeouts("http://other", "ping", 2), (2, 2))
+
+    def test_timeouts_clamped(self):
+        timeouts = AdaptiveTimeouts(
+            min_samples=1, read_floor=0.1, read_ceiling=5, connect_floor=0.2, connect_ceiling=1,
+        )
+        timeouts.observe("http://node", "ping", 0.001)
+        timeouts.observe("http://node", "keys", 60)
+        self.assertEqual(timeouts.timeouts("http://node", "ping", 2), (0.2, 0.1))
+        self.assertEqual(timeouts.timeouts("http://node", "keys", 2), (0.2, 5))
+
+
+class TestLatencyHistogram(unittest2.TestCase):
+    def test_empty_returns_default(self):
+        histogram = LatencyHistogram()
+        self.assertEqual(len(histogram), 0)
+        self.assertEqual(histogram.percentile(99, default=1), 1)
+        self.assertEqual(histogram.mean(default=2), 2)
+
+    def test_percentile_is_bucket_upper_bound(self):
+        histogram = LatencyHistogram()
+        for _ in xrange(90):
+            histogram.add(0.0015)
+        for _ in xrange(10):
+            histogram.add(0.03)
+        self.assertEqual(histogram.percentile(50), 0.002)
+        self.assertEqual(histogram.percentile(90), 0.002)
+        self.assertEqual(histogram.percentile(99), 0.03)
+        self.assertEqual(histogram.buckets(), [(0.002, 90), (0.05, 10)])
+        self.assertAlmostEqual(histogram.mean(), 0.00435)
+
+    def test_slowest_bucket(self):
+        histogram = LatencyHistogram()
+        histogram.add(120)
+        self.assertEqual(histogram.percentile(50), 120)
+        self.assertEqual(histogram.buckets(), [(None, 1)])
+
+    def test_merge(self):
+        first = LatencyHistogram()
+        first.add(0.001)
+        second = LatencyHistogram()
+        second.add(0.2)
+        first.merge(second)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(first.max, 0.2)
+        self.assertEqual(first.buckets(), [(0.001, 1), (0.2, 1)])
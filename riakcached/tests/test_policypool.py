@@ -0,0 +1,153 @@
+import threading
+
+import mock
+import unittest2
+
+from riakcached import exceptions
+from riakcached.policies import PolicyPool
+from riakcached.policies import RetryBudget
+import riakcached.pools
+
+
+class TestRetryBudget(unittest2.TestCase):
+    def test_withdraw_limited_by_reserve(self):
+        budget = RetryBudget(ratio=0.5, reserve=2)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+    def test_deposit_refills(self):
+        budget = RetryBudget(ratio=0.5, reserve=2)
+        budget.withdraw()
+        budget.withdraw()
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+
+class TestPolicyPool(unittest2.TestCase):
+    def setUp(self):
+        self.patched_sleep = mock.patch("time.sleep")
+        self.sleep = self.patched_sleep.start()
+        self.first = mock.Mock(spec=riakcached.pools.Pool)
+        self.first.url = "http://127.0.0.1:8098"
+        self.first.timeout = 2
+        self.second = mock.Mock(spec=riakcached.pools.Pool)
+        self.second.url = "http://127.0.0.2:8098/"
+        self.second.timeout = 2
+
+    def tearDown(self):
+        self.patched_sleep.stop()
+
+    def test_uses_first_pool_url(self):
+        pool = PolicyPool([self.first, self.second])
+        self.assertEqual(pool.url, "http://127.0.0.1:8098")
+        self.assertFalse(self.first.connect.called)
+
+    def test_reset_resets_every_node(self):
+        PolicyPool([self.first, self.second]).reset()
+        self.first.reset.assert_called_once_with()
+        self.second.reset.assert_called_once_with()
+
+    def test_metrics_per_node(self):
+        self.first.metrics.return_value = {"connections": 1}
+        self.second.metrics.return_value = {"connections": 2}
+        self.assertEqual(PolicyPool([self.first, self.second]).metrics(), {
+            "http://127.0.0.1:8098": {"connections": 1},
+            "http://127.0.0.2:8098/": {"connections": 2},
+        })
+
+    def test_retries_idempotent_on_next_node(self):
+        self.first.request.side_effect = exceptions.RiakcachedTimeout("timeout")
+        self.second.request.return_value = 200, "value", {}
+
+        pool = PolicyPool([self.first, self.second], hedge_percentile=None)
+        result = pool.request("GET", "http://127.0.0.1:8098/buckets/b/keys/k")
+        self.assertEqual(result, (200, "value", {}))
+        self.second.request.assert_called_once_with(
+            method="GET", url="http://127.0.0.2:8098/buckets/b/keys/k", body=None, headers=None,
+        )
+        self.assertEqual(self.sleep.call_count, 1)
+
+    def test_retries_503(self):
+        self.first.request.return_value = 503, "", {}
+        self.second.request.return_value = 204, "", {}
+
+        pool = PolicyPool([self.first, self.second])
+        self.assertEqual(pool.request("DELETE", "http://127.0.0.1:8098/buckets/b/keys/k")[0], 204)
+
+    def test_does_not_retry_non_idempotent(self):
+        self.first.request.side_effect = exceptions.RiakcachedTimeout("timeout")
+
+        pool = PolicyPool([self.first, self.second])
+        self.assertRaises(
+            exceptions.RiakcachedTimeout,
+            pool.request, "POST", "http://127.0.0.1:8098/buckets/b/keys/k", body="v",
+        )
+        self.assertFalse(self.second.request.called)
+
+    def test_retries_limited_by_budget(self):
+        self.first.request.side_effect = exceptions.RiakcachedConnectionError("error")
+        self.second.request.side_effect = exceptions.RiakcachedConnectionError("error")
+
+        pool = PolicyPool([self.first, self.second], retries=5, budget=RetryBudget(reserve=1))
+        self.assertRaises(
+            exceptions.RiakcachedConnectionError,
+            pool.request, "GET", "http://127.0.0.1:8098/ping",
+        )
+        self.assertEqual(self.first.request.call_count + self.second.request.call_count, 2)
+
+    def test_slow_read_is_hedged(self):
+        released = threading.Event()
+
+        def slow_request(**kwargs):
+            released.wait(5)
+            return 200, "slow", {}
+
+        self.first.request.side_effect = slow_request
+        self.second.request.return_value = 200, "fast", {}
+
+        pool = PolicyPool([self.first, self.second], hedge_min_samples=1)
+        pool._window("get").add(0.001)
+        try:
+            result = pool.request("GET", "http://127.0.0.1:8098/buckets/b/keys/k")
+        finally:
+            released.set()
+        self.assertEqual(result, (200, "fast", {}))
+
+    def test_only_object_reads_are_hedged(self):
+        released = threading.Event()
+
+        def slow_request(**kwargs):
+            released.wait(0.2)
+            return 200, "slow", {}
+
+        self.first.request.side_effect = slow_request
+        self.second.request.return_value = 200, "fast", {}
+
+        pool = PolicyPool([self.first, self.second], hedge_min_samples=1)
+        pool._window("keys").add(0.001)
+        pool._window("get").add(10)
+        self.assertEqual(pool.request("GET", "http://127.0.0.1:8098/buckets/b/keys?keys=true"),
+                         (200, "slow", {}))
+        self.assertFalse(self.second.request.called)
+        self.assertEqual(len(pool._window("get")), 1)
+        self.assertEqual(len(pool._window("keys")), 2)
+
+    def test_first_retry_backoff(self):
+        self.first.request.side_effect = exceptions.RiakcachedTimeout("timeout")
+        self.second.request.return_value = 200, "value", {}
+
+        pool = PolicyPool([self.first, self.second], backoff=0.05, hedge_percentile=None)
+        with mock.patch("random.uniform") as uniform:
+            uniform.return_value = 0
+            pool.request("GET", "http://127.0.0.1:8098/buckets/b/keys/k")
+        uniform.assert_called_once_with(0, 0.05)
+
+    def test_hedging_waits_for_samples(self):
+        self.first.request.return_value = 200, "value", {}
+
+        pool = PolicyPool([self.first, self.second])
+        self.assertEqual(pool.request("GET", "http://127.0.0.1:8098/ping"), (200, "value", {}))
+        self.assertFalse(self.second.request.called)
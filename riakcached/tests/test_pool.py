@@ -1,6 +1,14 @@
+import mmap
+import StringIO
+
+import mock
 import unittest2
 
+from riakcached.metrics import AdaptiveTimeouts
+from riakcached.pools import classify_request
+from riakcached.pools import iter_chunks
 from riakcached.pools import Pool
+from riakcached.pools import StreamingResponse
 
 
 class TestPool(unittest2.TestCase):
@@ -14,3 +22,100 @@ class TestPool(unittest2.TestCase):
             "GET",
             "http://127.0.0.1:8098/stats",
         )
+        self.assertRaises(
+            NotImplementedError,
+            pool.request_stream,
+            "GET",
+            "http://127.0.0.1:8098/stats",
+        )
+
+
+class TestIterChunks(unittest2.TestCase):
+    def test_file_like(self):
+        source = StringIO.StringIO("abcdefg")
+        self.assertEqual(list(iter_chunks(source, 3)), ["abc", "def", "g"])
+
+    def test_str(self):
+        chunks = [str(chunk) for chunk in iter_chunks("abcdefg", 3)]
+        self.assertEqual(chunks, ["abc", "def", "g"])
+
+    def test_memoryview(self):
+        chunks = list(iter_chunks(memoryview("abcdefg"), 4))
+        self.assertTrue(all(isinstance(chunk, memoryview) for chunk in chunks))
+        self.assertEqual([chunk.tobytes() for chunk in chunks], ["abcd", "efg"])
+
+    def test_mmap(self):
+        source = mmap.mmap(-1, 5)
+        source.write("abcde")
+        chunks = [str(chunk) for chunk in iter_chunks(source, 2)]
+        self.assertEqual(chunks, ["ab", "cd", "e"])
+
+    def test_iterable(self):
+        self.assertEqual(list(iter_chunks(iter(["ab", "", "c"]))), ["ab", "c"])
+
+
+class TestStreamingResponse(unittest2.TestCase):
+    def test_iterates_in_chunks(self):
+        stream = StreamingResponse(StringIO.StringIO("abcdefg"), chunk_size=3)
+        self.assertEqual(list(stream), ["abc", "def", "g"])
+
+    def test_readinto(self):
+        stream = StreamingResponse(StringIO.StringIO("abcdefg"))
+        target = bytearray(4)
+        self.assertEqual(stream.readinto(target), 4)
+        self.assertEqual(target, bytearray("abcd"))
+
+    def test_close_releases_connection(self):
+        response = mock.Mock()
+        with StreamingResponse(response):
+            pass
+        response.release_conn.assert_called_once_with()
+
+    def test_close_unread_response_closes_connection(self):
+        response = mock.Mock()
+        response.closed = False
+        StreamingResponse(response).close()
+        response._connection.close.assert_called_once_with()
+        response.release_conn.assert_called_once_with()
+
+
+class TestClassifyRequest(unittest2.TestCase):
+    def test_classify(self):
+        base = "http://127.0.0.1:8098"
+        self.assertEqual(classify_request("GET", base + "/buckets/b/keys/k"), "get")
+        self.assertEqual(classify_request("POST", base + "/buckets/b/keys/k"), "set")
+        self.assertEqual(classify_request("DELETE", base + "/buckets/b/keys/k"), "delete")
+        self.assertEqual(classify_request("POST", base + "/buckets/b/counters/k"), "counter")
+        self.assertEqual(classify_request("GET", base + "/buckets/b/keys?keys=true"), "keys")
+        self.assertEqual(classify_request("PUT", base + "/buckets/b/props"), "props")
+        self.assertEqual(classify_request("GET", base + "/stats"), "stats")
+        self.assertEqual(classify_request("GET", base + "/ping"), "ping")
+        self.assertEqual(classify_request("GET", base + "/other"), "other")
+        self.assertEqual(classify_request("POST", base + "/mapred?chunked=true"), "mapred")
+        self.assertEqual(classify_request("GET", "/buckets/b/keys/k"), "get")
+
+    def test_classify_by_position(self):
+        base = "http://127.0.0.1:8098"
+        self.assertEqual(classify_request("GET", base + "/buckets/b/keys/props"), "get")
+        self.assertEqual(classify_request("POST", base + "/buckets/b/keys/keys"), "set")
+        self.assertEqual(classify_request("DELETE", base + "/buckets/b/keys/counters"), "delete")
+        self.assertEqual(classify_request("GET", base + "/buckets/counters/keys/k"), "get")
+        self.assertEqual(classify_request("GET", base + "/buckets/keys/keys"), "keys")
+        self.assertEqual(classify_request("GET", base + "/buckets/props/props"), "props")
+        self.assertEqual(classify_request("POST", base + "/buckets/keys/counters/props"), "counter")
+        self.assertEqual(classify_request("GET", base + "/buckets/b/keys/ping"), "get")
+        self.assertEqual(classify_request("GET", base + "/buckets/b/index/i_bin/v"), "other")
+
+    def test_pool_default_timeouts(self):
+        pool = Pool(auto_connect=False, timeout=3)
+        self.assertEqual(pool.timeouts_for("get"), (3, 3))
+        pool.observe("get", 0.1)
+        self.assertEqual(pool.timeouts_for("get"), (3, 3))
+
+    def test_pool_adaptive_timeouts(self):
+        adaptive = AdaptiveTimeouts(min_samples=1, read_floor=0.01, connect_floor=0.01)
+        pool = Pool(auto_connect=False, timeout=3, adaptive_timeouts=adaptive)
+        self.assertEqual(pool.timeouts_for("get"), (3, 3))
+        pool.observe("get", 0.1)
+        self.assertEqual(pool.timeouts_for("get"), (0.2, 0.2))
+        self.assertEqual(pool.timeouts_for("set"), (0.2, 3))
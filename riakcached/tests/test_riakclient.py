@@ -1,11 +1,23 @@
 
+import json
+import os
+import shutil
+import StringIO
+import tempfile
+import time
+
 import mock
 import unittest2
 
 
 from riakcached import exceptions
+from riakcached.caches import LocalCache
+from riakcached.caches import SharedMemoryCache
 from riakcached.clients import RiakClient
+import riakcached.clients
 import riakcached.pools
+from riakcached.serializers import SerializerRegistry
+from riakcached.testing import FakeRiakServer
 
 
 class TestRiakClient(unittest2.TestCase):
@@ -19,6 +31,47 @@ class TestRiakClient(unittest2.TestCase):
         client = RiakClient("test_bucket", pool=pool)
         self.assertEqual(client.base_url, "http://127.0.0.1:8098")
 
+    def test_quote_key(self):
+        self.assertEqual(riakcached.clients.quote_key("a/b?c d"), "a%2Fb%3Fc%20d")
+        self.assertEqual(riakcached.clients.quote_key(u"caf\xe9"), "caf%C3%A9")
+        self.assertEqual(riakcached.clients.quote_key("plain-key_1.2"), "plain-key_1.2")
+
+    def test_keys_and_bucket_are_quoted(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 404, "", {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("my bucket", pool=pool)
+        client.get("a/b?c")
+        pool.request.assert_called_once_with(
+            method="GET",
+            url="http://127.0.0.1:8098/buckets/my%20bucket/keys/a%2Fb%3Fc",
+        )
+
+    def test_changing_bucket_changes_urls(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 204, "", {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        client.bucket = "other"
+        client.delete("test")
+        pool.request.assert_called_once_with(
+            method="DELETE",
+            url="http://127.0.0.1:8098/buckets/other/keys/test",
+        )
+
+    def test_shared_store_headers_are_not_modified(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 204, "", {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        client.add("test", "value")
+        self.assertEqual(pool.request.call_args[1]["headers"]["If-None-Match"], "*")
+        client.set("test", "value")
+        self.assertNotIn("If-None-Match", pool.request.call_args[1]["headers"])
+
     def test_client_adds_serializer(self):
         serializer = mock.Mock()
 
@@ -87,6 +140,50 @@ class TestRiakClient(unittest2.TestCase):
         result = client.get("test")
         self.assertEqual("deserialized", result)
 
+    def test_get_json_with_charset(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 200, '{"a": 1}', {
+            "content-type": "application/json; charset=utf-8",
+        }
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertEqual(client.get("test"), {"a": 1})
+
+    def test_clients_can_share_serializers(self):
+        registry = SerializerRegistry()
+        first = RiakClient("first", pool=mock.Mock(url="http://127.0.0.1:8098"),
+                           serializers=registry)
+        second = RiakClient("second", pool=mock.Mock(url="http://127.0.0.1:8098"),
+                            serializers=registry)
+        first.add_serializer("application/test", lambda data: "serialized")
+        self.assertEqual(second.serialize("data", "application/test"), "serialized")
+
+    def test_get_lazy_does_not_deserialize(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 200, '{"a": 1}', {"content-type": "application/json"}
+        pool.url = "http://127.0.0.1:8098"
+        deserializer = mock.Mock(return_value={"a": 1})
+
+        client = RiakClient("test_bucket", pool=pool)
+        client.add_deserializer("application/json", deserializer)
+        result = client.get("test", lazy=True)
+        self.assertEqual(result.data, '{"a": 1}')
+        self.assertEqual(result.content_type, "application/json")
+        self.assertFalse(deserializer.called)
+        self.assertEqual(result.value, {"a": 1})
+
+    def test_get_many_lazy(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 200, "[1]", {"content-type": "application/json"}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        results = client.get_many(["first", "second"], lazy=True)
+        self.assertEqual(sorted(results), ["first", "second"])
+        self.assertFalse(results["first"].loaded)
+        self.assertEqual(results["second"].value, [1])
+
     def test_get_many(self):
         pool = mock.Mock(spec=riakcached.pools.Pool)
         pool.request.return_value = 200, "result", {"content-type": "text/plain"}
@@ -169,6 +266,23 @@ class TestRiakClient(unittest2.TestCase):
             },
         )
 
+    def test_set_raw_does_not_serialize(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 204, "", {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertTrue(client.set_raw("test", '"raw"', "application/json", meta={"Flags": 2}))
+        pool.request.assert_called_once_with(
+            method="POST",
+            url="http://127.0.0.1:8098/buckets/test_bucket/keys/test",
+            body='"raw"',
+            headers={
+                "Content-Type": "application/json",
+                "X-Riak-Meta-Flags": "2",
+            },
+        )
+
     def test_set_many(self):
         pool = mock.Mock(spec=riakcached.pools.Pool)
         pool.request.return_value = 200, "", {"content-type": "text/plain"}
@@ -363,3 +477,538 @@ class TestRiakClient(unittest2.TestCase):
 
         client = RiakClient("test_bucket", pool=pool)
         self.assertIsNone(client.keys())
+
+    def test_iter_keys_streams_keys(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        stream = mock.MagicMock()
+        stream.__iter__.return_value = iter([
+            '{"keys":["key1","ke', 'y2"]}{"keys":[]}',
+            '{"keys":["big.chunk.0123456789abcdef0123456789abcdef.0","key3"]}',
+        ])
+        pool.request_stream.return_value = 200, stream, {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertEqual(list(client.iter_keys()), ["key1", "key2", "key3"])
+        pool.request_stream.assert_called_once_with(
+            method="GET",
+            url="http://127.0.0.1:8098/buckets/test_bucket/keys?keys=stream",
+        )
+        stream.close.assert_called_once_with()
+
+    def test_iter_keys_503_raises_unavailable(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request_stream.return_value = 503, mock.Mock(), {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertRaises(exceptions.RiakcachedServiceUnavailable, list, client.iter_keys())
+
+    def test_scan_filters_keys_with_map_reduce(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        stream = mock.MagicMock()
+        stream.__iter__.return_value = iter([
+            '\r\n--b1\r\nContent-Type: application/json\r\n\r\n{"phase":0,"data":[["test_b',
+            'ucket","user:1"]]}\r\n--b1\r\nContent-Type: application/json\r\n\r\n'
+            '{"phase":0,"data":[["test_bucket","user:2"]]}\r\n--b1--\r\n',
+        ])
+        pool.request_stream.return_value = 200, stream, {
+            "content-type": "multipart/mixed; boundary=b1",
+        }
+        pool.request.return_value = 200, "value", {"content-type": "text/plain"}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertEqual(
+            sorted(client.scan(prefix="user:", key_filters=[["ends_with", "1"]])),
+            [("user:1", "value"), ("user:2", "value")],
+        )
+        call = pool.request_stream.call_args[1]
+        self.assertEqual(call["url"], "http://127.0.0.1:8098/mapred?chunked=true")
+        self.assertEqual(json.loads(call["body"])["inputs"], {
+            "bucket": "test_bucket",
+            "key_filters": [["and", [["starts_with", "user:"]], [["ends_with", "1"]]]],
+        })
+        stream.close.assert_called_once_with()
+
+    def test_scan_map_reduce_error_raises(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request_stream.return_value = 500, mock.Mock(), {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertRaises(exceptions.RiakcachedServiceUnavailable, list, client.scan(prefix="a"))
+
+    def test_scan_invalid_partition(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertRaises(ValueError, list, client.scan(partition=(2, 2)))
+
+    def test_get_stream_returns_stream(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        stream = mock.Mock()
+        pool.request_stream.return_value = 200, stream, {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertEqual(client.get_stream("test"), stream)
+        pool.request_stream.assert_called_once_with(
+            method="GET",
+            url="http://127.0.0.1:8098/buckets/test_bucket/keys/test",
+        )
+        self.assertFalse(stream.close.called)
+
+    def test_get_stream_not_found(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        stream = mock.Mock()
+        pool.request_stream.return_value = 404, stream, {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertIsNone(client.get_stream("test"))
+        stream.close.assert_called_once_with()
+
+    def test_get_stream_503_raises_unavailable(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request_stream.return_value = 503, mock.Mock(), {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertRaises(exceptions.RiakcachedServiceUnavailable, client.get_stream, "test")
+
+    def test_set_stream_sends_body_unserialized(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request_stream.return_value = 204, mock.Mock(), {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        body = memoryview("value")
+        self.assertTrue(client.set_stream("test", body))
+        pool.request_stream.assert_called_once_with(
+            method="POST",
+            url="http://127.0.0.1:8098/buckets/test_bucket/keys/test",
+            body=body,
+            headers={
+                "Content-Type": "application/octet-stream",
+            },
+        )
+
+    def test_set_stream_412_raises_precondition_failed(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request_stream.return_value = 412, mock.Mock(), {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertRaises(exceptions.RiakcachedPreconditionFailed, client.set_stream, "test", "v")
+
+    def _storage_pool(self):
+        storage = {}
+
+        def request(method, url, body=None, headers=None):
+            if method == "POST":
+                storage[url] = body, headers["Content-Type"]
+                return 204, "", {}
+            elif method == "DELETE":
+                return (204 if storage.pop(url, None) else 404), "", {}
+            elif url in storage:
+                data, content_type = storage[url]
+                return 200, data if method == "GET" else "", {"content-type": content_type}
+            return 404, "", {}
+
+        def request_stream(method, url, body=None, headers=None):
+            if body is not None:
+                body = "".join(str(chunk) for chunk in riakcached.pools.iter_chunks(body))
+            status, data, headers = request(method, url, body, headers)
+            return status, riakcached.pools.StreamingResponse(StringIO.StringIO(data)), headers
+
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.side_effect = request
+        pool.request_stream.side_effect = request_stream
+        pool.url = "http://127.0.0.1:8098"
+        return pool, storage
+
+    def test_set_large_value_is_chunked(self):
+        pool, storage = self._storage_pool()
+        client = RiakClient("test_bucket", pool=pool, chunk_threshold=8, chunk_size=4)
+        self.assertTrue(client.set("test", "0123456789"))
+
+        manifest, content_type = storage.pop("http://127.0.0.1:8098/buckets/test_bucket/keys/test")
+        self.assertEqual(content_type, riakcached.clients.MANIFEST_CONTENT_TYPE)
+        manifest = json.loads(manifest)
+        self.assertEqual(manifest["chunks"], 3)
+        self.assertEqual(manifest["size"], 10)
+        self.assertEqual(manifest["content_type"], "text/plain")
+        self.assertEqual(sorted(data for data, _ in storage.values()), ["0123", "4567", "89"])
+
+    def test_set_small_value_is_not_chunked(self):
+        pool, storage = self._storage_pool()
+        client = RiakClient("test_bucket", pool=pool, chunk_threshold=8, chunk_size=4)
+        self.assertTrue(client.set("test", "small"))
+        self.assertEqual(storage, {
+            "http://127.0.0.1:8098/buckets/test_bucket/keys/test": ("small", "text/plain"),
+        })
+
+    def test_get_reassembles_chunks(self):
+        pool, _ = self._storage_pool()
+        client = RiakClient("test_bucket", pool=pool, chunk_threshold=8, chunk_size=4)
+        client.set("test", {"value": "x" * 20}, content_type="application/json")
+        self.assertEqual(client.get("test"), {"value": "x" * 20})
+
+    def test_get_missing_chunk_returns_none(self):
+        pool, storage = self._storage_pool()
+        client = RiakClient("test_bucket", pool=pool, chunk_threshold=8, chunk_size=4)
+        client.set("test", "0123456789")
+        chunk_url = [url for url in storage if ".chunk." in url][0]
+        del storage[chunk_url]
+        self.assertIsNone(client.get("test"))
+
+    def test_overwrite_and_delete_remove_chunks(self):
+        pool, storage = self._storage_pool()
+        client = RiakClient("test_bucket", pool=pool, chunk_threshold=8, chunk_size=4)
+        client.set("test", "0123456789")
+        client.set("test", "abcdefghijkl")
+        self.assertEqual(len(storage), 4)
+        self.assertEqual(client.get("test"), "abcdefghijkl")
+
+        client.set("test", "small")
+        self.assertEqual(len(storage), 1)
+
+        client.set("test", "0123456789")
+        self.assertTrue(client.delete("test"))
+        self.assertEqual(storage, {})
+
+    def test_get_stream_streams_chunks(self):
+        pool, storage = self._storage_pool()
+        client = RiakClient("test_bucket", pool=pool, chunk_threshold=8, chunk_size=4)
+        client.set("test", "0123456789")
+        with client.get_stream("test") as stream:
+            self.assertIsInstance(stream, riakcached.clients.ChunkedStream)
+            self.assertEqual(list(stream), ["0123", "4567", "89"])
+
+        with client.get_stream("test") as stream:
+            self.assertEqual(stream.read(), "0123456789")
+
+    def test_get_stream_missing_chunk_raises_not_found(self):
+        pool, storage = self._storage_pool()
+        client = RiakClient("test_bucket", pool=pool, chunk_threshold=8, chunk_size=4)
+        client.set("test", "0123456789")
+        del storage[[url for url in storage if url.endswith(".1")][0]]
+        stream = client.get_stream("test")
+        self.assertEqual(stream.read(4), "0123")
+        self.assertRaises(exceptions.RiakcachedNotFound, stream.read, 4)
+
+    def test_set_stream_removes_chunks(self):
+        pool, storage = self._storage_pool()
+        client = RiakClient("test_bucket", pool=pool, chunk_threshold=8, chunk_size=4)
+        client.set("test", "0123456789")
+        self.assertTrue(client.set_stream("test", "streamed"))
+        self.assertEqual(storage, {
+            "http://127.0.0.1:8098/buckets/test_bucket/keys/test": (
+                "streamed", "application/octet-stream",
+            ),
+        })
+
+    def test_keys_skips_chunks(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 200, json.dumps({
+            "keys": ["big", "big.chunk.0123456789abcdef0123456789abcdef.0", "key"],
+        }), {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertEqual(client.keys(), {"keys": ["big", "key"]})
+
+    def test_add_uses_if_none_match(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 204, "", {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertTrue(client.add("test", "value"))
+        pool.request.assert_called_once_with(
+            method="POST",
+            url="http://127.0.0.1:8098/buckets/test_bucket/keys/test",
+            body="value",
+            headers={
+                "Content-Type": "text/plain",
+                "If-None-Match": "*",
+            },
+        )
+
+    def test_add_existing_key(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 412, "", {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertFalse(client.add("test", "value"))
+
+    @mock.patch("time.time")
+    def test_set_with_time_records_expiry(self, time):
+        time.return_value = 1000
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 204, "", {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertTrue(client.set("test", "value", time=60))
+        pool.request.assert_called_once_with(
+            method="POST",
+            url="http://127.0.0.1:8098/buckets/test_bucket/keys/test",
+            body="value",
+            headers={
+                "Content-Type": "text/plain",
+                "X-Riak-Meta-Expires": "1060",
+            },
+        )
+
+    def test_get_expired_returns_none_without_deserializing(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 200, "{invalid", {
+            "content-type": "application/json",
+            "x-riak-meta-expires": "1",
+        }
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        client.reaper = mock.Mock()
+        self.assertIsNone(client.get("test"))
+        client.reaper.queue.assert_called_once_with("test", client)
+
+    def test_close_stops_reaper(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        client.reaper = mock.Mock()
+        client.close()
+        client.reaper.stop.assert_called_once_with()
+        pool.close.assert_called_once_with()
+
+    def test_set_many_with_time(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 204, "", {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        client.set_many({"test1": "value1"}, time=2000000000)
+        self.assertEqual(
+            pool.request.call_args[1]["headers"]["X-Riak-Meta-Expires"], "2000000000",
+        )
+
+    def test_is_expired(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 200, "", {"x-riak-meta-expires": "1"}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        self.assertTrue(client.is_expired("test"))
+        pool.request.assert_called_once_with(
+            method="HEAD",
+            url="http://127.0.0.1:8098/buckets/test_bucket/keys/test",
+        )
+
+    def test_near_cache_serves_repeated_gets(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 200, '{"a": 1}', {
+            "content-type": "application/json",
+            "etag": "abc",
+            "x-riak-vclock": "a85hYGBgzGDKBVIc",
+        }
+        pool.url = "http://127.0.0.1:8098"
+
+        cache = LocalCache()
+        client = RiakClient("test_bucket", pool=pool, near_cache=cache)
+        self.assertEqual(client.get("test"), {"a": 1})
+        self.assertEqual(client.get("test"), {"a": 1})
+        self.assertEqual(pool.request.call_count, 1)
+        self.assertEqual(client.get_raw("test"), (
+            '{"a": 1}', {"content-type": "application/json", "etag": "abc"},
+        ))
+        self.assertIn("test_bucket/test", cache)
+
+    def test_near_cache_invalidated_by_set_and_delete(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.url = "http://127.0.0.1:8098"
+
+        cache = LocalCache()
+        client = RiakClient("test_bucket", pool=pool, near_cache=cache)
+        cache.set("test_bucket/test", "entry")
+        pool.request.return_value = 204, "", {}
+        client.set("test", "value")
+        self.assertNotIn("test_bucket/test", cache)
+
+        cache.set("test_bucket/test", "entry")
+        client.delete("test")
+        self.assertNotIn("test_bucket/test", cache)
+
+    def test_near_cache_invalidated_after_write(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.url = "http://127.0.0.1:8098"
+
+        cache = LocalCache()
+        client = RiakClient("test_bucket", pool=pool, near_cache=cache)
+
+        def recache(**kwargs):
+            # another process caches the old value while the write is in flight
+            cache.set("test_bucket/test", "old")
+            return 204, "", {}
+
+        pool.request.side_effect = recache
+        client.set("test", "value")
+        self.assertNotIn("test_bucket/test", cache)
+        client.add("test", "value")
+        self.assertNotIn("test_bucket/test", cache)
+
+    def test_near_cache_unicode_keys(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 200, "value", {"content-type": "text/plain"}
+        pool.url = "http://127.0.0.1:8098"
+
+        directory = tempfile.mkdtemp()
+        cache = SharedMemoryCache(os.path.join(directory, "cache"), size=64 * 1024)
+        try:
+            client = RiakClient("test_bucket", pool=pool, near_cache=cache)
+            self.assertEqual(client.get(u"caf\xe9"), "value")
+            self.assertEqual(client.get(u"caf\xe9"), "value")
+            self.assertEqual(pool.request.call_count, 1)
+            self.assertIn("test_bucket/caf\xc3\xa9", cache)
+            client.delete(u"caf\xe9")
+            self.assertNotIn("test_bucket/caf\xc3\xa9", cache)
+        finally:
+            cache.close()
+            shutil.rmtree(directory)
+
+    @mock.patch("time.time")
+    def test_near_cache_ttl_limited_by_expiry(self, time):
+        time.return_value = 1000
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 200, "value", {
+            "content-type": "text/plain",
+            "x-riak-meta-expires": "1002",
+        }
+        pool.url = "http://127.0.0.1:8098"
+
+        cache = mock.Mock(ttl=60)
+        cache.get.return_value = None
+        client = RiakClient("test_bucket", pool=pool, near_cache=cache)
+        client.get("test")
+        self.assertEqual(cache.set.call_args[0][2], 2)
+
+    def test_negative_cache_skips_known_missing_keys(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 404, "", {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool, negative_cache_ttl=5)
+        self.assertIsNone(client.get("test"))
+        self.assertIsNone(client.get("test"))
+        self.assertEqual(client.get_many(["test"]), {})
+        self.assertEqual(pool.request.call_count, 1)
+
+    def test_negative_cache_invalidated_by_set_and_incr(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 404, "", {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool, negative_cache_ttl=5)
+        client.get("test")
+        client.get("counter")
+        client.set("test", "value")
+        client.incr("counter")
+        self.assertNotIn("test", client.negative_cache)
+        self.assertNotIn("counter", client.negative_cache)
+
+    def test_negative_cache_disabled_by_default(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 404, "", {}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = RiakClient("test_bucket", pool=pool)
+        client.get("test")
+        client.get("test")
+        self.assertEqual(pool.request.call_count, 2)
+
+
+class TestRiakClientAgainstFakeServer(unittest2.TestCase):
+    def test_reserved_characters_in_keys(self):
+        with FakeRiakServer() as riak:
+            client = RiakClient("bucket", pool=riakcached.pools.Urllib3Pool(base_url=riak.url))
+            keys = ["a/b", "what?", "with space", "100%", u"caf\xe9"]
+            for index, key in enumerate(keys):
+                self.assertTrue(client.set(key, "value%d" % index))
+            self.assertIsNone(client.get("a"))
+            for index, key in enumerate(keys):
+                self.assertEqual(client.get(key), "value%d" % index)
+            listed = sorted(client.iter_keys())
+            self.assertEqual(listed, sorted(key.encode("utf-8") for key in keys))
+
+    def test_set_raw_if_match(self):
+        with FakeRiakServer() as riak:
+            client = RiakClient("bucket", pool=riakcached.pools.Urllib3Pool(base_url=riak.url))
+            client.set_raw("key", "1")
+            _, headers = client.get_raw("key")
+            self.assertTrue(client.set_raw("key", "2", etag=headers["etag"]))
+            self.assertRaises(exceptions.RiakcachedPreconditionFailed, client.set_raw, "key", "3",
+                              etag=headers["etag"])
+            self.assertEqual(client.get_raw("key")[0], "2")
+
+    def test_bucket_handles_share_pool_and_serializers(self):
+        with FakeRiakServer() as riak:
+            client = RiakClient("users", pool=riakcached.pools.Urllib3Pool(base_url=riak.url),
+                                negative_cache_ttl=60)
+            sessions = client.for_bucket("sessions")
+            self.assertIs(client.for_bucket("sessions"), sessions)
+            self.assertIs(sessions.for_bucket("users"), client)
+            self.assertIs(sessions.pool, client.pool)
+            self.assertIs(sessions.serializers, client.serializers)
+            self.assertIsNot(sessions.negative_cache, client.negative_cache)
+            self.assertIs(sessions.reaper, client.reaper)
+            self.assertEqual(sessions.bucket, "sessions")
+            self.assertEqual(client.bucket, "users")
+
+            sessions.set("key", "session")
+            client.set("key", "user")
+            self.assertEqual(sessions.get("key"), "session")
+            self.assertEqual(client.get("key"), "user")
+
+    def test_props_are_cached_and_invalidated(self):
+        with FakeRiakServer() as riak:
+            client = RiakClient("users", pool=riakcached.pools.Urllib3Pool(base_url=riak.url),
+                                props_ttl=60)
+            sessions = client.for_bucket("sessions")
+            self.assertEqual(client.props()["props"]["n_val"], 3)
+            self.assertEqual(sessions.props()["props"]["n_val"], 3)
+            requests = riak.store.requests
+            client.props()
+            sessions.props()
+            self.assertEqual(riak.store.requests, requests)
+
+            sessions.set_props({"props": {"n_val": 5}})
+            self.assertEqual(sessions.props()["props"]["n_val"], 5)
+            self.assertEqual(client.props()["props"]["n_val"], 3)
+
+    def test_scan(self):
+        with FakeRiakServer() as riak:
+            pool = riakcached.pools.Urllib3Pool(base_url=riak.url, maxsize=8)
+            client = RiakClient("bucket", pool=pool, reap_expired=False)
+            values = dict(("user:%d" % index, "value%d" % index) for index in xrange(25))
+            values.update({"admin:1": "admin", u"caf\xe9".encode("utf-8"): "coffee"})
+            client.set_many(values)
+            client.set("old", "value", time=time.time() - 10)
+
+            self.assertEqual(dict(client.scan(window=4)), values)
+            self.assertEqual(
+                dict(client.scan(prefix="user:")),
+                dict((key, value) for key, value in values.iteritems() if key.startswith("user:")),
+            )
+            self.assertEqual(
+                dict(client.scan(key_filters=[["tokenize", ":", 1], ["eq", "admin"]])),
+                {"admin:1": "admin"},
+            )
+
+            partitions = [dict(client.scan(partition=(index, 3))) for index in xrange(3)]
+            self.assertEqual(sum(len(partition) for partition in partitions), len(values))
+            self.assertEqual(dict(sum((p.items() for p in partitions), [])), values)
@@ -0,0 +1,146 @@
+import json
+import marshal
+
+import mock
+import unittest2
+
+from riakcached import serializers
+from riakcached.serializers import LazyValue
+from riakcached.serializers import media_type
+from riakcached.serializers import ProcessDeserializer
+from riakcached.serializers import SerializerRegistry
+
+
+class TestMediaType(unittest2.TestCase):
+    def test_media_type(self):
+        self.assertEqual(media_type("Application/JSON; charset=UTF-8"), "application/json")
+        self.assertEqual(media_type("text/plain"), "text/plain")
+
+
+class TestSerializerRegistry(unittest2.TestCase):
+    def test_json_round_trip(self):
+        registry = SerializerRegistry()
+        data = registry.serialize({"a": [1, 2]}, "application/json")
+        self.assertEqual(json.loads(data), {"a": [1, 2]})
+        self.assertEqual(registry.deserialize(data, "application/json"), {"a": [1, 2]})
+
+    def test_marshal_is_opt_in(self):
+        registry = SerializerRegistry()
+        self.assertEqual(registry.deserialize("\x00", "application/x-python-marshal"), "\x00")
+
+        registry.add("application/x-python-marshal", marshal.dumps, marshal.loads)
+        value = {"a": [1, 2.5, None], "b": (u"c", "d")}
+        data = registry.serialize(value, "application/x-python-marshal")
+        self.assertEqual(registry.deserialize(data, "application/x-python-marshal"), value)
+
+    def test_parameters_and_case_are_ignored(self):
+        registry = SerializerRegistry()
+        self.assertEqual(
+            registry.deserialize('{"a": 1}', "Application/JSON; charset=utf-8"), {"a": 1},
+        )
+        self.assertEqual(registry.serializer_for("application/json;charset=utf-8"), json.dumps)
+
+    def test_structured_suffix_falls_back_to_base_format(self):
+        registry = SerializerRegistry()
+        self.assertEqual(registry.deserializer_for("application/vnd.example+json"), json.loads)
+
+    def test_unknown_content_type_uses_str(self):
+        registry = SerializerRegistry()
+        self.assertEqual(registry.serializer_for("text/plain"), str)
+        self.assertEqual(registry.serialize(5, "application/unknown"), "5")
+
+    def test_without_defaults(self):
+        registry = SerializerRegistry(defaults=False)
+        self.assertEqual(registry.deserializer_for("application/json"), str)
+
+    def test_exact_registration_wins_over_parameters(self):
+        registry = SerializerRegistry()
+        latin1 = mock.Mock()
+        registry.add_deserializer("application/json; charset=latin-1", latin1)
+        self.assertEqual(registry.deserializer_for("application/json; charset=latin-1"), latin1)
+        self.assertEqual(registry.deserializer_for("application/json; charset=utf-8"), json.loads)
+
+    def test_resolution_is_cached_and_invalidated(self):
+        registry = SerializerRegistry()
+        registry.deserializer_for("application/test; v=1")
+        self.assertEqual(registry._resolved_deserializers, {"application/test; v=1": str})
+
+        deserializer = mock.Mock()
+        registry.add_deserializer("application/test", deserializer)
+        self.assertEqual(registry.deserializer_for("application/test; v=1"), deserializer)
+
+    def test_resolution_cache_is_bounded(self):
+        registry = SerializerRegistry()
+        for index in xrange(serializers.MAX_RESOLVED + 10):
+            registry.serializer_for("text/plain; id=%d" % index)
+        self.assertLessEqual(len(registry._resolved_serializers), serializers.MAX_RESOLVED)
+
+    @unittest2.skipIf(serializers.msgpack is None, "msgpack is not installed")
+    def test_msgpack_round_trip(self):
+        registry = SerializerRegistry()
+        data = registry.serialize([1, 2, 3], "application/msgpack")
+        self.assertEqual(registry.deserialize(data, "application/x-msgpack"), [1, 2, 3])
+
+
+class TestLazyValue(unittest2.TestCase):
+    def test_deserializes_once_on_access(self):
+        deserializer = mock.Mock(return_value={"a": 1})
+        value = LazyValue('{"a": 1}', "application/json", deserializer)
+        self.assertFalse(value.loaded)
+        self.assertEqual(value.size, 8)
+        self.assertFalse(deserializer.called)
+
+        self.assertEqual(value.value, {"a": 1})
+        self.assertEqual(value.value, {"a": 1})
+        deserializer.assert_called_once_with('{"a": 1}')
+        self.assertTrue(value.loaded)
+
+    def test_empty_value_is_truthy(self):
+        value = LazyValue("", "text/plain", str)
+        self.assertTrue(value)
+        self.assertEqual(value.size, 0)
+
+    def test_registry_lazy_uses_registered_deserializer(self):
+        value = SerializerRegistry().lazy("[1]", "application/json; charset=utf-8")
+        self.assertEqual(value.content_type, "application/json; charset=utf-8")
+        self.assertEqual(value.data, "[1]")
+        self.assertEqual(value.value, [1])
+
+
+class TestProcessDeserializer(unittest2.TestCase):
+    def setUp(self):
+        self.deserializer = ProcessDeserializer(processes=2, threshold=100)
+
+    def tearDown(self):
+        self.deserializer.close()
+
+    def test_same_results_as_serial(self):
+        registry = SerializerRegistry()
+        payloads = [json.dumps({"index": index, "padding": "x" * index * 10})
+                    for index in xrange(30)]
+        values = [registry.lazy(payload, "application/json") for payload in payloads]
+        self.assertEqual(
+            self.deserializer.deserialize_many(values),
+            [json.loads(payload) for payload in payloads],
+        )
+        self.assertIsNotNone(self.deserializer._pool)
+
+    def test_result_types_are_kept(self):
+        values = [LazyValue("x" * 200, "text/test", bytearray) for _ in xrange(3)]
+        results = self.deserializer.deserialize_many(values)
+        self.assertEqual([type(result) for result in results], [bytearray] * 3)
+        self.assertIsNotNone(self.deserializer._pool)
+
+    def test_unpicklable_deserializers_stay_in_process(self):
+        values = [LazyValue("x" * 200, "text/test", lambda data: len(data)) for _ in xrange(3)]
+        self.assertEqual(self.deserializer.deserialize_many(values), [200, 200, 200])
+        self.assertIsNone(self.deserializer._pool)
+
+    def test_small_values_stay_in_process(self):
+        values = [LazyValue("[1]", "application/json", json.loads) for _ in xrange(3)]
+        self.assertEqual(self.deserializer.deserialize_many(values), [[1], [1], [1]])
+        self.assertIsNone(self.deserializer._pool)
+
+    def test_errors_are_raised(self):
+        values = [LazyValue("{" * 200, "application/json", json.loads) for _ in xrange(2)]
+        self.assertRaises(ValueError, self.deserializer.deserialize_many, values)
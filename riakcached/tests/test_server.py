@@ -0,0 +1,144 @@
+import asyncore
+import socket
+import threading
+
+import mock
+import unittest2
+
+from riakcached.clients import RiakClient
+from riakcached.pools import Urllib3Pool
+from riakcached.server import main
+from riakcached.server import MemcachedServer
+from riakcached.server import MultiGet
+from riakcached.testing import FakeRiakServer
+
+
+class TestMemcachedServer(unittest2.TestCase):
+    def setUp(self):
+        self.riak = FakeRiakServer().start()
+        self.map = {}
+        client = RiakClient("test_bucket", pool=Urllib3Pool(base_url=self.riak.url, maxsize=4))
+        self.server = MemcachedServer(client, port=0, workers=4, map=self.map)
+        self.loop = threading.Thread(target=self.server.serve_forever, kwargs={"timeout": 0.05})
+        self.loop.daemon = True
+        self.loop.start()
+        self.sock = socket.create_connection(self.server.address)
+        self.reader = self.sock.makefile("rb")
+
+    def tearDown(self):
+        self.reader.close()
+        self.sock.close()
+        asyncore.close_all(self.map)
+        self.loop.join(1)
+        self.riak.stop()
+
+    def command(self, data, lines=1):
+        self.sock.settimeout(5)
+        self.sock.sendall(data)
+        return "".join(self.reader.readline() for _ in xrange(lines))
+
+    def test_set_and_get(self):
+        self.assertEqual(self.command("set foo 5 0 3\r\nbar\r\n"), "STORED\r\n")
+        self.assertEqual(
+            self.command("get foo missing foo\r\n", lines=5),
+            "VALUE foo 5 3\r\nbar\r\nVALUE foo 5 3\r\nbar\r\nEND\r\n",
+        )
+        stored, headers = self.riak.store.objects[("test_bucket", "foo")]
+        self.assertEqual(stored, "bar")
+        self.assertEqual(headers["Content-Type"], "application/octet-stream")
+
+    def test_multi_key_get(self):
+        for index in xrange(10):
+            self.command("set key%d 0 0 1\r\n%d\r\n" % (index, index))
+        keys = " ".join("key%d" % index for index in xrange(10))
+        response = self.command("get %s\r\n" % keys, lines=21)
+        self.assertEqual(response.count("VALUE"), 10)
+        self.assertTrue(response.endswith("VALUE key9 0 1\r\n9\r\nEND\r\n"))
+
+    def test_gets_returns_cas(self):
+        self.command("set foo 0 0 3\r\nbar\r\n")
+        value = self.command("gets foo\r\n", lines=3).splitlines()[0].split()
+        self.assertEqual(value[:4], ["VALUE", "foo", "0", "3"])
+        self.assertTrue(value[4].isdigit())
+
+    def test_pipelined_commands_run_in_order(self):
+        self.assertEqual(
+            self.command("set a 0 0 1 noreply\r\n1\r\ndelete a\r\nget a\r\nadd a 0 0 1\r\n2\r\n"
+                         "add a 0 0 1\r\n3\r\n", lines=4),
+            "DELETED\r\nEND\r\nSTORED\r\nNOT_STORED\r\n",
+        )
+
+    def test_incr_and_decr(self):
+        self.assertEqual(self.command("incr counter 5\r\n"), "NOT_FOUND\r\n")
+        self.command("set counter 7 0 1\r\n5\r\n")
+        self.assertEqual(self.command("incr counter 5\r\n"), "10\r\n")
+        self.assertEqual(self.command("decr counter 2\r\n"), "8\r\n")
+        self.assertEqual(self.command("decr counter 20\r\n"), "0\r\n")
+        self.assertEqual(
+            self.command("get counter\r\n", lines=3), "VALUE counter 7 1\r\n0\r\nEND\r\n",
+        )
+        self.assertEqual(
+            self.command("incr counter x\r\n"), "CLIENT_ERROR invalid numeric delta argument\r\n",
+        )
+
+    def test_incr_wraps_and_rejects_non_numeric_values(self):
+        self.command("set counter 0 0 20\r\n18446744073709551615\r\n")
+        self.assertEqual(self.command("incr counter 2\r\n"), "1\r\n")
+        self.command("set text 0 0 3\r\nabc\r\n")
+        self.assertEqual(
+            self.command("incr text 1\r\n"),
+            "CLIENT_ERROR cannot increment or decrement non-numeric value\r\n",
+        )
+
+    def test_incr_retries_concurrent_updates(self):
+        self.command("set counter 0 0 1\r\n1\r\n")
+        set_raw = RiakClient.set_raw
+        calls = []
+
+        def racing_set_raw(client, *args, **kwargs):
+            if not calls:
+                # another client updates the value between the read and the write
+                calls.append(set_raw(client, "counter", "5"))
+            return set_raw(client, *args, **kwargs)
+
+        with mock.patch.object(RiakClient, "set_raw", autospec=True, side_effect=racing_set_raw):
+            self.assertEqual(self.command("incr counter 1\r\n"), "6\r\n")
+
+    def test_errors(self):
+        self.assertEqual(self.command("bogus\r\n"), "ERROR\r\n")
+        self.assertEqual(self.command("get\r\n"), "CLIENT_ERROR bad command line format\r\n")
+        self.assertEqual(
+            self.command("set foo 0 0 1\r\ntoolong\r\n"), "CLIENT_ERROR bad data chunk\r\n",
+        )
+
+    def test_stats(self):
+        self.command("get foo\r\n")
+        stats = self.command("stats\r\n")
+        while not stats.endswith("END\r\n"):
+            stats += self.reader.readline()
+        self.assertIn("STAT cmd_get 1\r\n", stats)
+        self.assertIn("STAT get_misses 1\r\n", stats)
+
+
+class TestMultiGet(unittest2.TestCase):
+    def test_keys_are_shared_between_workers(self):
+        fetched = []
+        multiget = MultiGet(lambda key: fetched.append(key) or key.upper(), ["a", "b", "c"])
+        self.assertIsNone(multiget.run())
+        self.assertEqual(multiget.wait(), ["A", "B", "C"])
+        self.assertEqual(fetched, ["a", "b", "c"])
+
+    def test_errors_are_raised(self):
+        def fetch(key):
+            raise ValueError(key)
+
+        self.assertRaises(ValueError, MultiGet(fetch, ["a", "b"]).wait)
+
+
+class TestMain(unittest2.TestCase):
+    @mock.patch("riakcached.server.MemcachedServer")
+    @mock.patch("riakcached.server.Urllib3Pool")
+    def test_pool_sized_for_workers(self, pool, server):
+        main(["--workers", "4", "--get-concurrency", "8"])
+        self.assertEqual(pool.call_args[1]["maxsize"], 4)
+        server.return_value.serve_forever.assert_called_once_with()
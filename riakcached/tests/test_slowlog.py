@@ -0,0 +1,95 @@
+import json
+import StringIO
+
+import mock
+import unittest2
+
+from riakcached import exceptions
+from riakcached.clients import RiakClient
+from riakcached.clients import ThreadedRiakClient
+from riakcached.pools import Pool
+from riakcached.pools import Urllib3Pool
+from riakcached.slowlog import SlowLog
+from riakcached.testing import FakeRiakServer
+
+
+class TestSlowLog(unittest2.TestCase):
+    def setUp(self):
+        self.riak = FakeRiakServer(latency=0.05).start()
+
+    def tearDown(self):
+        self.riak.stop()
+
+    def client(self, slow_log, cls=RiakClient):
+        pool = Urllib3Pool(base_url=self.riak.url, maxsize=10, tracer=slow_log)
+        return cls("bucket", pool=pool, tracer=slow_log)
+
+    def test_slow_operation(self):
+        slow_log = SlowLog(threshold=0.01, sample_rate=0)
+        client = self.client(slow_log)
+        client.set("key", "value")
+        client.get("key")
+
+        record = slow_log.records()[-1]
+        self.assertEqual(record["operation"], "riakcached.get")
+        self.assertEqual((record["bucket"], record["key"]), ("bucket", "key"))
+        self.assertTrue(record["slow"])
+        self.assertIsNone(record["error"])
+        self.assertEqual(record["requests"], 1)
+        self.assertEqual(record["statuses"], [200])
+        self.assertEqual(record["nodes"], [self.riak.url])
+        self.assertEqual((record["request_size"], record["response_size"]), (0, 5))
+        timings = record["timings"]
+        self.assertGreaterEqual(timings["requests"], 0.05)
+        self.assertAlmostEqual(timings["requests"] + timings["client"], record["duration"])
+
+    def test_fast_operations_are_sampled(self):
+        slow_log = SlowLog(threshold=10, sample_rate=0)
+        client = self.client(slow_log)
+        client.get("missing")
+        self.assertEqual(slow_log.records(), [])
+
+        slow_log.sample_rate = 1
+        client.get("missing")
+        record, = slow_log.records()
+        self.assertFalse(record["slow"])
+        self.assertEqual(record["statuses"], [404])
+
+    def test_many_operation(self):
+        slow_log = SlowLog(threshold=0, sample_rate=0)
+        client = self.client(slow_log, ThreadedRiakClient)
+        client.set_many({"a": "1", "b": "22"})
+        record, = slow_log.records()
+        self.assertEqual(record["operation"], "riakcached.set_many")
+        self.assertIsNone(record["key"])
+        self.assertEqual(record["keys"], 2)
+        self.assertEqual(record["requests"], 2)
+        self.assertEqual(record["request_size"], 3)
+
+    def test_ring_buffer_and_dump(self):
+        slow_log = SlowLog(threshold=0, maxsize=2)
+        client = self.client(slow_log)
+        for key in ("first", "second", "third"):
+            client.get(key)
+        output = StringIO.StringIO()
+        self.assertEqual(slow_log.dump(output), 2)
+        keys = [json.loads(line)["key"] for line in output.getvalue().splitlines()]
+        self.assertEqual(keys, ["second", "third"])
+
+    def test_logger(self):
+        logger = mock.Mock()
+        slow_log = SlowLog(threshold=0, logger=logger)
+        self.client(slow_log).get("key\xff")
+        message, record = logger.warning.call_args[0]
+        self.assertEqual(json.loads(record)["key"], u"key\ufffd")
+
+    def test_error(self):
+        pool = mock.Mock(spec=Pool)
+        pool.url = "http://127.0.0.1:8098"
+        pool.request.side_effect = exceptions.RiakcachedTimeout("timed out")
+        slow_log = SlowLog(threshold=0)
+        client = RiakClient("bucket", pool=pool, tracer=slow_log)
+        self.assertRaises(exceptions.RiakcachedTimeout, client.get, "key")
+        record, = slow_log.records()
+        self.assertEqual(record["error"], "timed out")
+        self.assertEqual(record["requests"], 0)
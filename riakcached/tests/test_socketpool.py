@@ -0,0 +1,183 @@
+import os
+import re
+import socket
+import threading
+
+import mock
+import unittest2
+
+from riakcached import exceptions
+from riakcached.clients import RiakClient
+from riakcached.pools import SocketPool
+from riakcached.testing import FakeRiakServer
+
+
+class TestSocketPool(unittest2.TestCase):
+    def setUp(self):
+        self.riak = FakeRiakServer().start()
+        self.pool = SocketPool(base_url=self.riak.url, maxsize=2)
+
+    def tearDown(self):
+        self.pool.close()
+        self.riak.stop()
+
+    def test_request(self):
+        status, data, headers = self.pool.request(
+            "POST", self.riak.url + "/buckets/b/keys/k", body="value",
+            headers={"Content-Type": "text/plain", "X-Riak-Meta-Flags": "1"},
+        )
+        self.assertEqual((status, data), (204, ""))
+        status, data, headers = self.pool.request("GET", self.riak.url + "/buckets/b/keys/k")
+        self.assertEqual((status, data), (200, "value"))
+        self.assertEqual(headers["content-type"], "text/plain")
+        self.assertEqual(headers["x-riak-meta-flags"], "1")
+
+    def test_head_has_no_body(self):
+        self.pool.request("POST", self.riak.url + "/buckets/b/keys/k", body="value")
+        status, data, headers = self.pool.request("HEAD", self.riak.url + "/buckets/b/keys/k")
+        self.assertEqual((status, data, headers["content-length"]), (200, "", "5"))
+        self.assertEqual(self.pool.request("GET", self.riak.url + "/ping")[:2], (200, "OK"))
+
+    def test_large_body(self):
+        value = os.urandom(300000)
+        self.pool.request("POST", self.riak.url + "/buckets/b/keys/big", body=value)
+        self.assertEqual(self.pool.request("GET", self.riak.url + "/buckets/b/keys/big")[1], value)
+
+    def test_connections_are_reused(self):
+        for _ in xrange(3):
+            self.assertEqual(self.pool.request("GET", self.riak.url + "/ping")[0], 200)
+        self.assertEqual(self.pool.metrics(), {"in_use": 0, "idle": 1})
+
+    def test_stale_connection_is_replaced(self):
+        self._break_idle_connection()
+        self.assertEqual(self.pool.request("POST", self.riak.url + "/buckets/b/counters/c",
+                                           body="1")[0], 204)
+
+    def _break_idle_connection(self):
+        self.pool.request("GET", self.riak.url + "/ping")
+        conn = [conn for conn in self.pool.connections.queue if conn is not None][0]
+        local, remote = socket.socketpair()
+        remote.close()
+        conn.sock.close()
+        conn.sock = local
+
+    @mock.patch("riakcached.pools.SocketConnection.is_dropped")
+    def test_undetected_stale_connection_retries_idempotent_requests(self, is_dropped):
+        is_dropped.return_value = False
+        self._break_idle_connection()
+        self.assertEqual(self.pool.request("GET", self.riak.url + "/ping")[0], 200)
+
+    @mock.patch("riakcached.pools.SocketConnection.is_dropped")
+    def test_undetected_stale_connection_does_not_retry_posts(self, is_dropped):
+        is_dropped.return_value = False
+        self._break_idle_connection()
+        self.assertRaises(exceptions.RiakcachedConnectionError, self.pool.request, "POST",
+                          self.riak.url + "/buckets/b/counters/c", body="1")
+        self.assertEqual(self.pool.request("GET", self.riak.url + "/buckets/b/counters/c")[0],
+                         404)
+
+    def test_request_stream_chunked(self):
+        for index in xrange(250):
+            self.pool.request("POST", self.riak.url + "/buckets/b/keys/key%d" % index, body="v")
+        status, stream, headers = self.pool.request_stream(
+            "GET", self.riak.url + "/buckets/b/keys?keys=stream",
+        )
+        self.assertEqual(headers["transfer-encoding"], "chunked")
+        with stream:
+            data = "".join(iter(lambda: stream.read(7), ""))
+        self.assertEqual(len(re.findall(r'"key\d+"', data)), 250)
+        self.assertEqual(self.pool.metrics()["idle"], 1)
+
+    def test_request_stream_readinto(self):
+        value = os.urandom(100000)
+        status, stream, _ = self.pool.request_stream(
+            "POST", self.riak.url + "/buckets/b/keys/big", body=iter([value[:10], value[10:]]),
+        )
+        stream.close()
+        self.assertEqual(status, 204)
+        status, stream, _ = self.pool.request_stream("GET", self.riak.url + "/buckets/b/keys/big")
+        target = bytearray(len(value))
+        view = memoryview(target)
+        received = 0
+        with stream:
+            while received < len(target):
+                received += stream.readinto(view[received:])
+            self.assertEqual(stream.readinto(bytearray(10)), 0)
+        self.assertEqual(str(target), value)
+
+    def test_unread_stream_closes_connection(self):
+        self.pool.request("POST", self.riak.url + "/buckets/b/keys/k", body="value")
+        _, stream, _ = self.pool.request_stream("GET", self.riak.url + "/buckets/b/keys/k")
+        stream.read(2)
+        stream.close()
+        self.assertEqual(self.pool.metrics(), {"in_use": 0, "idle": 0})
+
+    def test_waits_for_free_connection(self):
+        pool = SocketPool(base_url=self.riak.url, maxsize=1, pool_timeout=0.05)
+        _, stream, _ = pool.request_stream("GET", self.riak.url + "/ping")
+        self.assertRaises(exceptions.RiakcachedTimeout, pool.request, "GET",
+                          self.riak.url + "/ping")
+        stream.close()
+        self.assertEqual(pool.request("GET", self.riak.url + "/ping")[0], 200)
+
+    def test_reset_with_request_in_flight(self):
+        _, stream, _ = self.pool.request_stream("GET", self.riak.url + "/ping")
+        self.pool.reset()
+        closer = threading.Thread(target=stream.close)
+        closer.daemon = True
+        closer.start()
+        closer.join(1)
+        self.assertFalse(closer.is_alive())
+        self.assertEqual(self.pool.metrics(), {"in_use": 0, "idle": 0})
+        self.assertEqual(self.pool.request("GET", self.riak.url + "/ping")[:2], (200, "OK"))
+
+    def test_concurrent_requests(self):
+        results = []
+
+        def worker():
+            for _ in xrange(20):
+                results.append(self.pool.request("GET", self.riak.url + "/ping")[1])
+
+        threads = [threading.Thread(target=worker) for _ in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["OK"] * 80)
+        self.assertLessEqual(self.pool.metrics()["idle"], 2)
+
+    def test_connection_error(self):
+        self.riak.stop()
+        pool = SocketPool(base_url=self.riak.url)
+        self.assertRaises(exceptions.RiakcachedConnectionError, pool.request, "GET",
+                          self.riak.url + "/ping")
+        self.riak = FakeRiakServer().start()
+
+    def test_timeout(self):
+        riak = FakeRiakServer(latency=0.2).start()
+        try:
+            pool = SocketPool(base_url=riak.url, timeout=0.05)
+            self.assertRaises(exceptions.RiakcachedTimeout, pool.request, "GET",
+                              riak.url + "/ping")
+            self.assertEqual(pool.metrics()["in_use"], 0)
+        finally:
+            riak.stop()
+
+    @mock.patch("riakcached.pools.os.getpid")
+    def test_reconnects_after_fork(self, getpid):
+        getpid.return_value = os.getpid() + 1
+        connections = self.pool.connections
+        self.pool.request("GET", self.riak.url + "/ping")
+        self.assertIsNot(self.pool.connections, connections)
+
+    def test_only_http(self):
+        self.assertRaises(ValueError, SocketPool, base_url="https://127.0.0.1:8098")
+
+    def test_client(self):
+        client = RiakClient("bucket", pool=self.pool, reap_expired=False)
+        self.assertTrue(client.set("key", {"a": 1}, content_type="application/json"))
+        self.assertEqual(client.get("key"), {"a": 1})
+        self.assertEqual(client.keys(), {"keys": ["key"]})
+        self.assertEqual(list(client.iter_keys()), ["key"])
+        self.assertTrue(client.delete("key"))
+        self.assertIsNone(client.get("key"))
@@ -0,0 +1,93 @@
+import json
+import time
+
+import mock
+import unittest2
+
+from riakcached import exceptions
+from riakcached.pools import Pool
+from riakcached.pools import Urllib3Pool
+from riakcached.stats import is_counter
+from riakcached.stats import StatsCollector
+from riakcached.testing import FakeRiakServer
+
+
+def node_pool(url, *responses):
+    pool = mock.Mock(spec=Pool)
+    pool.url = url
+    pool.metrics.return_value = {"connections": 1}
+    pool.request.side_effect = [
+        response if isinstance(response, Exception) else (200, json.dumps(response), {})
+        for response in responses
+    ]
+    return pool
+
+
+class TestIsCounter(unittest2.TestCase):
+    def test_is_counter(self):
+        self.assertTrue(is_counter("node_gets_total"))
+        self.assertFalse(is_counter("node_gets"))
+        self.assertFalse(is_counter("node_get_fsm_time_99"))
+
+
+class TestStatsCollector(unittest2.TestCase):
+    @mock.patch("riakcached.stats.time.time")
+    def test_rates_and_cluster_view(self, now):
+        first = node_pool(
+            "http://riak1:8098",
+            {"node_gets_total": 100, "node_get_fsm_time_99": 10, "nodename": "riak1"},
+            {"node_gets_total": 150, "node_get_fsm_time_99": 30, "nodename": "riak1"},
+        )
+        second = node_pool(
+            "http://riak2:8098",
+            {"node_gets_total": 10, "node_get_fsm_time_99": 20},
+            {"node_gets_total": 30, "node_get_fsm_time_99": 5},
+        )
+        collector = StatsCollector([first, second])
+        now.return_value = 1000.0
+        collector.poll()
+        now.return_value = 1010.0
+        snapshot = collector.poll()
+
+        first.request.assert_called_with(method="GET", url="http://riak1:8098/stats")
+        node = snapshot["nodes"]["http://riak1:8098"]
+        self.assertEqual(node["deltas"], {"node_gets_total": 50})
+        self.assertEqual(node["rates"], {"node_gets_total": 5.0})
+        cluster = snapshot["cluster"]
+        self.assertEqual((cluster["nodes"], cluster["available"]), (2, 2))
+        self.assertEqual(cluster["totals"], {"node_gets_total": 180})
+        self.assertEqual(cluster["rates"], {"node_gets_total": 7.0})
+        self.assertEqual(cluster["max"], {"node_get_fsm_time_99": 30})
+        self.assertEqual(snapshot["pools"]["http://riak2:8098"], {"connections": 1})
+
+    def test_unavailable_node(self):
+        first = node_pool("http://riak1:8098", {"node_gets_total": 1})
+        second = node_pool("http://riak2:8098", exceptions.RiakcachedTimeout("timed out"))
+        snapshot = StatsCollector([first, second]).poll()
+        self.assertEqual(snapshot["nodes"]["http://riak2:8098"]["error"], "timed out")
+        self.assertIsNone(snapshot["nodes"]["http://riak2:8098"]["stats"])
+        self.assertEqual(snapshot["cluster"]["available"], 1)
+        self.assertEqual(snapshot["cluster"]["totals"], {"node_gets_total": 1})
+
+    def test_restarted_node_counters_are_skipped(self):
+        pool = node_pool("http://riak1:8098", {"node_gets_total": 100}, {"node_gets_total": 3})
+        collector = StatsCollector([pool])
+        collector.poll()
+        self.assertEqual(collector.poll()["nodes"]["http://riak1:8098"]["rates"], {})
+
+    def test_snapshot_is_cached(self):
+        pool = node_pool("http://riak1:8098", {"node_gets_total": 1})
+        collector = StatsCollector([pool])
+        self.assertIs(collector.snapshot(), collector.snapshot())
+        self.assertEqual(pool.request.call_count, 1)
+
+    def test_polls_in_background(self):
+        with FakeRiakServer() as riak:
+            with StatsCollector([Urllib3Pool(base_url=riak.url)], interval=0.05) as collector:
+                first = collector.snapshot()
+                time.sleep(0.3)
+                latest = collector.snapshot()
+        self.assertGreater(latest["time"], first["time"])
+        node = latest["nodes"][riak.url]
+        self.assertIn("node_gets_total", node["rates"])
+        self.assertEqual(latest["pools"][riak.url]["idle"], 1)
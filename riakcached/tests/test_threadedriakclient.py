@@ -1,3 +1,5 @@
+import json
+
 import mock
 import unittest2
 
@@ -71,3 +73,40 @@ class TestThreadedRiakClient(unittest2.TestCase):
             method="DELETE",
             url="http://127.0.0.1:8098/buckets/test_bucket/keys/test2",
         )
+
+    def test_get_many_skips_negative_cached_keys(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 200, "result", {"content-type": "text/plain"}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = ThreadedRiakClient("test_bucket", pool=pool, negative_cache_ttl=5)
+        client.negative_cache.set("test2", True)
+        self.assertEqual(client.get_many(["test1", "test2"]), {"test1": "result"})
+        self.assertEqual(1, pool.request.call_count)
+
+    def test_get_many_lazy(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 200, '"result"', {"content-type": "application/json"}
+        pool.url = "http://127.0.0.1:8098"
+
+        client = ThreadedRiakClient("test_bucket", pool=pool)
+        results = client.get_many(["test1", "test2"], lazy=True)
+        self.assertFalse(results["test1"].loaded)
+        self.assertEqual(results["test2"].value, "result")
+
+    def test_get_many_deserializes_in_processes(self):
+        pool = mock.Mock(spec=riakcached.pools.Pool)
+        pool.request.return_value = 200, json.dumps(["x" * 100]), {
+            "content-type": "application/json",
+        }
+        pool.url = "http://127.0.0.1:8098"
+
+        client = ThreadedRiakClient("test_bucket", pool=pool, deserializer_processes=2,
+                                    deserializer_threshold=50)
+        try:
+            results = client.get_many(["test1", "test2", "test3"])
+            self.assertEqual(results, dict.fromkeys(["test1", "test2", "test3"], ["x" * 100]))
+            self.assertIsNotNone(client.process_deserializer._pool)
+        finally:
+            client.close()
+        pool.close.assert_called_once_with()
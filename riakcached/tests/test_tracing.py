@@ -0,0 +1,221 @@
+import mock
+import unittest2
+
+from riakcached import exceptions
+from riakcached import green
+from riakcached.clients import RiakClient
+from riakcached.clients import ThreadedRiakClient
+from riakcached.policies import PolicyPool
+from riakcached.pools import Pool
+from riakcached.pools import Urllib3Pool
+from riakcached.testing import FakeRiakServer
+from riakcached import tracing
+
+
+class TestSpanTags(unittest2.TestCase):
+    def test_key_hash(self):
+        self.assertEqual(tracing.key_hash("key"), "8a90aba9")
+        self.assertEqual(tracing.key_hash(u"k\xe9y"), tracing.key_hash("k\xc3\xa9y"))
+
+    def test_span_tags(self):
+        tags = tracing.span_tags("bucket", "key", {"other": 1})
+        self.assertEqual(tags, {
+            "other": 1, "riak.bucket": "bucket", "riak.key_hash": tracing.key_hash("key"),
+        })
+        self.assertEqual(tracing.span_tags("bucket", ["a", "b"], {})["riak.keys"], 2)
+        self.assertEqual(tracing.span_tags(None, None, {}), {})
+
+
+class TestNoopTracer(unittest2.TestCase):
+    def test_span_is_shared(self):
+        with tracing.NOOP_TRACER.span("riakcached.get", "bucket", "key") as span:
+            span.set_tag("name", "value")
+            span.set_request("GET", "http://127.0.0.1:8098", None, 200, "data")
+        self.assertIs(span, tracing.NOOP_SPAN)
+
+    def test_wrap_returns_function(self):
+        func = lambda: None
+        self.assertIs(tracing.NOOP_TRACER.wrap(func), func)
+
+    def test_client_and_pool_default(self):
+        pool = Urllib3Pool(auto_connect=False)
+        self.assertIs(pool.tracer, tracing.NOOP_TRACER)
+        self.assertIs(RiakClient("bucket", pool=pool).tracer, tracing.NOOP_TRACER)
+
+
+class TestRecordingTracer(unittest2.TestCase):
+    def setUp(self):
+        self.tracer = tracing.RecordingTracer()
+
+    def test_nested_spans(self):
+        with self.tracer.span("parent") as parent:
+            with self.tracer.span("child", "bucket", "key") as child:
+                child.set_tag("name", "value")
+        self.assertIsNone(self.tracer.active())
+        self.assertEqual(self.tracer.spans(), [child, parent])
+        self.assertIs(child.parent, parent)
+        self.assertEqual(child.trace_id, parent.trace_id)
+        self.assertEqual(child.tags["name"], "value")
+        self.assertGreaterEqual(parent.duration, child.duration)
+        self.assertEqual(child.to_dict()["parent_id"], parent.span_id)
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            with self.tracer.span("failing"):
+                raise ValueError("failed")
+        span = self.tracer.spans()[0]
+        self.assertTrue(span.tags["error"])
+        self.assertIsInstance(span.error, ValueError)
+
+    def test_maxsize(self):
+        tracer = tracing.RecordingTracer(maxsize=2)
+        for name in ("first", "second", "third"):
+            with tracer.span(name):
+                pass
+        self.assertEqual([span.name for span in tracer.spans()], ["second", "third"])
+        tracer.clear()
+        self.assertEqual(tracer.spans(), [])
+
+    def test_wrap(self):
+        with self.tracer.span("parent") as parent:
+            wrapped = self.tracer.wrap(lambda: self.tracer.active())
+        self.assertIs(wrapped(), parent)
+        self.assertIsNone(self.tracer.active())
+
+
+class TestTracedClient(unittest2.TestCase):
+    def setUp(self):
+        self.riak = FakeRiakServer().start()
+        self.tracer = tracing.RecordingTracer()
+        self.pool = Urllib3Pool(base_url=self.riak.url, maxsize=10, tracer=self.tracer)
+
+    def tearDown(self):
+        self.pool.close()
+        self.riak.stop()
+
+    def test_operation_and_request_spans(self):
+        client = RiakClient("bucket", pool=self.pool, tracer=self.tracer)
+        client.set("key", "value")
+        self.tracer.clear()
+        self.assertEqual(client.get("key"), "value")
+
+        request, get = self.tracer.spans()
+        self.assertEqual([request.name, get.name], ["riakcached.request", "riakcached.get"])
+        self.assertIs(request.parent, get)
+        self.assertEqual(get.tags["riak.bucket"], "bucket")
+        self.assertEqual(get.tags["riak.key_hash"], tracing.key_hash("key"))
+        self.assertEqual(request.tags["http.method"], "GET")
+        self.assertEqual(request.tags["http.status_code"], 200)
+        self.assertEqual(request.tags["riak.node"], self.riak.url)
+        self.assertEqual(request.tags["riak.request_size"], 0)
+        self.assertEqual(request.tags["riak.response_size"], len("value"))
+
+    def test_every_operation_has_a_span(self):
+        client = RiakClient("bucket", pool=self.pool, tracer=self.tracer)
+        client.set("user:1", "value")
+        client.set("user:2", "value")
+        self.tracer.clear()
+
+        client.stats()
+        client.props()
+        client.set_props({"props": {"n_val": 2}})
+        client.keys()
+        self.assertEqual(sorted(client.iter_keys()), ["user:1", "user:2"])
+        self.assertEqual(len(list(client.scan(window=1))), 2)
+        self.assertEqual(len(list(client.scan(prefix="user:"))), 2)
+        client.ping()
+        client.is_expired("user:1")
+
+        operations = [span for span in self.tracer.spans() if span.parent is None]
+        self.assertEqual([span.name for span in operations], [
+            "riakcached.stats", "riakcached.props", "riakcached.set_props", "riakcached.keys",
+            "riakcached.iter_keys", "riakcached.iter_keys", "riakcached.scan", "riakcached.scan",
+            "riakcached.scan", "riakcached.scan", "riakcached.ping", "riakcached.is_expired",
+        ])
+        for span in operations:
+            self.assertEqual(span.tags["riak.bucket"], "bucket")
+        self.assertEqual(operations[-1].tags["riak.key_hash"], tracing.key_hash("user:1"))
+        # the values of a scan batch are fetched under its span
+        gets = [span for span in self.tracer.spans() if span.name == "riakcached.get"]
+        self.assertEqual(len(gets), 4)
+        for get in gets:
+            self.assertEqual(get.parent.name, "riakcached.scan")
+
+    def test_threaded_many_spans_share_trace(self):
+        client = ThreadedRiakClient("bucket", pool=self.pool, tracer=self.tracer)
+        client.set_many({"a": "1", "b": "2"})
+        set_many = self.tracer.spans()[-1]
+        self.assertEqual(set_many.name, "riakcached.set_many")
+        self.assertEqual(set_many.tags["riak.keys"], 2)
+        requests = [span for span in self.tracer.spans() if span.name == "riakcached.request"]
+        self.assertEqual(len(requests), 2)
+        for request in requests:
+            self.assertEqual(request.trace_id, set_many.trace_id)
+            self.assertEqual(request.tags["riak.request_size"], 1)
+
+
+class TestTracedPolicyPool(unittest2.TestCase):
+    @mock.patch("time.sleep")
+    def test_retries_tag(self, sleep):
+        first = mock.Mock(spec=Pool)
+        first.url = "http://127.0.0.1:8098"
+        first.timeout = 2
+        first.request.side_effect = [exceptions.RiakcachedTimeout("timed out"), (200, "", {})]
+        tracer = tracing.RecordingTracer()
+        pool = PolicyPool([first], hedge_percentile=None, tracer=tracer)
+        self.assertEqual(pool.request("GET", "http://127.0.0.1:8098/ping")[0], 200)
+        span, = tracer.spans()
+        self.assertEqual(span.name, "riakcached.policy")
+        self.assertEqual(span.tags["riak.retries"], 1)
+
+
+class TestOpenTracingTracer(unittest2.TestCase):
+    def setUp(self):
+        self.opentracing = mock.MagicMock()
+        self.scope = self.opentracing.start_active_span.return_value
+        self.tracer = tracing.OpenTracingTracer(self.opentracing)
+
+    def test_span(self):
+        with self.tracer.span("riakcached.get", "bucket", "key") as span:
+            span.set_tag("name", "value")
+        self.opentracing.start_active_span.assert_called_once_with(
+            "riakcached.get", tags=tracing.span_tags("bucket", "key", {}), finish_on_close=True,
+        )
+        self.scope.span.set_tag.assert_called_once_with("name", "value")
+        self.scope.close.assert_called_once_with()
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            with self.tracer.span("riakcached.get"):
+                raise ValueError("failed")
+        self.scope.span.set_tag.assert_called_once_with("error", True)
+        self.scope.close.assert_called_once_with()
+
+    def test_wrap_activates_parent(self):
+        self.opentracing.active_span = None
+        func = mock.Mock()
+        self.assertIs(self.tracer.wrap(func), func)
+
+        parent = self.opentracing.active_span = mock.Mock()
+        self.tracer.wrap(func)("arg")
+        self.opentracing.scope_manager.activate.assert_called_once_with(parent, False)
+        func.assert_called_once_with("arg")
+
+
+@unittest2.skipIf(green.gevent is None, "gevent is not installed")
+class TestTracedGeventClient(unittest2.TestCase):
+    def test_greenlet_spans_share_trace(self):
+        import gevent.local
+        tracer = tracing.RecordingTracer(local=gevent.local.local())
+        with FakeRiakServer(latency=0.01) as riak:
+            pool = green.GeventPool(base_url=riak.url, tracer=tracer)
+            client = green.GeventRiakClient("bucket", pool=pool, tracer=tracer)
+            client.get_many(["key%d" % index for index in xrange(10)])
+            client.close()
+        get_many = tracer.spans()[-1]
+        self.assertEqual(get_many.name, "riakcached.get_many")
+        requests = [span for span in tracer.spans() if span.name == "riakcached.request"]
+        self.assertEqual(len(requests), 10)
+        for request in requests:
+            self.assertEqual(request.parent.parent, get_many)
+            self.assertIn("riak.pool_wait", request.tags)
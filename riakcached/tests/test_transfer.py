@@ -0,0 +1,187 @@
+import gzip
+import json
+import os
+import shutil
+import StringIO
+import tempfile
+
+import mock
+import unittest2
+
+from riakcached.clients import RiakClient
+from riakcached.pools import Urllib3Pool
+from riakcached.testing import FakeRiakServer
+from riakcached import transfer
+
+
+class TestRecords(unittest2.TestCase):
+    def test_text_value_round_trip(self):
+        record = transfer.dump_record("key", "value", {
+            "content-type": "application/json",
+            "x-riak-meta-flags": "3",
+        })
+        self.assertEqual(record, {
+            "key": "key",
+            "content_type": "application/json",
+            "value": "value",
+            "meta": {"flags": "3"},
+        })
+        self.assertEqual(
+            transfer.load_record(json.loads(json.dumps(record))),
+            ("key", "value", "application/json", {"flags": "3"}),
+        )
+
+    def test_binary_value_round_trip(self):
+        record = transfer.dump_record("key", "\xff\x00", {})
+        self.assertNotIn("value", record)
+        self.assertEqual(record["content_type"], "application/octet-stream")
+        self.assertEqual(transfer.load_record(record)[1], "\xff\x00")
+
+
+class TestBatches(unittest2.TestCase):
+    def test_batches(self):
+        self.assertEqual(list(transfer.batches(xrange(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(transfer.batches([], 2)), [])
+
+
+class TestDumpAndLoad(unittest2.TestCase):
+    def setUp(self):
+        self.riak = FakeRiakServer().start()
+        pool = Urllib3Pool(base_url=self.riak.url, maxsize=4)
+        self.source = RiakClient("source", pool=pool)
+        self.target = RiakClient("target", pool=pool)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        self.riak.stop()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def fill(self, count):
+        for index in xrange(count):
+            self.source.set("key%d" % index, {"index": index}, content_type="application/json")
+
+    def test_round_trip(self):
+        self.fill(25)
+        self.source.set_raw("binary", "\xff\xfe", "application/octet-stream", meta={"Flags": 1})
+
+        output = StringIO.StringIO()
+        progress = transfer.dump(self.source, output, workers=4, batch_size=10)
+        self.assertEqual(progress.keys, 26)
+        self.assertEqual(len(output.getvalue().splitlines()), 26)
+
+        output.seek(0)
+        progress = transfer.load(self.target, output, workers=4, batch_size=10)
+        self.assertEqual(progress.keys, 26)
+        self.assertEqual(progress.failed, 0)
+        self.assertEqual(self.target.get("key7"), {"index": 7})
+        data, headers = self.target.get_raw("binary")
+        self.assertEqual(data, "\xff\xfe")
+        self.assertEqual(headers["x-riak-meta-flags"], "1")
+
+    def test_gzipped_dump_can_be_read(self):
+        self.fill(15)
+        with open(self.path("dump.gz"), "wb") as output:
+            transfer.dump(self.source, output, batch_size=4, gzipped=True)
+        with gzip.open(self.path("dump.gz"), "rb") as dumped:
+            self.assertEqual(len(dumped.read().splitlines()), 15)
+        self.assertIsInstance(transfer.open_input(self.path("dump.gz")), gzip.GzipFile)
+
+    def test_dump_resumes_from_checkpoint(self):
+        self.fill(10)
+        checkpoint = self.path("checkpoint")
+        with open(self.path("dump"), "wb") as output:
+            transfer.dump(self.source, output, batch_size=3, checkpoint=checkpoint)
+        entries = transfer.read_checkpoint(checkpoint)
+        self.assertEqual(entries[0], {"listed": 10})
+        self.assertEqual(len(entries), 5)
+        self.assertTrue(all(set(entry) == set(["offset", "position"]) for entry in entries[1:]))
+
+        # simulate an interruption after the second batch, with a partially written batch
+        with open(checkpoint, "wb") as fp:
+            fp.write("".join(json.dumps(entry) + "\n" for entry in entries[:3]))
+            fp.write('{"offset": ')
+        with open(self.path("dump"), "ab") as output:
+            output.write('{"key": "partial"')
+
+        self.source.set("added", "later")
+        with open(self.path("dump"), "r+b") as output:
+            progress = transfer.dump(self.source, output, batch_size=3, checkpoint=checkpoint)
+        self.assertEqual(progress.keys, 4)
+        with open(self.path("dump")) as dumped:
+            keys = sorted(json.loads(line)["key"] for line in dumped)
+        self.assertEqual(keys, sorted("key%d" % index for index in xrange(10)))
+
+    def test_dump_lists_keys_again_after_interrupted_listing(self):
+        self.fill(5)
+        checkpoint = self.path("checkpoint")
+        with open(checkpoint + ".keys", "wb") as fp:
+            fp.write('"key0"\n"ke')
+        with open(self.path("dump"), "wb") as output:
+            progress = transfer.dump(self.source, output, batch_size=2, checkpoint=checkpoint)
+        self.assertEqual(progress.keys, 5)
+        self.assertEqual(transfer.read_checkpoint(checkpoint)[0], {"listed": 5})
+
+    def test_load_resumes_from_checkpoint(self):
+        lines = "".join(
+            json.dumps(transfer.dump_record("key%d" % index, str(index), {})) + "\n"
+            for index in xrange(5)
+        )
+        checkpoint = self.path("checkpoint")
+        with open(checkpoint, "wb") as fp:
+            fp.write(json.dumps({"lines": 3}) + "\n")
+
+        progress = transfer.load(
+            self.target, StringIO.StringIO(lines), batch_size=2, checkpoint=checkpoint,
+        )
+        self.assertEqual(progress.keys, 2)
+        self.assertIsNone(self.target.get("key0"))
+        self.assertEqual(self.target.get_raw("key4")[0], "4")
+        self.assertEqual(transfer.read_checkpoint(checkpoint)[-1], {"lines": 5})
+
+    def test_load_checkpoint_counts_blank_lines(self):
+        lines = [json.dumps(transfer.dump_record("key%d" % index, str(index), {})) + "\n"
+                 for index in xrange(4)]
+        checkpoint = self.path("checkpoint")
+        source = StringIO.StringIO("\n".join(lines[:2]) + "\n" + "".join(lines[2:]))
+        transfer.load(self.target, source, batch_size=2, checkpoint=checkpoint)
+        self.assertEqual(transfer.read_checkpoint(checkpoint), [{"lines": 3}, {"lines": 6}])
+
+    def test_load_reports_bad_records(self):
+        lines = "".join([
+            json.dumps(transfer.dump_record("key0", "0", {})) + "\n",
+            "{invalid\n",
+            json.dumps({"key": "key2"}) + "\n",
+            json.dumps(transfer.dump_record("key3", "3", {})) + "\n",
+        ])
+        output = StringIO.StringIO()
+        progress = transfer.load(self.target, StringIO.StringIO(lines),
+                                 progress=transfer.Progress("loaded", output=output))
+        self.assertEqual((progress.keys, progress.failed), (2, 2))
+        self.assertEqual(self.target.get_raw("key3")[0], "3")
+        errors = output.getvalue().splitlines()
+        self.assertTrue(errors[0].startswith("line 2: ValueError"))
+        self.assertTrue(errors[1].startswith("line 3: KeyError"))
+
+    def test_dump_refuses_to_resume_into_a_short_output(self):
+        self.fill(4)
+        checkpoint = self.path("checkpoint")
+        with open(self.path("dump"), "wb") as output:
+            transfer.dump(self.source, output, batch_size=2, checkpoint=checkpoint)
+        with open(self.path("dump"), "wb") as output:
+            self.assertRaises(ValueError, transfer.dump, self.source, output, checkpoint=checkpoint)
+
+    def test_dump_main_refuses_to_resume_without_output(self):
+        self.fill(2)
+        checkpoint = self.path("checkpoint")
+        with open(self.path("dump"), "wb") as output:
+            transfer.dump(self.source, output, checkpoint=checkpoint)
+        os.remove(self.path("dump"))
+        with mock.patch("sys.stderr"):
+            self.assertRaises(SystemExit, transfer.dump_main, [
+                "--riak-url", self.riak.url, "--bucket", "source", "--checkpoint", checkpoint,
+                self.path("dump"),
+            ])
+        self.assertFalse(os.path.exists(self.path("dump")))
@@ -1,9 +1,13 @@
+import os
+
 import mock
 import unittest2
 import urllib3.exceptions
 
 from riakcached import exceptions
+from riakcached.metrics import AdaptiveTimeouts
 from riakcached.pools import Urllib3Pool
+from riakcached.testing import FakeRiakServer
 
 
 class TestUrllib3Pool(unittest2.TestCase):
@@ -18,13 +22,17 @@ class TestUrllib3Pool(unittest2.TestCase):
         pool = Urllib3Pool()
         self.assertTrue(pool.pool)
         self.connection_from_url.assert_called()
-        self.connection_from_url.assert_called_with("http://127.0.0.1:8098")
+        self.connection_from_url.assert_called_with("http://127.0.0.1:8098", maxsize=1)
 
     def test_connect_with_different_url(self):
         pool = Urllib3Pool(base_url="http://example.org:8098")
         self.assertEqual(pool.url, "http://example.org:8098")
         self.connection_from_url.assert_called()
-        self.connection_from_url.assert_called_with("http://example.org:8098")
+        self.connection_from_url.assert_called_with("http://example.org:8098", maxsize=1)
+
+    def test_connect_with_maxsize(self):
+        Urllib3Pool(maxsize=10)
+        self.connection_from_url.assert_called_with("http://127.0.0.1:8098", maxsize=10)
 
     def test_connect_auto_connect_doesnt_call_connect(self):
         Urllib3Pool(auto_connect=False)
@@ -98,3 +106,110 @@ class TestUrllib3Pool(unittest2.TestCase):
             "GET",
             "http://127.0.0.1:8098/stats",
         )
+
+    def test_request_stream_does_not_preload(self):
+        pool = Urllib3Pool()
+        result = mock.Mock()
+        result.status = 200
+        result.getheaders = lambda: {}
+        pool.pool.urlopen.return_value = result
+        status, stream, headers = pool.request_stream(
+            "GET", "http://127.0.0.1:8098/buckets/b/keys/k",
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(stream.response, result)
+        pool.pool.urlopen.assert_called_with(
+            method="GET",
+            url="http://127.0.0.1:8098/buckets/b/keys/k",
+            headers=None,
+            timeout=2,
+            redirect=False,
+            preload_content=False,
+        )
+
+    @mock.patch("urllib3.response.HTTPResponse.from_httplib")
+    def test_request_stream_sends_chunked_body(self, from_httplib):
+        pool = Urllib3Pool()
+        conn = pool.pool._get_conn.return_value
+        from_httplib.return_value.status = 204
+        from_httplib.return_value.getheaders = lambda: {}
+        status, _, _ = pool.request_stream(
+            "POST", "http://127.0.0.1:8098/buckets/b/keys/k", body=iter(["abc", "de"]),
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        self.assertEqual(status, 204)
+        conn.putheader.assert_any_call("Content-Type", "application/octet-stream")
+        conn.putheader.assert_any_call("Transfer-Encoding", "chunked")
+        sent = "".join(call[0][0] for call in conn.send.call_args_list)
+        self.assertEqual(sent, "3\r\nabc\r\n2\r\nde\r\n0\r\n\r\n")
+        from_httplib.assert_called_with(
+            conn.getresponse.return_value, pool=pool.pool, connection=conn, preload_content=False,
+        )
+
+    def test_request_uses_adaptive_timeouts(self):
+        timeouts = AdaptiveTimeouts(min_samples=1, read_floor=0.01, connect_floor=0.01)
+        timeouts.observe("http://127.0.0.1:8098", "ping", 0.05)
+        pool = Urllib3Pool(adaptive_timeouts=timeouts)
+        result = mock.Mock()
+        result.status = 200
+        result.data = "OK"
+        result.getheaders = lambda: {}
+        pool.pool.urlopen.return_value = result
+        pool.request("GET", "http://127.0.0.1:8098/ping")
+        self.assertEqual(pool.pool.urlopen.call_args[1]["timeout"], 0.1)
+        self.assertEqual(len(timeouts._windows[("http://127.0.0.1:8098", "ping")]), 2)
+
+    @mock.patch("riakcached.pools.os.getpid")
+    def test_request_after_fork_reconnects(self, getpid):
+        getpid.return_value = 100
+        pool = Urllib3Pool()
+        inherited = pool.pool
+        getpid.return_value = 101
+        pool.request("GET", "http://127.0.0.1:8098/ping")
+        inherited.close.assert_called_once_with()
+        self.assertEqual(self.connection_from_url.call_count, 2)
+
+    def test_reset_reconnects(self):
+        pool = Urllib3Pool()
+        inherited = pool.pool
+        pool.reset()
+        inherited.close.assert_called_once_with()
+        self.assertEqual(self.connection_from_url.call_count, 2)
+
+    def test_connect_warms_up(self):
+        conn = mock.Mock()
+        conn.sock = None
+        self.connection_from_url.return_value._get_conn.return_value = conn
+        pool = Urllib3Pool(maxsize=3, warm=5)
+        self.assertEqual(conn.connect.call_count, 3)
+        self.assertEqual(pool.pool._put_conn.call_count, 3)
+
+
+class TestUrllib3PoolFork(unittest2.TestCase):
+    def setUp(self):
+        self.riak = FakeRiakServer().start()
+
+    def tearDown(self):
+        self.riak.stop()
+
+    def test_warm_connections_are_opened(self):
+        pool = Urllib3Pool(base_url=self.riak.url, maxsize=2, warm=2)
+        self.assertEqual(pool.pool.num_connections, 2)
+        self.assertEqual(pool.request("GET", self.riak.url + "/ping")[0], 200)
+        self.assertEqual(pool.pool.num_connections, 2)
+
+    def test_child_does_not_use_parent_connections(self):
+        pool = Urllib3Pool(base_url=self.riak.url, warm=1)
+        inherited = pool.pool
+        pid = os.fork()
+        if not pid:
+            status = 1
+            try:
+                if pool.request("GET", self.riak.url + "/ping")[0] == 200:
+                    status = 0 if pool.pool is not inherited else 2
+            finally:
+                os._exit(status)
+        self.assertEqual(os.waitpid(pid, 0)[1], 0)
+        self.assertIs(pool.pool, inherited)
+        self.assertEqual(pool.request("GET", self.riak.url + "/ping")[0], 200)
+        self.assertEqual(inherited.num_connections, 1)
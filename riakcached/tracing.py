@@ -0,0 +1,426 @@
+import collections
+import random
+import threading
+import time
+import zlib
+
+
+def key_hash(key):
+    """Hash a key for use as a span tag, so that keys are not exposed to the tracing backend
+
+    :param key: the key to hash
+    :type key: str
+    :returns: str - the CRC32 of `key` as 8 hexadecimal digits
+    """
+    if isinstance(key, unicode):
+        key = key.encode("utf-8")
+    return "%08x" % (zlib.crc32(key) & 0xffffffff)
+
+
+def span_tags(bucket, key, tags):
+    """Build the tags of a span for an operation on `key` in `bucket`
+
+    :param bucket: the name of the bucket, or None
+    :type bucket: str
+    :param key: the key, the keys (or key -> value dict) of `*_many` operations, or None
+    :type key: object
+    :param tags: the other tags of the span
+    :type tags: dict
+    :returns: dict - `tags` with `riak.bucket` and `riak.key_hash` (or `riak.keys`, the number
+        of keys) added
+    """
+    if bucket is not None:
+        tags["riak.bucket"] = bucket
+    if isinstance(key, basestring):
+        tags["riak.key_hash"] = key_hash(key)
+    elif hasattr(key, "__len__"):
+        tags["riak.keys"] = len(key)
+    return tags
+
+
+class Span(object):
+    """A span which records nothing, the base class of spans
+
+    Spans are context managers, the span starts when the block is entered and finishes when
+    it exits, tagged as an error if the block raised.
+    """
+    __slots__ = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def set_tag(self, name, value):
+        """Set a tag of the span
+
+        :param name: the name of the tag
+        :type name: str
+        :param value: the value of the tag
+        :type value: object
+        """
+        pass
+
+    def set_request(self, method, node, body, status, data):
+        """Tag the span with a HTTP request and its response
+
+        :param method: the HTTP method of the request
+        :type method: str
+        :param node: the base url of the node the request was made to
+        :type node: str
+        :param body: the body of the request, or None
+        :type body: str
+        :param status: the status of the response
+        :type status: int
+        :param data: the body of the response, None when it was not read
+        :type data: str
+        """
+        pass
+
+
+class TaggedSpan(Span):
+    """A base class for spans which keep their tags, implementing :func:`set_request`
+    """
+    __slots__ = []
+
+    def set_request(self, method, node, body, status, data):
+        """Tag the span with a HTTP request and its response
+
+        Sets the `http.method`, `http.status_code`, `riak.node`, `riak.request_size` and
+        `riak.response_size` tags.
+
+        :param method: the HTTP method of the request
+        :type method: str
+        :param node: the base url of the node the request was made to
+        :type node: str
+        :param body: the body of the request, or None
+        :type body: str
+        :param status: the status of the response
+        :type status: int
+        :param data: the body of the response, None when it was not read
+        :type data: str
+        """
+        self.set_tag("http.method", method)
+        self.set_tag("http.status_code", status)
+        self.set_tag("riak.node", node)
+        self.set_tag("riak.request_size", len(body) if isinstance(body, basestring) else 0)
+        if data is not None:
+            self.set_tag("riak.response_size", len(data))
+
+
+NOOP_SPAN = Span()
+
+
+class Tracer(object):
+    """A tracer which records nothing, the default tracer of clients and pools
+
+    Every client operation runs in a span (`riakcached.get`, `riakcached.set`, ...), as does
+    every request made by a pool (`riakcached.request`) and every request retried or hedged
+    by a :class:`riakcached.policies.PolicyPool` (`riakcached.policy`). Subclasses record
+    the spans, this tracer returns the same do-nothing span for every one of them so that
+    tracing costs a few method calls when it is disabled.
+    """
+    __slots__ = []
+
+    def span(self, name, bucket=None, key=None):
+        """Start a span, see :func:`riakcached.tracing.span_tags` for `bucket` and `key`
+
+        :param name: the name of the span
+        :type name: str
+        :param bucket: the bucket of the operation, if any
+        :type bucket: str
+        :param key: the key (or keys) of the operation, if any
+        :type key: object
+        :returns: :class:`riakcached.tracing.Span` - the span, to use as a context manager
+        """
+        return NOOP_SPAN
+
+    def wrap(self, func):
+        """Wrap `func` so that its spans are children of the current span when called from
+        another thread (or greenlet)
+
+        :param func: the function to wrap
+        :type func: function
+        :returns: function - the wrapped function
+        """
+        return func
+
+
+NOOP_TRACER = Tracer()
+
+
+class RecordedSpan(TaggedSpan):
+    """A span recorded by a :class:`riakcached.tracing.RecordingTracer`
+    """
+    __slots__ = ["duration", "error", "name", "parent", "span_id", "start", "tags", "trace_id",
+                 "tracer"]
+
+    def __init__(self, tracer, name, parent, tags):
+        """Constructs a new :class:`riakcached.tracing.RecordedSpan`
+
+        :param tracer: the tracer recording the span
+        :type tracer: :class:`riakcached.tracing.RecordingTracer`
+        :param name: the name of the span
+        :type name: str
+        :param parent: the parent span, None for the root span of a trace
+        :type parent: :class:`riakcached.tracing.RecordedSpan`
+        :param tags: the tags of the span
+        :type tags: dict
+        """
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.tags = tags
+        self.span_id = "%016x" % random.getrandbits(64)
+        if parent is None:
+            self.trace_id = self.span_id
+        else:
+            self.trace_id = parent.trace_id
+        self.start = None
+        self.duration = None
+        self.error = None
+
+    def __repr__(self):
+        return "<RecordedSpan %s %s>" % (self.name, self.span_id)
+
+    def __enter__(self):
+        self.tracer.activate(self)
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.time() - self.start
+        self.tracer.activate(self.parent)
+        if exc_type is not None:
+            self.error = exc_value
+            self.tags["error"] = True
+        self.tracer.record(self)
+
+    def set_tag(self, name, value):
+        """Set a tag of the span
+
+        :param name: the name of the tag
+        :type name: str
+        :param value: the value of the tag
+        :type value: object
+        """
+        self.tags[name] = value
+
+    def to_dict(self):
+        """Get the span as a dict, e.g. to log it as JSON
+
+        :returns: dict - the name, ids, start, duration and tags of the span
+        """
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            "start": self.start,
+            "duration": self.duration,
+            "tags": self.tags,
+        }
+
+
+class RecordingTracer(Tracer):
+    """A tracer keeping the last `maxsize` finished spans in memory
+
+    The current span is kept per thread, spans started while another span is current are
+    its children and belong to the same trace. Override :func:`record` to export the spans.
+    Applications running on gevent without monkey patching `threading` should pass a
+    `gevent.local.local()` to keep the current span per greenlet instead.
+
+    Example::
+
+        tracer = RecordingTracer()
+        client = RiakClient("bucket", pool=Urllib3Pool(tracer=tracer), tracer=tracer)
+        client.get("key")
+        for span in tracer.spans():
+            print span.name, span.duration, span.tags
+    """
+    __slots__ = ["_local", "finished"]
+
+    def __init__(self, maxsize=10000, local=None):
+        """Constructs a new :class:`riakcached.tracing.RecordingTracer`
+
+        :param maxsize: the maximum number of finished spans to keep
+        :type maxsize: int
+        :param local: where to keep the current span, defaults to a new `threading.local`
+        :type local: object
+        """
+        self.finished = collections.deque(maxlen=maxsize)
+        if local is None:
+            local = threading.local()
+        self._local = local
+
+    def span(self, name, bucket=None, key=None):
+        """Start a span, see :func:`riakcached.tracing.span_tags` for `bucket` and `key`
+
+        :param name: the name of the span
+        :type name: str
+        :param bucket: the bucket of the operation, if any
+        :type bucket: str
+        :param key: the key (or keys) of the operation, if any
+        :type key: object
+        :returns: :class:`riakcached.tracing.RecordedSpan` - the span, to use as a context
+            manager
+        """
+        return RecordedSpan(self, name, self.active(), span_tags(bucket, key, {}))
+
+    def active(self):
+        """Get the current span of this thread
+
+        :returns: :class:`riakcached.tracing.RecordedSpan` - the current span, or None
+        """
+        return getattr(self._local, "span", None)
+
+    def activate(self, span):
+        """Make `span` the current span of this thread
+
+        :param span: the span, None for no current span
+        :type span: :class:`riakcached.tracing.RecordedSpan`
+        :returns: :class:`riakcached.tracing.RecordedSpan` - the previous current span
+        """
+        previous = getattr(self._local, "span", None)
+        self._local.span = span
+        return previous
+
+    def wrap(self, func):
+        """Wrap `func` so that its spans are children of the current span when called from
+        another thread (or greenlet)
+
+        :param func: the function to wrap
+        :type func: function
+        :returns: function - the wrapped function
+        """
+        parent = self.active()
+
+        def wrapper(*args, **kwargs):
+            previous = self.activate(parent)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.activate(previous)
+        return wrapper
+
+    def record(self, span):
+        """Keep a finished span
+
+        :param span: the finished span
+        :type span: :class:`riakcached.tracing.RecordedSpan`
+        """
+        self.finished.append(span)
+
+    def spans(self, trace_id=None):
+        """Get the finished spans, oldest first
+
+        :param trace_id: only get the spans of this trace
+        :type trace_id: str
+        :returns: list - of :class:`riakcached.tracing.RecordedSpan`
+        """
+        spans = list(self.finished)
+        if trace_id is not None:
+            spans = [span for span in spans if span.trace_id == trace_id]
+        return spans
+
+    def clear(self):
+        """Forget the finished spans
+        """
+        self.finished.clear()
+
+
+class OpenTracingSpan(TaggedSpan):
+    """A span of an OpenTracing tracer, see :class:`riakcached.tracing.OpenTracingTracer`
+    """
+    __slots__ = ["name", "scope", "tags", "tracer"]
+
+    def __init__(self, tracer, name, tags):
+        """Constructs a new :class:`riakcached.tracing.OpenTracingSpan`
+
+        :param tracer: the OpenTracing tracer
+        :type tracer: `opentracing.Tracer`
+        :param name: the name of the span
+        :type name: str
+        :param tags: the tags to start the span with
+        :type tags: dict
+        """
+        self.tracer = tracer
+        self.name = name
+        self.tags = tags
+        self.scope = None
+
+    def __enter__(self):
+        self.scope = self.tracer.start_active_span(
+            self.name, tags=self.tags, finish_on_close=True,
+        )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.scope.span.set_tag("error", True)
+            self.scope.span.log_kv({"event": "error", "error.object": exc_value})
+        self.scope.close()
+
+    def set_tag(self, name, value):
+        """Set a tag of the span
+
+        :param name: the name of the tag
+        :type name: str
+        :param value: the value of the tag
+        :type value: object
+        """
+        self.scope.span.set_tag(name, value)
+
+
+class OpenTracingTracer(Tracer):
+    """A tracer reporting spans to an OpenTracing (2.x) tracer, e.g. Jaeger's or Zipkin's
+
+    Spans are started as children of the OpenTracing tracer's active span, so the client
+    operations show up in the traces of the application.
+
+    Example::
+
+        tracer = OpenTracingTracer(opentracing.tracer)
+        client = RiakClient("bucket", pool=Urllib3Pool(tracer=tracer), tracer=tracer)
+    """
+    __slots__ = ["tracer"]
+
+    def __init__(self, tracer):
+        """Constructs a new :class:`riakcached.tracing.OpenTracingTracer`
+
+        :param tracer: the OpenTracing tracer
+        :type tracer: `opentracing.Tracer`
+        """
+        self.tracer = tracer
+
+    def span(self, name, bucket=None, key=None):
+        """Start a span, see :func:`riakcached.tracing.span_tags` for `bucket` and `key`
+
+        :param name: the name of the span
+        :type name: str
+        :param bucket: the bucket of the operation, if any
+        :type bucket: str
+        :param key: the key (or keys) of the operation, if any
+        :type key: object
+        :returns: :class:`riakcached.tracing.OpenTracingSpan` - the span, to use as a
+            context manager
+        """
+        return OpenTracingSpan(self.tracer, name, span_tags(bucket, key, {}))
+
+    def wrap(self, func):
+        """Wrap `func` so that its spans are children of the active span when called from
+        another thread (or greenlet)
+
+        :param func: the function to wrap
+        :type func: function
+        :returns: function - the wrapped function
+        """
+        parent = self.tracer.active_span
+        if parent is None:
+            return func
+
+        def wrapper(*args, **kwargs):
+            with self.tracer.scope_manager.activate(parent, False):
+                return func(*args, **kwargs)
+        return wrapper
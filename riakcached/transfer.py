@@ -0,0 +1,490 @@
+"""Bulk export and import of a bucket as newline-delimited JSON
+
+Every line of a dump is a JSON object describing one key::
+
+    {"key": "user:1", "content_type": "application/json", "value": "{\\"name\\": \\"...\\"}",
+     "meta": {"expires": "1400000000"}}
+
+Values which are not valid UTF-8 are stored base64 encoded under `"base64"` instead of
+`"value"`. User metadata (`X-Riak-Meta-*`, including the expiry set by
+:func:`riakcached.clients.RiakClient.set`) is kept, expired keys are skipped and large values
+stored in chunks are dumped as a single value.
+
+Keys are streamed from Riak and fetched or stored in batches with bounded concurrency. After
+every batch is written a line is appended to the (optional) checkpoint file, so an interrupted
+dump or load can be resumed by running the same command again with the same checkpoint. With
+a checkpoint, a dump first saves the key listing next to it (`<checkpoint>.keys`) and then
+only records how far into that listing it got, so checkpoints stay small and resuming does
+not load the dumped keys into memory. A load records the number of input lines it has
+consumed. Records which cannot be loaded are reported and counted as failed without stopping
+the load.
+Compressed dumps are written as one gzip member per batch, so they can still be read with
+`gzip`/`zcat` and resumed after an interruption.
+
+Usage::
+
+    riakcached-dump --bucket users --checkpoint users.checkpoint users.ndjson.gz
+    riakcached-load --bucket users-copy --checkpoint load.checkpoint users.ndjson.gz
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import StringIO
+import sys
+import threading
+import time
+
+from riakcached.clients import parallel_map
+from riakcached.clients import RiakClient
+from riakcached.pools import Urllib3Pool
+
+
+META_PREFIX = "x-riak-meta-"
+GZIP_MAGIC = "\x1f\x8b"
+
+
+def dump_record(key, data, headers):
+    """Build the dump record for a raw value
+
+    :param key: the key of the value
+    :type key: str
+    :param data: the raw value
+    :type data: str
+    :param headers: the response headers of the value, with lower case names
+    :type headers: dict
+    :returns: dict - the record to write
+    """
+    record = {
+        "key": key,
+        "content_type": headers.get("content-type", "application/octet-stream"),
+    }
+    try:
+        record["value"] = data.decode("utf-8")
+    except UnicodeDecodeError:
+        record["base64"] = base64.b64encode(data)
+    meta = dict(
+        (name[len(META_PREFIX):], value)
+        for name, value in headers.iteritems()
+        if name.lower().startswith(META_PREFIX)
+    )
+    if meta:
+        record["meta"] = meta
+    return record
+
+
+def load_record(record):
+    """Parse a dump record
+
+    :param record: a record written by :func:`dump_record`
+    :type record: dict
+    :returns: tuple - key, raw value, content type and metadata
+    """
+    if "base64" in record:
+        data = base64.b64decode(record["base64"])
+    else:
+        data = record["value"].encode("utf-8")
+    meta = dict(
+        (name.encode("utf-8"), value.encode("utf-8"))
+        for name, value in record.get("meta", {}).iteritems()
+    )
+    return (
+        record["key"].encode("utf-8"),
+        data,
+        record["content_type"].encode("utf-8"),
+        meta,
+    )
+
+
+def batches(iterable, size):
+    """Split `iterable` into lists of at most `size` items
+
+    :param iterable: the items to split
+    :type iterable: iterable
+    :param size: the maximum size of a batch
+    :type size: int
+    :returns: generator - yields every batch
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def read_checkpoint(path):
+    """Read every entry of a checkpoint file
+
+    A partially written last entry (from an interrupted run) is ignored.
+
+    :param path: the checkpoint file
+    :type path: str
+    :returns: list - the entries, empty if the file does not exist
+    """
+    if not path or not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, "rb") as fp:
+        for line in fp:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+    return entries
+
+
+class Checkpoint(object):
+    """Appends progress entries to a checkpoint file, see :func:`read_checkpoint`
+    """
+    __slots__ = ["fp"]
+
+    def __init__(self, path):
+        """Constructs a new :class:`riakcached.transfer.Checkpoint`
+
+        :param path: the checkpoint file, None to not keep a checkpoint
+        :type path: str
+        """
+        self.fp = open(path, "ab") if path else None
+
+    def save(self, **entry):
+        """Durably append an entry to the checkpoint file
+        """
+        if self.fp is None:
+            return
+        self.fp.write(json.dumps(entry) + "\n")
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+
+    def close(self):
+        """Close the checkpoint file
+        """
+        if self.fp is not None:
+            self.fp.close()
+
+
+class Progress(object):
+    """Counts transferred keys and bytes and reports the throughput every `interval` seconds
+    """
+    __slots__ = ["_last_report", "_lock", "bytes", "failed", "interval", "keys", "label",
+                 "output", "started"]
+
+    def __init__(self, label, output=None, interval=5.0):
+        """Constructs a new :class:`riakcached.transfer.Progress`
+
+        :param label: what is being counted, e.g. "dumped"
+        :type label: str
+        :param output: where to write reports to, None to not report
+        :type output: file
+        :param interval: the number of seconds between reports
+        :type interval: float
+        """
+        self.label = label
+        self.output = output
+        self.interval = interval
+        self.keys = 0
+        self.bytes = 0
+        self.failed = 0
+        self.started = time.time()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def add(self, keys, size, failed=0):
+        """Count a finished batch and report if `interval` seconds have passed
+
+        :param keys: the number of keys transferred
+        :type keys: int
+        :param size: the number of uncompressed bytes transferred
+        :type size: int
+        :param failed: the number of keys which could not be transferred
+        :type failed: int
+        """
+        with self._lock:
+            self.keys += keys
+            self.bytes += size
+            self.failed += failed
+            now = time.time()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+        self.report()
+
+    def error(self, message):
+        """Write an error about a single key to `output`
+
+        :param message: the error message
+        :type message: str
+        """
+        if self.output is None:
+            return
+        with self._lock:
+            self.output.write("%s\n" % message)
+            self.output.flush()
+
+    def report(self):
+        """Write the current totals and throughput to `output`
+        """
+        if self.output is None:
+            return
+        elapsed = max(time.time() - self.started, 1e-6)
+        self.output.write("%s %d keys, %.1f MB in %.1fs (%.0f keys/s, %.2f MB/s)%s\n" % (
+            self.label,
+            self.keys,
+            self.bytes / 1048576.0,
+            elapsed,
+            self.keys / elapsed,
+            self.bytes / 1048576.0 / elapsed,
+            ", %d failed" % self.failed if self.failed else "",
+        ))
+        self.output.flush()
+
+
+def compress(data):
+    """Compress `data` as a single gzip member
+
+    :param data: the data to compress
+    :type data: str
+    :returns: str - the compressed data
+    """
+    buffered = StringIO.StringIO()
+    with gzip.GzipFile(fileobj=buffered, mode="wb") as fp:
+        fp.write(data)
+    return buffered.getvalue()
+
+
+def dump(client, output, workers=16, batch_size=1000, gzipped=False, checkpoint=None,
+         progress=None):
+    """Write every key of the client's `bucket` to `output`
+
+    When `checkpoint` names an existing checkpoint file, keys which were already dumped are
+    skipped and `output` is truncated to the end of the last completed batch first. The keys
+    are listed into `<checkpoint>.keys` before the first batch, see :func:`list_keys`, and
+    the checkpoint records the position in that file reached by each batch.
+
+    :param client: the client to dump the bucket of
+    :type client: :class:`riakcached.clients.RiakClient`
+    :param output: the file to write to, must be seekable when resuming
+    :type output: file
+    :param workers: the number of keys to fetch at once
+    :type workers: int
+    :param batch_size: the number of keys written between checkpoints
+    :type batch_size: int
+    :param gzipped: whether to gzip compress the output
+    :type gzipped: bool
+    :param checkpoint: the checkpoint file, None to not keep a checkpoint
+    :type checkpoint: str
+    :param progress: counts the dumped keys
+    :type progress: :class:`riakcached.transfer.Progress`
+    :returns: :class:`riakcached.transfer.Progress` - the totals of this run
+    :raises: ValueError - when `output` is shorter than the checkpoint says was written
+    """
+    progress = progress or Progress("dumped")
+    entries = read_checkpoint(checkpoint)
+    listed = any("listed" in entry for entry in entries)
+    batches_done = [entry for entry in entries if "position" in entry]
+    offset, position = 0, 0
+    if batches_done:
+        offset, position = batches_done[-1]["offset"], batches_done[-1]["position"]
+    if entries:
+        output.seek(0, os.SEEK_END)
+        if output.tell() < offset:
+            raise ValueError("the output is shorter than the checkpoint, it cannot be resumed")
+        output.seek(offset)
+        output.truncate()
+
+    def fetch(key):
+        result = client.get_raw(key)
+        if result is None:
+            return None
+        data, headers = result
+        return json.dumps(dump_record(key, data, headers)) + "\n"
+
+    saver = Checkpoint(checkpoint)
+    listing = None
+    try:
+        if checkpoint:
+            if not listed:
+                saver.save(listed=list_keys(client, checkpoint + ".keys"))
+            listing = open(checkpoint + ".keys", "rb")
+            listing.seek(position)
+            # readline rather than iteration, which reads ahead and breaks tell()
+            keys = (json.loads(line).encode("utf-8") for line in iter(listing.readline, ""))
+        else:
+            keys = client.iter_keys()
+        for batch in batches(keys, batch_size):
+            lines = [line for line in parallel_map(fetch, batch, workers) if line is not None]
+            data = "".join(lines)
+            written = compress(data) if gzipped else data
+            output.write(written)
+            output.flush()
+            offset += len(written)
+            if listing is not None:
+                saver.save(offset=offset, position=listing.tell())
+            progress.add(len(lines), len(data))
+    finally:
+        if listing is not None:
+            listing.close()
+        saver.close()
+    return progress
+
+
+def list_keys(client, path):
+    """Durably write the keys of the client's `bucket` to `path`, one JSON string per line
+
+    :param client: the client to list the bucket of
+    :type client: :class:`riakcached.clients.RiakClient`
+    :param path: the file to write, replaced if it exists
+    :type path: str
+    :returns: int - the number of keys written
+    """
+    count = 0
+    with open(path, "wb") as fp:
+        for key in client.iter_keys():
+            fp.write(json.dumps(key) + "\n")
+            count += 1
+        fp.flush()
+        os.fsync(fp.fileno())
+    return count
+
+
+def load(client, source, workers=16, batch_size=1000, checkpoint=None, progress=None):
+    """Store every record of a dump read from `source` in the client's `bucket`
+
+    When `checkpoint` names an existing checkpoint file, the lines of `source` which were
+    already loaded are skipped. Records which cannot be parsed or stored are reported to
+    `progress` and counted as failed.
+
+    :param client: the client to load the bucket of
+    :type client: :class:`riakcached.clients.RiakClient`
+    :param source: the uncompressed dump to read from
+    :type source: file
+    :param workers: the number of keys to store at once
+    :type workers: int
+    :param batch_size: the number of records loaded between checkpoints
+    :type batch_size: int
+    :param checkpoint: the checkpoint file, None to not keep a checkpoint
+    :type checkpoint: str
+    :param progress: counts the loaded keys
+    :type progress: :class:`riakcached.transfer.Progress`
+    :returns: :class:`riakcached.transfer.Progress` - the totals of this run
+    """
+    progress = progress or Progress("loaded")
+    entries = read_checkpoint(checkpoint)
+    consumed = entries[-1]["lines"] if entries else 0
+
+    def store(item):
+        index, line = item
+        try:
+            key, data, content_type, meta = load_record(json.loads(line))
+            return client.set_raw(key, data, content_type, meta=meta)
+        except Exception, e:
+            progress.error("line %d: %s: %s" % (index + 1, e.__class__.__name__, e))
+            return False
+
+    saver = Checkpoint(checkpoint)
+    try:
+        lines = (
+            (index, line) for index, line in enumerate(source)
+            if index >= consumed and line.strip()
+        )
+        for batch in batches(lines, batch_size):
+            stored = parallel_map(store, batch, workers)
+            saver.save(lines=batch[-1][0] + 1)
+            progress.add(stored.count(True), sum(len(line) for _, line in batch),
+                         stored.count(False))
+    finally:
+        saver.close()
+    return progress
+
+
+def open_input(path):
+    """Open a dump for reading, transparently decompressing gzipped dumps
+
+    :param path: the dump file, "-" for stdin
+    :type path: str
+    :returns: file - the uncompressed dump
+    """
+    if path == "-":
+        return sys.stdin
+    with open(path, "rb") as fp:
+        magic = fp.read(len(GZIP_MAGIC))
+    if magic == GZIP_MAGIC:
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _argument_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--riak-url", default="http://127.0.0.1:8098", help="the Riak HTTP url")
+    parser.add_argument("--bucket", required=True, help="the Riak bucket to use")
+    parser.add_argument("--timeout", type=float, default=10, help="the Riak request timeout")
+    parser.add_argument("--workers", type=int, default=16, help="keys transferred at once")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="keys transferred between checkpoints")
+    parser.add_argument("--checkpoint", help="file to record progress in and resume from")
+    parser.add_argument("--quiet", action="store_true", help="do not report progress")
+    return parser
+
+
+def _client(args):
+    return RiakClient(
+        args.bucket,
+        pool=Urllib3Pool(base_url=args.riak_url, timeout=args.timeout, maxsize=args.workers),
+        reap_expired=False,
+    )
+
+
+def dump_main(argv=None):
+    """Entry point of the `riakcached-dump` command
+    """
+    arguments = _argument_parser("dump a Riak bucket as newline-delimited JSON")
+    arguments.add_argument("output", help="the file to write, \"-\" for stdout")
+    arguments.add_argument("--gzip", action="store_true",
+                           help="compress the output, the default for *.gz files")
+    args = arguments.parse_args(argv)
+
+    if args.output == "-":
+        if args.checkpoint:
+            arguments.error("--checkpoint requires an output file")
+        output = sys.stdout
+    elif args.checkpoint and read_checkpoint(args.checkpoint):
+        if not os.path.exists(args.output):
+            arguments.error("%s does not exist, remove the checkpoint %s to start over" % (
+                args.output, args.checkpoint,
+            ))
+        output = open(args.output, "r+b")
+    else:
+        output = open(args.output, "wb")
+
+    progress = Progress("dumped", output=None if args.quiet else sys.stderr)
+    try:
+        dump(_client(args), output, workers=args.workers, batch_size=args.batch_size,
+             gzipped=args.gzip or args.output.endswith(".gz"), checkpoint=args.checkpoint,
+             progress=progress)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    progress.report()
+
+
+def load_main(argv=None):
+    """Entry point of the `riakcached-load` command
+    """
+    arguments = _argument_parser("load a dump written by riakcached-dump into a Riak bucket")
+    arguments.add_argument("input", help="the file to read, \"-\" for stdin")
+    args = arguments.parse_args(argv)
+
+    source = open_input(args.input)
+    progress = Progress("loaded", output=None if args.quiet else sys.stderr)
+    try:
+        load(_client(args), source, workers=args.workers, batch_size=args.batch_size,
+             checkpoint=args.checkpoint, progress=progress)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    progress.report()
+    if progress.failed:
+        sys.exit(1)
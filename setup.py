@@ -11,14 +11,24 @@ setup(
     author_email="brett@blangdon.com",
     packages=find_packages(),
     install_requires=["urllib3==1.7"],
+    extras_require={
+        "gevent": ["gevent"],
+    },
     setup_requires=["nose>=1.0"],
+    entry_points={
+        "console_scripts": [
+            "riakcached-bench = riakcached.bench:main",
+            "riakcached-dump = riakcached.transfer:dump_main",
+            "riakcached-load = riakcached.transfer:load_main",
+            "riakcached-server = riakcached.server:main",
+        ],
+    },
     description="A Memcached like interface to Riak",
     license="MIT",
     url='https://github.com/brettlangdon/riakcached',
     classifiers=[
         "Intended Audience :: Developers",
         "Programming Language :: Python",
-        "Programming Language :: Python :: 2.6",
         "Programming Language :: Python :: 2.7",
         "License :: OSI Approved :: MIT License",
         "Topic :: Database",